@@ -1,139 +1,117 @@
 ﻿import pandas as pd
-from lightkurve import search_lightcurve
 from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
-import numpy as np
 import os
+import argparse
+from transit_features import add_transit_features
+from stellar_catalog import get_stellar_catalog, koi_labels, KOI_TABLE
+from columnar import ChunkedTableWriter, export_csv, export_bundle
+from lightcurve_sources import ConcurrentFetcher, MastSource, LocalSource, DEFAULT_FITS_CACHE
 
-# Get Kapler catalog with labels
+project_root = os.path.dirname(os.path.abspath(__file__)) 
 
-koi = NasaExoplanetArchive.query_criteria(
-    table="cumulative",             
-    select="kepid,koi_disposition"
-)
-koi = koi.to_pandas()
+def select_stars(n_per_class=30):
+    catalog = get_stellar_catalog()
 
-# CONFIRMED/CANDIDATE = 1, FALSE POSITIVE = 0
-koi = koi[koi["koi_disposition"].isin(["CONFIRMED","CANDIDATE","FALSE POSITIVE"])]
-koi["label"] = koi["koi_disposition"].map({"CONFIRMED":1,"CANDIDATE":1,"FALSE POSITIVE":0})
+    if catalog is not None:
 
+        # Offline snapshot: one row per star with its 0/1 label from the cumulative KOI table
+        # (stars without a dispositioned KOI are left out, like below)
+        koi = catalog.to_pandas()
+        koi = koi[koi["n_confirmed"] + koi["n_candidate"] + koi["n_false_positive"] > 0]
 
-# Get stellar parameters
+    else:
 
-stellar = NasaExoplanetArchive.query_criteria(
-    table="q1_q17_dr25_stellar",
-    select="kepid,teff,radius,mass,logg,feh"
-).to_pandas()
+        # Get Kapler catalog with labels
 
-# Merge
-koi = pd.merge(koi, stellar, on="kepid", how="inner")
+        koi = NasaExoplanetArchive.query_criteria(
+            table=KOI_TABLE,             
+            select="kepid,koi_disposition"
+        )
+        koi = koi.to_pandas()
 
+        # One row per star: CONFIRMED/CANDIDATE = 1, FALSE POSITIVE = 0
+        koi = koi_labels(koi).rename("label").reset_index()
 
-# Select a subset (number of false pos and pos)
-planets = koi[koi["label"]==1].sample(30, random_state=42)
-falsepos = koi[koi["label"]==0].sample(30, random_state=42)
-selected = pd.concat([planets,falsepos])
 
+        # Get stellar parameters
 
-# Fetch light curves and attach stellar params
+        stellar = NasaExoplanetArchive.query_criteria(
+            table="q1_q17_dr25_stellar",
+            select="kepid,teff,radius,mass,logg,feh"
+        ).to_pandas()
+
+        # Merge
+        koi = pd.merge(koi, stellar, on="kepid", how="inner")
 
-all_rows = []
-
-def fetch_lightcurve(kepid, label, teff, radius, mass, logg, feh):
-    try:
-        # Add KIC prefix for Kepler IDs (required)
-        lc_search = search_lightcurve(f"KIC{kepid}", mission="Kepler")
-        lc_file = lc_search.download()
-        if lc_file is not None:
-            lc = lc_file.PDCSAP_FLUX.remove_nans()
-            for t,f,e in zip(lc.time.value, lc.flux.value, lc.flux_err.value):
-                all_rows.append([kepid, t, f, e, label, teff, radius, mass, logg, feh])
-        else:
-            print(f"No light curve found for KIC{kepid}")
-    except Exception as e:
-        print(f"Skipping {kepid}: {e}")
 
-# Loop through selected stars
-for row in selected.itertuples():
-    fetch_lightcurve(row.kepid, row.label, row.teff, row.radius, row.mass, row.logg, row.feh)
+    # Select a subset (number of false pos and pos)
+    planets = koi[koi["label"]==1].sample(n_per_class, random_state=42)
+    falsepos = koi[koi["label"]==0].sample(n_per_class, random_state=42)
+    return pd.concat([planets,falsepos])
 
 
-#CSV
+# Fetch light curves and attach stellar params
 
-df = pd.DataFrame(all_rows, columns=[
+COLUMNS = [
     "star_id","time","flux","flux_err","label",
     "teff","radius","mass","logg","feh"
-])
-# df.to_csv("kepler_1000stars_with_stellar_params.csv", index=False)
-
-
-#Calculation transit features (depth, duration, ingress, egress, symmetry)
- 
-"""
-
-Note: the transit features are star spesific, basically we are comparing the fluxes of 1 star 
-to get max min and calculate the features 
-
-"""
-#(star specific)
-
-# Add empty columns for new features
-df["depth"] = np.nan
-df["duration"] = np.nan
-df["ingress"] = np.nan
-df["egress"] = np.nan
-df["symmetry"] = np.nan
-
-# Process star by star
-for star_id, group in df.groupby("star_id"):
-    flux = group["flux"].values
-    time = group["time"].values
-    flux_err = group["flux_err"].values
-
-    # Robust baseline = median flux
-    baseline = np.median(flux)
-
-    # Threshold just below baseline
-    threshold = baseline - 2 * np.median(flux_err)
-
-    # Find dip points
-    dip_mask = flux < threshold
-
-    if np.any(dip_mask):
-        # Depth = (baseline - min_flux) / baseline
-        min_flux = np.min(flux[dip_mask])
-        depth = (baseline - min_flux) / baseline
+]
+
+def star_frame(row, lightcurve):
+    # One star's cadences with its stellar params attached
+    time, flux, flux_err = lightcurve
+    df = pd.DataFrame({"star_id": row.kepid, "time": time, "flux": flux, "flux_err": flux_err})
+    for col in COLUMNS[4:]:
+        df[col] = getattr(row, col)
+    return df[COLUMNS]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the light curve dataset one star at a time.")
+    parser.add_argument("--per-class", type=int, default=30, help="stars sampled per label")
+    parser.add_argument("--build-dir", default=os.path.join(project_root, 'data', 'game_build'))
+    parser.add_argument("--output", default=os.path.join(project_root, 'data', 'game_data'),
+                        help="bundle directory, or a .csv path")
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent light curve downloads")
+    parser.add_argument("--per-host", type=int, default=4, help="concurrent downloads per host")
+    parser.add_argument("--fits-cache", default=DEFAULT_FITS_CACHE, help="shared cache of downloaded FITS files")
+    parser.add_argument("--source-dir", help="read light curves from this local directory instead of MAST")
+    args = parser.parse_args()
+
+    selected = select_stars(args.per_class)
+
+    # Finished stars are recorded in the build dir, so a rerun resumes where it stopped
+    writer = ChunkedTableWriter(args.build_dir, fresh=args.fresh)
+
+    source = LocalSource(args.source_dir) if args.source_dir else MastSource(args.fits_cache)
+    fetcher = ConcurrentFetcher(source, max_workers=args.workers, per_host=args.per_host)
+
+    # Downloads run concurrently; stars are processed and written here one at a time
+    todo = {row.kepid: row for row in selected.itertuples() if not writer.has(row.kepid)}
+    for kepid, lightcurve in fetcher.fetch_all(todo):
+        row = todo[kepid]
+        if isinstance(lightcurve, Exception):
+            print(f"Skipping {kepid}: {lightcurve}")
+            continue
+        if lightcurve is None:
+            print(f"No light curve found for KIC{kepid}")
+            writer.mark_empty(kepid)
+            continue
 
-        # Duration = time difference between first and last dip points
-        dip_times = time[dip_mask]
-        duration = dip_times[-1] - dip_times[0]
+        df = star_frame(row, lightcurve)
 
-        # Ingress = start to min flux
-        t_start = dip_times[0]
-        t_min = time[np.argmin(flux)]
-        ingress = t_min - t_start if t_min > t_start else np.nan
+        #Calculation transit features (depth, duration, ingress, egress, symmetry)
+        #(star specific, so they can be computed as soon as the star's light curve arrives)
 
-        print(t_start)
-        print(t_min)
-        print(ingress)
+        df = add_transit_features(df)
+        writer.append(row.kepid, df)
 
-        # Egress = min flux to end
-        t_end = dip_times[-1]
-        egress = t_end - t_min if t_end > t_min else np.nan
 
-        # Symmetry ratio
-        symmetry = ingress / egress if (ingress and egress and egress > 0) else np.nan
+    # Final dataset
+    if args.output.endswith(".csv"):
+        export_csv(args.build_dir, args.output)
     else:
-        depth = duration = ingress = egress = symmetry = np.nan
-
-    # Assign results back to all rows of this star
-    df.loc[df["star_id"] == star_id, "depth"] = depth
-    df.loc[df["star_id"] == star_id, "duration"] = duration
-    df.loc[df["star_id"] == star_id, "ingress"] = ingress
-    df.loc[df["star_id"] == star_id, "egress"] = egress
-    df.loc[df["star_id"] == star_id, "symmetry"] = symmetry
+        export_bundle(args.build_dir, args.output)
 
-
-# Final dataset
-project_root = os.path.dirname(os.path.abspath(__file__)) 
-out_file_path = os.path.join(project_root, 'data', 'game_data.csv')
-df.to_csv(out_file_path, index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
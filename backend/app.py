@@ -1,15 +1,27 @@
-from flask import Flask, request, jsonify, make_response, send_file
+from flask import Flask, request, jsonify, make_response
 from flask_cors import CORS, cross_origin
-import joblib
+import hmac
 import os
 import numpy as np
-import random
 import pandas as pd
-from star_aggregator import extract_features
-from format_data import add_features
-import matplotlib.pyplot as plt
-import io
-from extra_features import calculate_additional_params
+from star_aggregator import aggregate_features
+from format_data import add_features, uniform_first_col_value
+from extra_features import calculate_additional_params, additional_params_records
+from lightcurve_store import open_store
+from downsample import METHODS
+from plots import PlotRenderer, FORMATS, MIN_SIZE, MAX_SIZE
+from columnar import existing_table
+from period_search import add_period_features
+from metrics import timed, render as render_metrics, register_collector, REQUEST_SECONDS, ROWS, STARS
+from archive_cache import get_archive_cache
+from prediction_cache import PredictionCache, input_key, cache_version
+from model_registry import ModelRegistry
+from jobs import JobStore, JobQueue, QueueFull
+from payloads import read_request, PayloadError
+from uncertainty import predict_with_uncertainty, DEFAULT_BOOTSTRAP, MAX_BOOTSTRAP
+from incremental import FeatureStateStore, incremental_features, time_ordered, DEFAULT_INCREMENTAL
+import json
+import time
 
 app = Flask(__name__)
 
@@ -50,86 +62,454 @@ CORS(app, resources={
     }
 })
 
-# Load the model
+# Load the model: the model/registry version named by ACTIVE, else model/model.pkl.
+# A new version is swapped in without a restart (ACTIVE change, /admin/model/reload
+# or SIGUSR2); each request keeps the model it started with.
 project_root = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(project_root, 'model', 'model.pkl')
-model_data = joblib.load(model_path)
-model = model_data["model"]
+models = ModelRegistry()
+models.current()
+models.install_signal_handler()
+
+def bootstrap_arg():
+    # ?bootstrap=N cadence resamples per star for the uncertainty (0 = folds only)
+    bootstrap = request.args.get("bootstrap", DEFAULT_BOOTSTRAP, type=int)
+    if not 0 <= bootstrap <= MAX_BOOTSTRAP:
+        raise PayloadError(f"bootstrap must be between 0 and {MAX_BOOTSTRAP}")
+    return bootstrap
+
+# Finished results keyed by input hash + model version (cache_version), shared by workers on disk
+result_cache = PredictionCache()
+try:
+    result_cache.purge(models.current())
+except Exception as e:
+    print(f"Prediction cache purge failed: {e}")
+
+def build_feature_table(data: pd.DataFrame):
+    # Per-cadence rows -> one row of model features per star (plus the per-cadence table)
+    with timed("add_features"):
+        detailed = add_features(data)
+
+    with timed("extract_features"):
+        features = aggregate_features(detailed)
+
+    # Period, epoch and SNR of the strongest transit signal
+    with timed("period_search"):
+        features = add_period_features(features, detailed)
+
+    star_ids = features["star_id"].tolist()
+    features = features.drop(columns="star_id")
+    if 'label' in features.columns:
+        features = features.drop(columns="label")
+
+    return star_ids, features, detailed
+
+# Per-star feature state, so a resubmitted light curve only pays for its new cadences
+feature_states = FeatureStateStore()
+
+def build_feature_table_incremental(data: pd.DataFrame):
+    # Same as build_feature_table for one star, from its stored state (see incremental.py);
+    # rows out of time order go through the full pipeline, which keeps their order
+    if not time_ordered(data):
+        star_ids, features, detailed = build_feature_table(data)
+        return star_ids, features, detailed, "full"
+    with timed("incremental_features"):
+        features, mode = incremental_features(feature_states, data)
+
+    star_ids = features["star_id"].tolist()
+    features = features.drop(columns=["star_id", "label"])
+    return star_ids, features, data, mode
+
+def score_stars(data: pd.DataFrame, endpoint: str, active, progress=None, chunk_size=None, bootstrap=0):
+    """
+    Score every star of a multi-star table with the `active` model, returning
+    one result per star (sorted by star_id) in the /predict/batch format,
+    with `bootstrap` cadence resamples per star for the uncertainty.
+    - Each star is cached on its own rows, under the same key /predict uses.
+    - Stars not in the cache are computed `chunk_size` stars at a time (all at
+      once by default), calling progress(fraction, stage) after each step.
+    - A star whose features cannot be scored gets a null probability and an
+      `error` (see predict_with_uncertainty) without failing the others; such
+      results are not cached.
+    """
+    version = cache_version(active, bootstrap)
+    rows_by_star = data.groupby("star_id", sort=True).indices
+    keys = {star_id: input_key(data.iloc[idx], version) for star_id, idx in rows_by_star.items()}
+    by_star = {star_id: result_cache.get(key) for star_id, key in keys.items()}
+    missing = [star_id for star_id, result in by_star.items() if result is None]
+
+    total = len(rows_by_star)
+    done = total - len(missing)
+    chunk_size = chunk_size or max(1, len(missing))
+
+    for start in range(0, len(missing), chunk_size):
+        chunk = missing[start:start + chunk_size]
+        if progress:
+            progress(done / total, "features")
+
+        rows = np.concatenate([rows_by_star[star_id] for star_id in chunk])
+        star_ids, features, detailed = build_feature_table(data.iloc[np.sort(rows)].reset_index(drop=True))
+
+        # One vectorized call over every fold, star and resample of the chunk
+        with timed("predict_proba"):
+            scored = predict_with_uncertainty(active, star_ids, features, detailed, bootstrap)
+        STARS.inc(len(star_ids), endpoint=endpoint)
+
+        # Derived planet parameters of the whole chunk in one vectorized pass
+        with timed("additional_params"):
+            params = additional_params_records(features)
+
+        computed = []
+        for i, star_id in enumerate(star_ids):
+            result = scored[i]
+            result["additionalParams"] = None if "error" in result else params[i]
+            by_star[star_id] = result
+            if "error" not in result:
+                computed.append((keys[star_id], result))
+        result_cache.put_many(computed, version)
+        done += len(chunk)
+
+    return [{**by_star[star_id], "star_id": int(star_id)} for star_id in rows_by_star]
 
 @app.route('/predict', methods=['POST'])
 def predict():
         
     try:
-        # Get data from request
-        data = request.json.get('data', [])
+        # Get data from request: JSON rows or columns, .npz, Arrow or Kepler FITS,
+        # optionally gzip/zstd compressed
+        with timed("decode"):
+            data = read_request(request)
         
-        if not data:
+        if data.empty:
             return jsonify({"error": "No data provided"}), 400
             
-        # Extract features
-        data = pd.DataFrame(data)
-        features = add_features(data)
-            
-        features = features.groupby("star_id").apply(extract_features).reset_index()
+        ROWS.inc(len(data), endpoint="predict")
+        uniform_first_col_value(data[["star_id"]])
+        active = models.current()
+        bootstrap = bootstrap_arg()
+        # ?incremental=1: features from the star's stored state, extended by the new cadences only
+        incremental = request.args.get("incremental", int(DEFAULT_INCREMENTAL), type=int) == 1
+        version = cache_version(active, bootstrap, incremental)
+
+        # Same light curve as an earlier request: return its stored result
+        key = input_key(data, version)
+        cached = result_cache.get(key)
+        if cached is not None:
+            response = jsonify({**cached, "model_version": active.version, "message": "Prediction successful"})
+            response.headers["X-Prediction-Cache"] = "hit"
+            response.headers["X-Model-Version"] = active.version
+            return response
 
-        features = features.drop(columns="star_id")
-        if 'label' in features.columns:
-            features = features.drop(columns="label")
+        mode = None
+        if incremental:
+            star_ids, features, detailed, mode = build_feature_table_incremental(data)
+        else:
+            star_ids, features, detailed = build_feature_table(data)
                 
-        # Make prediction and get probabilities for all classes
-        probabilities = model.predict_proba(features)[0]
-        probability = float(probabilities[1])  # Probability of class 1 (exoplanet)
-        
-        # Calculate standard error of the prediction (as a simple approximation of uncertainty)
-        # This assumes binary classification with classes 0 and 1
-        n = len(probabilities)  # Number of training samples (approximate)
-        standard_error = np.sqrt((probability * (1 - probability)) / n) if n > 0 else 0.05
-        
-        # Calculate margin of error (95% confidence interval)
-        z_score = 1.96  # For 95% confidence
-        margin_of_error = z_score * standard_error
-        
-        # Calculate confidence interval bounds
-        lower_bound = max(0, probability - margin_of_error)
-        upper_bound = min(1, probability + margin_of_error)
+        # Probability of class 1 (exoplanet) with its spread over folds (and resamples)
+        with timed("predict_proba"):
+            result = predict_with_uncertainty(active, star_ids, features, detailed, bootstrap)[0]
+        STARS.inc(endpoint="predict")
 
-        addParams = calculate_additional_params(features)
-        
-        return jsonify({
-            "probability": probability,
-            "probability_percentage": round(probability * 100, 2),
-            "margin_of_error": round(margin_of_error * 100, 2),
-            "confidence_interval": {
-                "lower_bound": round(lower_bound * 100, 2),
-                "upper_bound": round(upper_bound * 100, 2)
-            },
-            "additionalParams": addParams,
+        if "error" in result:
+            return jsonify({"error": result["error"], "star_id": int(star_ids[0])}), 422
+
+        with timed("additional_params"):
+            addParams = calculate_additional_params(features)
+
+        result["additionalParams"] = addParams
+        result_cache.put(key, version, result)
+
+        response = jsonify({
+            **result,
+            "model_version": active.version,
             "message": "Prediction successful"
         })
+        response.headers["X-Prediction-Cache"] = "miss"
+        response.headers["X-Model-Version"] = active.version
+        if mode:
+            response.headers["X-Feature-State"] = mode
+        return response
         
+    except PayloadError as e:
+        return jsonify({"error": str(e)}), e.status
+
     except Exception as e:
-        print(f"Prediction error: {e}")
+        app.logger.exception("Prediction error")
         return jsonify({"error": str(e)}), 500
 
-project_root = os.path.dirname(os.path.abspath(__file__))
-data_path = os.path.join(project_root, 'data', 'game_data.csv')
-df = pd.read_csv(data_path)
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+
+    try:
+        # Same formats as /predict, but rows may belong to many stars
+        with timed("decode"):
+            data = read_request(request)
+
+        if data.empty:
+            return jsonify({"error": "No data provided"}), 400
+
+        ROWS.inc(len(data), endpoint="predict_batch")
+        active = models.current()
+        results = score_stars(data, "predict_batch", active, bootstrap=bootstrap_arg())
+
+        response = jsonify({
+            "predictions": results,
+            "count": len(results),
+            "model_version": active.version,
+            "message": "Prediction successful"
+        })
+        response.headers["X-Model-Version"] = active.version
+        return response
+
+    except PayloadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    except Exception as e:
+        app.logger.exception("Batch prediction error")
+        return jsonify({"error": str(e)}), 500
+
+# Long light curves and large batches run as background jobs, polled by id
+JOB_CHUNK_STARS = int(os.environ.get("JOB_CHUNK_STARS", 25))
+JOB_EVENTS_RETRY_MS = int(os.environ.get("JOB_EVENTS_RETRY_MS", 1000))   # event stream reconnect delay
+
+def run_prediction_job(data: pd.DataFrame, params: dict, progress):
+    # Scored with the model served when the job starts running
+    active = models.current()
+    try:
+        results = score_stars(data, "predict_jobs", active, progress, JOB_CHUNK_STARS, params["bootstrap"])
+    except Exception:
+        app.logger.exception("Prediction job error")
+        raise
+    return {"predictions": results, "count": len(results), "model_version": active.version}
+
+job_store = JobStore()
+job_queue = JobQueue(job_store, run_prediction_job)
+
+@app.route('/predict/jobs', methods=['POST'])
+def submit_prediction_job():
+
+    try:
+        with timed("decode"):
+            data = read_request(request)
+
+        if data.empty:
+            return jsonify({"error": "No data provided"}), 400
+
+        ROWS.inc(len(data), endpoint="predict_jobs")
+        job_id = job_queue.submit(data, {"bootstrap": bootstrap_arg()})
+
+    except PayloadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    except QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "10"
+        return response, 429
+
+    except Exception as e:
+        app.logger.exception("Prediction job submit error")
+        return jsonify({"error": str(e)}), 500
+
+    response = jsonify({"job_id": job_id, "status": "queued", "status_url": f"/predict/jobs/{job_id}"})
+    response.headers["Location"] = f"/predict/jobs/{job_id}"
+    return response, 202
+
+@app.route('/predict/jobs/<job_id>', methods=['GET'])
+def prediction_job(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/predict/jobs/<job_id>/events', methods=['GET'])
+def prediction_job_events(job_id):
+    # Server-sent events without holding a worker thread: each request answers the current
+    # state and closes, and EventSource reconnects after `retry` ms with the last event id,
+    # so unchanged states are not repeated. A finished job the client has seen gets 204,
+    # which tells EventSource to stop reconnecting.
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+
+    state = f"{job['status']}:{job['progress']}:{job['stage']}"
+    finished = job["status"] in ("done", "failed")
+    seen = request.headers.get("Last-Event-ID") == state
+    if finished and seen:
+        return "", 204
+
+    body = f"retry: {JOB_EVENTS_RETRY_MS}\n\n"
+    if not seen:
+        event = job["status"] if finished else "progress"
+        data = job if finished else {k: job[k] for k in ["id", "status", "progress", "stage"]}
+        body += f"id: {state}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+    return app.response_class(body, mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
+
+def admin_allowed():
+    # Admin endpoints need ADMIN_TOKEN set and sent as "Authorization: Bearer <token>"
+    token = os.environ.get("ADMIN_TOKEN")
+    sent = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return bool(token) and hmac.compare_digest(sent, token)
+
+@app.route('/admin/model', methods=['GET'])
+def model_info():
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    active = models.current()
+    return jsonify({
+        "active": active.version,
+        "loaded_at": active.loaded_at,
+        "metrics": active.metrics,
+        "versions": models.versions(),
+        "reloads": models.reloads,
+    })
+
+@app.route('/admin/model/reload', methods=['POST'])
+def reload_model():
+    # {"version": ...} activates a published version for every worker; this one swaps now,
+    # the others on their next ACTIVE check
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        if version:
+            models.activate(version)
+        served = models.reload()
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0])}), 404
+    except Exception as e:
+        app.logger.exception("Model reload error")
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"active": served, "requested": version})
+
+@register_collector
+def model_stats():
+    yield "model_reloads_total", "counter", "Model versions swapped in without a restart.", models.reloads
+
+@register_collector
+def feature_state_stats():
+    yield "feature_state_incremental_total", "counter", "Incremental feature updates that only processed new cadences.", feature_states.incremental
+    yield "feature_state_rebuilds_total", "counter", "Feature states rebuilt from the full light curve.", feature_states.rebuilds
+
+@register_collector
+def job_stats():
+    yield "prediction_jobs_in_queue", "gauge", "Prediction jobs queued or running (all workers with the process runner).", job_queue.depth()
+
+data_path = existing_table(os.path.join(project_root, 'data', 'game_data'))
+lightcurves = None
+
+def get_lightcurve_store():
+    # Indexed on first use so workers do not pay for it at boot
+    global lightcurves
+    if lightcurves is None:
+        lightcurves = open_store(
+            table_path=data_path,
+            precompute_json=os.environ.get("LIGHTCURVE_PRECOMPUTE_JSON", "") == "1"
+        )
+    return lightcurves
+
+def downsample_args():
+    # ?points=N&method=minmax|lttb; no points means every cadence
+    points = request.args.get("points", type=int)
+    method = request.args.get("method", "minmax")
+    if points is not None and points < 4:
+        raise ValueError("points must be at least 4")
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    return points, method
 
 @app.route('/lightcurve/random', methods=['GET'])
 def random_lightcurve_block():
+    # Uniform pick over stars, served from the per-star index
+    try:
+        points, method = downsample_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    payload = get_lightcurve_store().random_payload(points, method)
+    return app.response_class(payload, mimetype='application/json')
 
-    number = random.randint(0, len(df))
-    start = df.iloc[number]['star_id']
-    arr = list()
-    
-    arr = df[df['star_id'] == start]
+@app.route('/lightcurve/<int:star_id>', methods=['GET'])
+def lightcurve_by_star(star_id):
+    try:
+        points, method = downsample_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    store = get_lightcurve_store()
+    i = store.index_of(star_id)
+    if i is None:
+        return jsonify({"error": f"Star {star_id} not in the game data"}), 404
+    return app.response_class(store.payload(i, points, method), mimetype='application/json')
 
-    sending = {
-        'label': df.iloc[number]['label'],
-        'data': list(arr['flux'])
-    }
+# Rendered light curve images, cached per star, format, size and downsample level
+plots = PlotRenderer()
+
+@app.route('/lightcurve/<int:star_id>/plot', methods=['GET'])
+def lightcurve_plot(star_id):
+    # ?format=png|svg&width=900&height=300&points=2000&method=minmax|lttb (points=0: every cadence)
+    fmt = request.args.get("format", "png").lower()
+    width = request.args.get("width", 900, type=int)
+    height = request.args.get("height", 300, type=int)
+    points = request.args.get("points", 2000, type=int) or None
+    method = request.args.get("method", "minmax")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+    if not (MIN_SIZE <= width <= MAX_SIZE and MIN_SIZE <= height <= MAX_SIZE):
+        return jsonify({"error": f"width and height must be between {MIN_SIZE} and {MAX_SIZE} pixels"}), 400
+    if (points is not None and points < 4) or method not in METHODS:
+        return jsonify({"error": f"points must be 0 or at least 4, method one of {', '.join(METHODS)}"}), 400
+
+    store = get_lightcurve_store()
+    i = store.index_of(star_id)
+    if i is None:
+        return jsonify({"error": f"Star {star_id} not in the game data"}), 404
+
+    key = (star_id, fmt, width, height, points, method)
+    cached = plots.cached(key) is not None
+    time_, flux = store.star(i)
+    with timed("plot"):
+        image, etag = plots.render(key, star_id, time_, flux, fmt=fmt, width=width, height=height,
+                                   points=points, method=method)
+
+    response = app.response_class(image, mimetype=FORMATS[fmt])
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    response.headers["X-Plot-Cache"] = "hit" if cached else "miss"
+    # 304 without a body when If-None-Match already has this image
+    return response.make_conditional(request)
+
+@register_collector
+def plot_cache_stats():
+    yield "plot_cache_hits_total", "counter", "Light curve plots answered from the image cache.", plots.hits
+    yield "plot_cache_misses_total", "counter", "Light curve plots that had to be rendered.", plots.misses
+
+@app.before_request
+def start_timer():
+    request.started_at = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    started_at = getattr(request, "started_at", None)
+    if started_at is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started_at,
+                                endpoint=request.endpoint or "unknown", status=response.status_code)
+    return response
+
+@register_collector
+def archive_cache_stats():
+    cache = get_archive_cache()
+    lookups = cache.hits + cache.misses
+    yield "archive_cache_hits_total", "counter", "Archive lookups answered from the cache.", cache.hits
+    yield "archive_cache_misses_total", "counter", "Archive lookups that went to the NASA Exoplanet Archive.", cache.misses
+    yield "archive_cache_hit_ratio", "gauge", "Share of archive lookups answered from the cache.", cache.hits / lookups if lookups else 0.0
+
+@register_collector
+def prediction_cache_stats():
+    yield "prediction_cache_hits_total", "counter", "Predictions answered from the result cache.", result_cache.hits
+    yield "prediction_cache_misses_total", "counter", "Predictions that had to be computed.", result_cache.misses
 
-    return sending
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text format; counters are per worker process
+    return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health', methods=['GET', 'OPTIONS'])
 @cross_origin()
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+import time
+import argparse
+from contextlib import closing, contextmanager
+from collections import OrderedDict
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_CACHE_PATH = os.environ.get("ARCHIVE_CACHE_PATH", os.path.join(project_root, 'data', 'archive_cache.sqlite'))
+DEFAULT_TTL = float(os.environ.get("ARCHIVE_CACHE_TTL", 30 * 24 * 3600))   # seconds
+DEFAULT_MAXSIZE = int(os.environ.get("ARCHIVE_CACHE_SIZE", 4096))          # stars kept in memory
+
+STELLAR_COLUMNS = ["teff", "radius", "mass", "logg", "feh", "label"]
+
+# Bumped when cached records change meaning (2: label is 0/1 from the cumulative KOI table)
+SCHEMA_VERSION = 2
+
+# Returned by lookup() when the star is not cached at all
+# (None means "cached, and not present in the archive")
+MISS = object()
+
+class ArchiveCache:
+    """
+    Cache of fetch_by_kic results keyed by KIC ID.
+    - In-memory LRU in front of an SQLite file shared by all workers.
+    - Entries older than `ttl` seconds are treated as misses and dropped.
+    - Stars absent from the archive are cached too, so they are not re-queried.
+    - If the SQLite file cannot be opened (e.g. read-only volume) the cache
+      keeps working in memory only.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, maxsize=DEFAULT_MAXSIZE):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            try:
+                with self._connect() as conn:
+                    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                        conn.execute("DROP TABLE IF EXISTS stars")
+                        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS stars ("
+                        "kepid INTEGER PRIMARY KEY, found INTEGER, "
+                        "teff REAL, radius REAL, mass REAL, logg REAL, feh REAL, label INTEGER, "
+                        "stored_at REAL)"
+                    )
+            except (sqlite3.Error, OSError) as e:
+                print(f"Archive cache disabled on disk ({self.path}): {e}")
+                self.path = None
+
+    @contextmanager
+    def _connect(self):
+        # One transaction (committed, or rolled back on error) on a connection that is always closed
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+            yield conn
+
+    def _expired(self, stored_at: float):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _remember(self, kic_id: int, stored_at: float, record):
+        with self._lock:
+            self._memory[kic_id] = (stored_at, record)
+            self._memory.move_to_end(kic_id)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def lookup(self, kic_id: int):
+        kic_id = int(kic_id)
+
+        with self._lock:
+            entry = self._memory.get(kic_id)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(kic_id)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[kic_id]
+
+        if self.path is not None:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT found, teff, radius, mass, logg, feh, label, stored_at FROM stars WHERE kepid = ?",
+                    (kic_id,)
+                ).fetchone()
+                if row is not None and self._expired(row[-1]):
+                    conn.execute("DELETE FROM stars WHERE kepid = ?", (kic_id,))
+                    row = None
+
+            if row is not None:
+                record = None
+                if row[0]:
+                    record = {"star_id": kic_id, **dict(zip(STELLAR_COLUMNS, row[1:7]))}
+                self._remember(kic_id, row[-1], record)
+                self.hits += 1
+                return record
+
+        self.misses += 1
+        return MISS
+
+    def store(self, kic_id: int, record):
+        self.store_many([(int(kic_id), record)])
+
+    def store_many(self, items):
+        now = time.time()
+        rows = []
+        for kic_id, record in items:
+            if record is None:
+                rows.append((int(kic_id), 0) + (None,) * len(STELLAR_COLUMNS) + (now,))
+            else:
+                rows.append((int(kic_id), 1) + tuple(record[col] for col in STELLAR_COLUMNS) + (now,))
+            if len(rows) <= self.maxsize:
+                self._remember(int(kic_id), now, record)
+
+        if self.path is not None:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO stars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def get_or_fetch(self, kic_id: int, fetch):
+        record = self.lookup(kic_id)
+        if record is MISS:
+            record = fetch(kic_id)
+            self.store(kic_id, record)
+        return record
+
+    def evict_expired(self):
+        with self._lock:
+            for kic_id in [k for k, (stored_at, _) in self._memory.items() if self._expired(stored_at)]:
+                del self._memory[kic_id]
+
+        if self.path is not None and self.ttl is not None:
+            with self._connect() as conn:
+                return conn.execute("DELETE FROM stars WHERE stored_at < ?", (time.time() - self.ttl,)).rowcount
+        return 0
+
+_archive_cache = None
+
+def get_archive_cache():
+    global _archive_cache
+    if _archive_cache is None:
+        _archive_cache = ArchiveCache()
+    return _archive_cache
+
+def load_dr25_records():
+    # Whole DR25 stellar + cumulative KOI tables in two queries, same record format as fetch_by_kic
+    from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
+    from stellar_catalog import koi_labels, KOI_TABLE
+
+    stellar = NasaExoplanetArchive.query_criteria(
+        table="q1_q17_dr25_stellar",
+        select="kepid, teff, logg, feh, mass, radius"
+    ).to_pandas().drop_duplicates("kepid")
+
+    koi = NasaExoplanetArchive.query_criteria(
+        table=KOI_TABLE,
+        select="kepid, koi_disposition"
+    ).to_pandas()
+
+    # Exoplanet flag = 1 if the star has a CONFIRMED or CANDIDATE KOI
+    stellar["label"] = stellar["kepid"].map(koi_labels(koi)).fillna(0).astype(int)
+
+    for row in stellar.itertuples(index=False):
+        yield int(row.kepid), {
+            "star_id": int(row.kepid),
+            "teff": float(row.teff),
+            "radius": float(row.radius),
+            "mass": float(row.mass),
+            "logg": float(row.logg),
+            "feh": float(row.feh),
+            "label": int(row.label),
+        }
+
+def preload(cache: ArchiveCache = None):
+    cache = cache or get_archive_cache()
+    records = list(load_dr25_records())
+    cache.store_many(records)
+    return len(records)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the NASA Exoplanet Archive lookup cache.")
+    parser.add_argument("command", choices=["preload", "evict"])
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL)
+    args = parser.parse_args()
+
+    cache = ArchiveCache(path=args.path, ttl=args.ttl)
+    if args.command == "preload":
+        print(f"Cached {preload(cache)} stars in {args.path}")
+    else:
+        print(f"Evicted {cache.evict_expired()} expired stars from {args.path}")
@@ -0,0 +1,82 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from columnar import read_bundle, write_bundle
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+def synthetic_table(n_stars: int, n_cadences: int, seed=0):
+    # detailed_data-shaped table: per-cadence flux plus constants repeated per star
+    rng = np.random.default_rng(seed)
+    n = n_stars * n_cadences
+    stars = pd.DataFrame({
+        "star_id": rng.choice(10**8, n_stars, replace=False),
+        "label": rng.integers(0, 2, n_stars),
+        "teff": rng.normal(5500, 500, n_stars),
+        "radius": rng.lognormal(0, 0.3, n_stars),
+        "mass": rng.lognormal(0, 0.2, n_stars),
+        "logg": rng.normal(4.4, 0.2, n_stars),
+        "feh": rng.normal(0, 0.2, n_stars),
+        "depth": rng.uniform(0, 0.01, n_stars),
+        "duration": rng.uniform(1, 60, n_stars),
+        "ingress": rng.uniform(0, 30, n_stars),
+        "egress": rng.uniform(0, 30, n_stars),
+        "symmetry": rng.uniform(0, 3, n_stars),
+    })
+    df = stars.loc[np.repeat(np.arange(n_stars), n_cadences)].reset_index(drop=True)
+    df.insert(1, "time", np.tile(131.5 + np.arange(n_cadences) * 0.0204, n_stars))
+    df.insert(2, "flux", rng.normal(10000, 20, n))
+    df.insert(3, "flux_err", rng.normal(5, 0.1, n))
+    return df
+
+def disk_size(path: str):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+def best_of(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+def compare(name: str, df: pd.DataFrame, workdir: str, repeat: int):
+    csv_path = os.path.join(workdir, f"{name}.csv")
+    bundle_path = os.path.join(workdir, name)
+    df.to_csv(csv_path, index=False)
+    write_bundle(df, bundle_path)
+
+    rows = [
+        ("csv", disk_size(csv_path), best_of(lambda: pd.read_csv(csv_path), repeat)),
+        ("bundle", disk_size(bundle_path), best_of(lambda: read_bundle(bundle_path), repeat)),
+        ("bundle mmap", disk_size(bundle_path), best_of(lambda: read_bundle(bundle_path, mmap=True, expand=False), repeat)),
+    ]
+    print(f"\n{name}: {len(df)} rows x {df.shape[1]} columns")
+    for fmt, size, seconds in rows:
+        print(f"{fmt:>12}  {size / 1e6:>9.2f} MB  {seconds * 1e3:>9.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare load time and disk size of CSV and columnar bundles.")
+    parser.add_argument("--stars", type=int, default=200)
+    parser.add_argument("--cadences", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_formats_")
+    try:
+        for name in ["detailed_data", "features", "game_data"]:
+            path = os.path.join(project_root, 'data', f"{name}.csv")
+            if os.path.exists(path):
+                compare(name, pd.read_csv(path), workdir, args.repeat)
+        compare("synthetic", synthetic_table(args.stars, args.cadences), workdir, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
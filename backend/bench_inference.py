@@ -0,0 +1,44 @@
+import os
+import time
+import argparse
+import joblib
+import numpy as np
+from fast_model import FastModel, DEFAULT_MODEL_PATH
+from columnar import read_table, existing_table
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+def latency(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sklearn predict_proba with FastModel.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--features", default=existing_table(os.path.join(project_root, 'data', 'features')))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    artifact = joblib.load(args.model)
+    model = artifact["model"]
+    fast = FastModel.from_artifact(artifact)
+
+    features = read_table(args.features)[artifact["feature_order"]]
+
+    print(f"{'batch':>6} {'sklearn p50':>12} {'p99':>10} {'fast p50':>10} {'p99':>10} {'speedup':>8} {'max |diff|':>11}")
+    for batch in [1, 10, 100, 1000, 10000]:
+        X = features.sample(batch, replace=True, random_state=0).reset_index(drop=True)
+        repeat = max(5, args.repeat // max(1, batch // 100))
+
+        sk50, sk99 = latency(lambda: model.predict_proba(X), repeat)
+        fa50, fa99 = latency(lambda: fast.predict_proba(X), repeat)
+        diff = np.abs(model.predict_proba(X) - fast.predict_proba(X)).max()
+
+        print(f"{batch:>6} {sk50 * 1e3:>10.3f}ms {sk99 * 1e3:>8.3f}ms {fa50 * 1e3:>8.3f}ms {fa99 * 1e3:>8.3f}ms {sk50 / fa50:>7.1f}x {diff:>11.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import io
+import gzip
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from payloads import decode_payload
+from bench_pipeline import synthetic_lightcurves
+
+def encode_fits(df: pd.DataFrame):
+    # Minimal Kepler-style light curve file (LIGHTCURVE extension, KEPLERID header)
+    from astropy.io import fits
+
+    primary = fits.PrimaryHDU()
+    primary.header["KEPLERID"] = int(df["star_id"].iloc[0])
+    table = fits.BinTableHDU.from_columns([
+        fits.Column(name="TIME", format="D", array=df["time"].to_numpy()),
+        fits.Column(name="PDCSAP_FLUX", format="E", array=df["flux"].to_numpy()),
+        fits.Column(name="PDCSAP_FLUX_ERR", format="E", array=df["flux_err"].to_numpy()),
+        fits.Column(name="SAP_QUALITY", format="J", array=np.zeros(len(df), dtype=np.int32)),
+    ], name="LIGHTCURVE")
+    out = io.BytesIO()
+    fits.HDUList([primary, table]).writeto(out)
+    return out.getvalue()
+
+def encode_npz(df: pd.DataFrame, compressed=False):
+    out = io.BytesIO()
+    columns = {"star_id": np.int64(df["star_id"].iloc[0])}
+    columns.update({col: df[col].to_numpy() for col in ["time", "flux", "flux_err"]})
+    (np.savez_compressed if compressed else np.savez)(out, **columns)
+    return out.getvalue()
+
+def encode_arrow(df: pd.DataFrame):
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def payloads(df: pd.DataFrame):
+    # (name, body, Content-Type, Content-Encoding) for every format this server can run
+    rows = json.dumps({"data": df.to_dict("records")}).encode()
+    columns = json.dumps({"data": {"star_id": int(df["star_id"].iloc[0]),
+                                   **{col: df[col].tolist() for col in ["time", "flux", "flux_err"]}}}).encode()
+    items = [
+        ("json rows", rows, "application/json", None),
+        ("json rows + gzip", gzip.compress(rows), "application/json", "gzip"),
+        ("json columns", columns, "application/json", None),
+        ("json columns + gzip", gzip.compress(columns), "application/json", "gzip"),
+        ("npz", encode_npz(df), "application/x-npz", None),
+        ("npz compressed", encode_npz(df, compressed=True), "application/x-npz", None),
+        ("fits", encode_fits(df), "application/fits", None),
+        ("fits + gzip", gzip.compress(encode_fits(df)), "application/fits", "gzip"),
+    ]
+    try:
+        import zstandard
+        compressor = zstandard.ZstdCompressor()
+        items.insert(2, ("json rows + zstd", compressor.compress(rows), "application/json", "zstd"))
+        items.append(("npz + zstd", compressor.compress(encode_npz(df)), "application/x-npz", "zstd"))
+    except ImportError:
+        print("zstandard not installed, skipping zstd")
+    try:
+        items.append(("arrow", encode_arrow(df), "application/vnd.apache.arrow.stream", None))
+    except ImportError:
+        print("pyarrow not installed, skipping Arrow")
+    return items
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare payload size and decode time of the /predict upload formats.")
+    parser.add_argument("--cadences", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    df, _ = synthetic_lightcurves(1, args.cadences)
+    items = payloads(df)
+    print(f"{args.cadences} cadences\n{'format':>22} {'size':>10} {'decode p50':>12} {'p99':>10}")
+    for name, body, content_type, encoding in items:
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            decoded = decode_payload(body, content_type, encoding)
+            timings.append(time.perf_counter() - t0)
+        assert len(decoded) == len(df) and np.allclose(decoded["flux"].to_numpy(), df["flux"].to_numpy(), rtol=1e-6)
+        print(f"{name:>22} {len(body) / 1e6:>8.2f}MB {np.percentile(timings, 50) * 1e3:>10.2f}ms {np.percentile(timings, 99) * 1e3:>8.2f}ms")
+
+if __name__ == "__main__":
+    main()
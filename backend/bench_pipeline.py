@@ -0,0 +1,223 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+CADENCE_DAYS = 0.0204  # Kepler long cadence (29.4 min)
+
+def synthetic_lightcurves(n_stars: int, n_cadences: int, seed=0):
+    """
+    Kepler-like light curves with injected box transits.
+    - Returns (rows, stellar): rows has the /predict columns
+      (star_id, time, flux, flux_err); stellar maps star_id to the record
+      an archive lookup would return.
+    - Every other star gets a transit with a random period, duration and depth.
+    """
+    rng = np.random.default_rng(seed)
+    star_ids = np.sort(rng.choice(np.arange(10**6, 10**7), n_stars, replace=False))
+
+    t = 131.5 + np.arange(n_cadences) * CADENCE_DAYS
+    baseline = rng.uniform(2000, 50000, n_stars)
+    noise = rng.uniform(1e-4, 5e-4, n_stars)
+
+    flux = np.empty((n_stars, n_cadences))
+    for i in range(n_stars):
+        flux[i] = baseline[i] * (1 + rng.normal(0, noise[i], n_cadences))
+        if i % 2 == 0:
+            period = rng.uniform(1, 20)
+            duration = rng.uniform(0.08, 0.4)
+            depth = rng.uniform(2e-4, 1e-2)
+            phase = (t - t[0] - rng.uniform(0, period)) % period
+            flux[i, phase < duration] *= 1 - depth
+
+    rows = pd.DataFrame({
+        "star_id": np.repeat(star_ids, n_cadences),
+        "time": np.tile(t, n_stars),
+        "flux": flux.ravel(),
+        "flux_err": np.repeat(baseline * noise, n_cadences),
+    })
+
+    stellar = {
+        int(star_id): {
+            "label": int(i % 2 == 0),
+            "teff": rng.normal(5600, 600),
+            "radius": rng.lognormal(0, 0.3),
+            "mass": rng.lognormal(0, 0.2),
+            "logg": rng.normal(4.4, 0.2),
+            "feh": rng.normal(0, 0.2),
+        }
+        for i, star_id in enumerate(star_ids)
+    }
+    return rows, stellar
+
+def stub_archive(stellar: dict):
+    # Route add_features' lookups to the synthetic records instead of the archive
+    import format_data
+    format_data.fetch_by_kic = lambda kic_id: stellar.get(int(kic_id))
+
+def measure(fn, setup, repeat: int):
+    """
+    Run fn(setup()) `repeat` times, timing only fn (its prints are discarded).
+    Returns (timings in seconds, peak traced memory in MB of one extra run).
+    """
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            arg = setup()
+            t0 = time.perf_counter()
+            fn(arg)
+            timings.append(time.perf_counter() - t0)
+
+        arg = setup()
+        tracemalloc.start()
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return timings, peak / 1e6
+
+def summarize(stage: str, n_stars: int, n_cadences: int, items: int, unit: str, timings, peak_mb: float):
+    p50 = float(np.percentile(timings, 50))
+    return {
+        "stage": stage,
+        "stars": n_stars,
+        "cadences": n_cadences,
+        "items": items,
+        "unit": unit,
+        "repeat": len(timings),
+        "p50_s": p50,
+        "p99_s": float(np.percentile(timings, 99)),
+        "mean_s": float(np.mean(timings)),
+        "throughput": items / p50 if p50 > 0 else float("inf"),
+        "peak_mb": peak_mb,
+    }
+
+def bench_size(n_stars: int, n_cadences: int, repeat: int, max_api_rows: int):
+    from format_data import add_features
+    from star_aggregator import aggregate_features
+    from extra_features import additional_params_records
+    from period_search import add_period_features, star_period_features
+
+    rows, stellar = synthetic_lightcurves(n_stars, n_cadences)
+    stub_archive(stellar)
+    n_rows = len(rows)
+    # Fewer repetitions for the big tables so a full run stays in minutes
+    repeat = max(3, min(repeat, int(repeat * 10**5 / n_rows)))
+
+    detailed = add_features(rows.copy())
+    features = add_period_features(aggregate_features(detailed), detailed)
+
+    results = []
+    def record(stage, fn, setup, n, unit="rows", r=repeat):
+        timings, peak = measure(fn, setup, r)
+        result = summarize(stage, n_stars, n_cadences, n, unit, timings, peak)
+        results.append(result)
+        print(f"{n_stars:>6} x {n_cadences:<8} {stage:<18} p50 {result['p50_s'] * 1e3:>10.2f} ms"
+              f"  p99 {result['p99_s'] * 1e3:>10.2f} ms  {result['throughput']:>12.0f} {unit}/s"
+              f"  peak {peak:>8.1f} MB")
+
+    record("add_features", add_features, lambda: rows.copy(), n_rows)
+    record("extract_features", aggregate_features, lambda: detailed, n_rows)
+    record("period_search", lambda d: star_period_features(d), lambda: detailed, n_rows)
+    record("additional_params", additional_params_records, lambda: features, n_stars, "stars", r=repeat * 10)
+
+    import app
+    from prediction_cache import PredictionCache
+    # Every request must run the pipeline, not hit the result cache
+    app.result_cache = PredictionCache(path=None, maxsize=0)
+    active = app.models.current()
+    X = features[active.feature_order]
+    # Stars without a dip have NaN features and are reported, not scored
+    scorable = np.isfinite(X.to_numpy(dtype=np.float64)).all(axis=1)
+    if not scorable.all():
+        print(f"{n_stars:>6} x {n_cadences:<8} {int((~scorable).sum())} of {n_stars} stars have non-finite features")
+    if scorable.any():
+        record("score", active.scorer.predict_proba, lambda: X[scorable], int(scorable.sum()), "stars", r=repeat * 10)
+    # Folds plus 100 cadence resamples per star, scored in one call
+    from uncertainty import predict_with_uncertainty
+    star_ids = features["star_id"].tolist()
+    record("uncertainty_b100", lambda f: predict_with_uncertainty(active, star_ids, f, detailed, 100),
+           lambda: features, n_stars, "stars")
+
+    # End to end through Flask, JSON included; /predict takes one star per request
+    client = app.app.test_client()
+    if n_cadences <= max_api_rows and scorable.any():
+        first = features["star_id"].to_numpy()[np.argmax(scorable)]
+        one_star = {"data": rows[rows["star_id"] == first].to_dict("records")}
+        record("api_predict", lambda body: check(client.post("/predict", json=body)), lambda: one_star, n_cadences)
+    if n_rows <= max_api_rows:
+        all_stars = {"data": rows.to_dict("records")}
+        record("api_predict_batch", lambda body: check(client.post("/predict/batch", json=body)), lambda: all_stars, n_rows)
+
+    return results
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.status_code}: {response.get_json()}")
+    return response
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: list, baseline_path: str):
+    # p50 ratio against a previous run, matched on (stage, stars, cadences)
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["stars"], r["cadences"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}")
+    for r in results:
+        old = baseline.get((r["stage"], r["stars"], r["cadences"]))
+        if old is not None:
+            print(f"{r['stars']:>6} x {r['cadences']:<8} {r['stage']:<18} {old['p50_s'] / r['p50_s']:>6.2f}x faster")
+
+def parse_size(size: str):
+    n_stars, n_cadences = size.lower().split("x")
+    return int(n_stars), int(float(n_cadences))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the feature pipeline and /predict on synthetic light curves.")
+    parser.add_argument("--sizes", nargs="+", default=["1x1000", "10x10000", "100x10000"],
+                        help="STARSxCADENCES, e.g. 1000x1e4 for 10^7 rows")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-api-rows", type=int, default=200000,
+                        help="skip the Flask benchmarks above this many rows (JSON encoding dominates)")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare p50 latency against")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        n_stars, n_cadences = parse_size(size)
+        results.extend(bench_size(n_stars, n_cadences, args.repeat, args.max_api_rows))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
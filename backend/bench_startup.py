@@ -0,0 +1,41 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+# Each snippet runs in a fresh interpreter, like a gunicorn worker booting
+SNIPPETS = {
+    "model.pkl only": "import joblib; joblib.load(os.path.join('model', 'model.pkl'))",
+    "import app": "import app",
+}
+
+HEAVY_MODULES = ["lightkurve", "astroquery", "matplotlib.pyplot", "scipy.signal"]
+
+def time_snippet(code: str):
+    script = (
+        "import os, sys, time, json\n"
+        "t0 = time.perf_counter()\n"
+        f"{code}\n"
+        "elapsed = time.perf_counter() - t0\n"
+        f"print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", script], cwd=project_root, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of a backend worker.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'stage':>16} {'median [s]':>11} {'min [s]':>9}  heavy modules loaded")
+    for name, code in SNIPPETS.items():
+        runs = [time_snippet(code) for _ in range(args.repeat)]
+        seconds = [r["seconds"] for r in runs]
+        print(f"{name:>16} {np.median(seconds):>11.3f} {np.min(seconds):>9.3f}  {', '.join(runs[-1]['loaded']) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+
+def write_columns(df: pd.DataFrame, path: str):
+    # One .npy per column, written to a temp dir and renamed into place
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for col in df.columns:
+        np.save(os.path.join(tmp_path, f"{col}.npy"), df[col].to_numpy())
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+def read_columns(path: str, columns=None, mmap=False):
+    if columns is None:
+        columns = sorted(f[:-4] for f in os.listdir(path) if f.endswith(".npy"))
+    mmap_mode = "r" if mmap else None
+    return {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode=mmap_mode) for col in columns}
+
+class ChunkedTableWriter:
+    """
+    Append-only table stored as one column directory per chunk.
+    - Each chunk (e.g. one star) is written atomically under `parts/<key>`.
+    - manifest.json records finished and empty keys plus the column order, so
+      an interrupted build resumes by skipping keys it already has.
+    """
+
+    def __init__(self, path: str, fresh=False):
+        self.path = path
+        if fresh:
+            shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(os.path.join(path, "parts"), exist_ok=True)
+
+        self.manifest = {"columns": None, "done": [], "empty": []}
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        self._seen = set(self.manifest["done"]) | set(self.manifest["empty"])
+
+    def has(self, key):
+        return str(key) in self._seen
+
+    def _save_manifest(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def append(self, key, df: pd.DataFrame):
+        if self.manifest["columns"] is None:
+            self.manifest["columns"] = list(df.columns)
+        write_columns(df[self.manifest["columns"]], os.path.join(self.path, "parts", str(key)))
+        self.manifest["done"].append(str(key))
+        self._seen.add(str(key))
+        self._save_manifest()
+
+    def mark_empty(self, key):
+        self.manifest["empty"].append(str(key))
+        self._seen.add(str(key))
+        self._save_manifest()
+
+def iter_chunks(path: str, columns=None):
+    # One DataFrame per finished chunk, in the order they were written
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    for key in manifest["done"]:
+        yield pd.DataFrame(read_columns(os.path.join(path, "parts", key), columns or manifest["columns"]))
+
+def read_chunked_table(path: str, columns=None):
+    chunks = list(iter_chunks(path, columns))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+def export_csv(path: str, csv_path: str):
+    # Streams chunk by chunk, so memory stays bounded by the largest chunk
+    first = True
+    for chunk in iter_chunks(path):
+        chunk.to_csv(csv_path, mode="w" if first else "a", header=first, index=False)
+        first = False
+
+def per_star_columns(df: pd.DataFrame, key="star_id"):
+    # Columns that hold a single value per star (NaN counts as a value)
+    if df.empty:
+        return []
+    nunique = df.groupby(key).nunique(dropna=False)
+    return [col for col in nunique.columns if (nunique[col] <= 1).all()]
+
+def write_bundle(df: pd.DataFrame, path: str, key="star_id"):
+    """
+    Write a per-cadence table as a bundle directory:
+    - cadences/ holds the columns that vary within a star (plus the key),
+    - stars/ holds the per-star constants (teff, radius, depth, ...) once per star,
+    - meta.json keeps the original column order.
+    Every column is a typed .npy file, so reads are a memcpy or an mmap.
+    """
+    star_cols = per_star_columns(df, key)
+    cadence_cols = [col for col in df.columns if col not in star_cols]
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    write_columns(df[cadence_cols], os.path.join(tmp_path, "cadences"))
+    stars = df.drop_duplicates(key)[[key] + star_cols].reset_index(drop=True)
+    write_columns(stars, os.path.join(tmp_path, "stars"))
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({"key": key, "columns": list(df.columns), "star_columns": star_cols}, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+def export_bundle(path: str, bundle_path: str, key="star_id"):
+    """
+    Write a chunked table as a bundle (same layout as write_bundle) one chunk
+    at a time, so memory stays bounded by the largest chunk.
+    - A first pass finds the per-star columns, row counts and dtypes; the
+      second fills preallocated .npy files through memory maps.
+    - Every chunk must hold whole stars, as the per-star chunks of
+      ChunkedTableWriter do. Columns must be numeric (no object dtype).
+    """
+    with open(os.path.join(path, MANIFEST)) as f:
+        columns = json.load(f)["columns"] or [key]
+
+    star_cols = [col for col in columns if col != key]
+    dtypes, n_cadences, n_stars = {}, 0, 0
+    for chunk in iter_chunks(path):
+        chunk_star_cols = set(per_star_columns(chunk, key))
+        star_cols = [col for col in star_cols if col in chunk_star_cols]
+        for col in columns:
+            dtypes[col] = chunk[col].dtype if col not in dtypes else np.result_type(dtypes[col], chunk[col].dtype)
+        n_cadences += len(chunk)
+        n_stars += chunk[key].nunique()
+    for col, dtype in dtypes.items():
+        if dtype == object:
+            raise ValueError(f"Column {col} is not numeric; use write_bundle(read_chunked_table(...))")
+    if not n_cadences:
+        star_cols = []
+    cadence_cols = [col for col in columns if col not in star_cols]
+
+    tmp_path = f"{bundle_path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    for part in ("cadences", "stars"):
+        os.makedirs(os.path.join(tmp_path, part))
+
+    def open_column(part, col, n):
+        return np.lib.format.open_memmap(os.path.join(tmp_path, part, f"{col}.npy"), mode="w+",
+                                         dtype=dtypes.get(col, np.float64), shape=(n,))
+
+    cadences = {col: open_column("cadences", col, n_cadences) for col in cadence_cols}
+    stars = {col: open_column("stars", col, n_stars) for col in [key] + star_cols}
+    row = star = 0
+    for chunk in iter_chunks(path):
+        for col, out in cadences.items():
+            out[row:row + len(chunk)] = chunk[col].to_numpy()
+        first = chunk.drop_duplicates(key)
+        for col, out in stars.items():
+            out[star:star + len(first)] = first[col].to_numpy()
+        row += len(chunk)
+        star += len(first)
+    for out in list(cadences.values()) + list(stars.values()):
+        out.flush()
+    del cadences, stars
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({"key": key, "columns": columns, "star_columns": star_cols}, f)
+    shutil.rmtree(bundle_path, ignore_errors=True)
+    os.replace(tmp_path, bundle_path)
+
+def read_bundle(path: str, columns=None, mmap=False, expand=True):
+    """
+    Read a bundle back. With expand=True returns the original wide table
+    (per-star constants broadcast onto their cadences); with expand=False
+    returns (cadences, stars) without repeating the constants.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    key = meta["key"]
+    columns = columns or meta["columns"]
+
+    cadence_cols = [col for col in columns if col not in meta["star_columns"] and col != key]
+    star_cols = [col for col in columns if col in meta["star_columns"]]
+
+    cadences = read_columns(os.path.join(path, "cadences"), [key] + cadence_cols, mmap=mmap)
+    stars = read_columns(os.path.join(path, "stars"), [key] + star_cols, mmap=mmap)
+
+    if not expand:
+        return pd.DataFrame(cadences), pd.DataFrame(stars)
+
+    rows = pd.Index(stars[key]).get_indexer(cadences[key])
+    table = dict(cadences)
+    for col in star_cols:
+        table[col] = np.asarray(stars[col])[rows]
+    return pd.DataFrame({col: table[col] for col in columns if col in table})
+
+def read_table(path: str, columns=None):
+    # .csv paths are parsed as text, anything else is a bundle directory
+    if path.endswith(".csv"):
+        return pd.read_csv(path, usecols=columns)
+    return read_bundle(path, columns)
+
+def write_table(df: pd.DataFrame, path: str):
+    if path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        write_bundle(df, path)
+
+def existing_table(base: str):
+    # The bundle at `base` when one has been written, else the legacy `base`.csv
+    return base if os.path.isdir(base) else base + ".csv"
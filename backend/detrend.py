@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Off by default: the shipped model.pkl was trained on dips found in the raw flux. Set DETREND=1
+# only when serving a model trained on detrended features, or its inputs are out of distribution.
+ENABLED = os.environ.get("DETREND", "0") == "1"
+
+WINDOW_DAYS = 2.0       # running median window; several times the longest transit searched (0.5 d)
+GAP_DAYS = 0.5          # a gap longer than this starts a new segment (quarter boundaries, safe modes)
+CHUNK = 1 << 18         # cadences per running-median call, bounds the temporary memory
+
+def _window(dt: float, window_days=WINDOW_DAYS):
+    # Odd window length in cadences for a cadence spacing of dt days
+    if not np.isfinite(dt) or dt <= 0:
+        return 3
+    w = max(3, int(round(window_days / dt)))
+    return w | 1
+
+def running_median(values, segment, w: int, chunk=CHUNK):
+    """
+    Centered running median of width w (cadences) that never crosses a
+    segment boundary.
+    - Segments are laid out back to back with w NaNs between them, so one
+      pandas rolling median (a skiplist, O(n log w)) covers all of them;
+      NaNs are skipped, so windows shrink at segment edges.
+    - The padded array is processed `chunk` cadences at a time with w // 2
+      cadences of overlap on each side, so temporaries stay bounded for
+      arbitrarily long curves.
+    values must be grouped by segment (segment numbers non-decreasing).
+    """
+    n = len(values)
+    if n == 0:
+        return np.zeros(0)
+    pos = np.arange(n) + segment * w
+    padded = np.full(pos[-1] + 1, np.nan)
+    padded[pos] = values
+
+    half = w // 2
+    out = np.empty(len(padded))
+    for start in range(0, len(padded), chunk):
+        stop = min(len(padded), start + chunk)
+        lo, hi = max(0, start - half), min(len(padded), stop + half)
+        rolled = pd.Series(padded[lo:hi]).rolling(w, center=True, min_periods=1).median().to_numpy()
+        out[start:stop] = rolled[start - lo:stop - lo]
+    return out[pos]
+
+def trend(df: pd.DataFrame, window_days=WINDOW_DAYS, gap_days=GAP_DAYS):
+    """
+    Slow flux baseline of every cadence (same row order as df).
+    - Each star's curve is sorted by time and cut into segments at gaps
+      longer than gap_days; each segment gets its own running median over
+      window_days, so quarter offsets and stellar variability are followed
+      while transits (much shorter than the window) are not.
+    - The window length in cadences comes from each star's median cadence
+      spacing; stars with the same window are processed in one pass.
+    """
+    codes, _ = pd.factorize(df["star_id"])
+    time = df["time"].to_numpy(dtype=np.float64)
+    flux = df["flux"].to_numpy(dtype=np.float64)
+
+    order = np.lexsort((time, codes))
+    c, t, f = codes[order], time[order], flux[order]
+
+    same_star = np.zeros(len(t), dtype=bool)
+    same_star[1:] = c[1:] == c[:-1]
+    dt = np.diff(t, prepend=np.nan)
+    new_segment = ~same_star | ~(dt <= gap_days)
+    segment = np.cumsum(new_segment) - 1
+
+    # Median cadence spacing per star -> window length per star
+    spacing = pd.Series(np.where(same_star, dt, np.nan)).groupby(c).median().to_numpy()
+    windows = np.array([_window(s, window_days) for s in spacing])
+    row_window = windows[c]
+
+    baseline = np.empty(len(t))
+    for w in np.unique(windows):
+        rows = np.flatnonzero(row_window == w)
+        _, seg = np.unique(segment[rows], return_inverse=True)
+        baseline[rows] = running_median(f[rows], seg, int(w))
+
+    out = np.empty(len(t))
+    out[order] = baseline
+    return out
+
+def detrended(df: pd.DataFrame, **kwargs):
+    """
+    Copy of the star_id/time/flux/flux_err columns with flux and flux_err
+    divided by the trend: relative flux around 1, quarter offsets and
+    variability removed.
+    """
+    baseline = trend(df, **kwargs)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "star_id": df["star_id"].to_numpy(),
+            "time": df["time"].to_numpy(dtype=np.float64),
+            "flux": df["flux"].to_numpy(dtype=np.float64) / baseline,
+            "flux_err": df["flux_err"].to_numpy(dtype=np.float64) / baseline,
+        }, index=df.index)
@@ -0,0 +1,74 @@
+import numpy as np
+
+METHODS = ("minmax", "lttb")
+
+def _finite(y):
+    # NaN flux never wins a bucket
+    return np.where(np.isnan(y), np.inf, y), np.where(np.isnan(y), -np.inf, y)
+
+def minmax(x, y, n_out: int):
+    """
+    Indices of a min/max-per-bucket downsample to about n_out points.
+    - The curve is cut into n_out // 2 buckets of equal cadence count; each
+      bucket keeps its lowest and highest sample, in time order, so every dip
+      deeper than the noise survives.
+    - Fully vectorized: buckets are rows of a padded (buckets, size) array.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    size = int(np.ceil(n / max(1, n_out // 2)))
+    buckets = int(np.ceil(n / size))
+    low, high = _finite(np.asarray(y, dtype=np.float64))
+    low = np.concatenate([low, np.full(buckets * size - n, np.inf)]).reshape(buckets, size)
+    high = np.concatenate([high, np.full(buckets * size - n, -np.inf)]).reshape(buckets, size)
+
+    starts = np.arange(buckets) * size
+    lo = starts + low.argmin(axis=1)
+    hi = starts + high.argmax(axis=1)
+    # Both extremes of a bucket, earlier one first; duplicates (flat buckets) dropped
+    return np.unique(np.concatenate([lo, hi]))
+
+def lttb(x, y, n_out: int):
+    """
+    Indices of a Largest-Triangle-Three-Buckets downsample to n_out points.
+    - First and last samples are kept; the rest is cut into n_out - 2 buckets.
+    - Each bucket keeps the sample forming the largest triangle with the point
+      kept in the previous bucket and the mean of the next bucket. The choice
+      depends on the previous one, so buckets are walked in order, but each
+      bucket's areas are one vectorized expression.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    y = np.where(np.isnan(y), np.nanmedian(y), y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # Means of every bucket, plus the last sample as the final "next bucket"
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        cx, cy = mean_x[b + 1], mean_y[b + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[b + 1] = a
+    return keep
+
+def downsample(x, y, n_out: int, method="minmax"):
+    """(x, y) reduced to about n_out points with `method` (one of METHODS)."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method {method!r}, expected one of {METHODS}")
+    idx = (minmax if method == "minmax" else lttb)(x, y, n_out)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
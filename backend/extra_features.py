@@ -1,77 +1,164 @@
 import pandas as pd
 import numpy as np
 import os
+import argparse
+from columnar import read_table, write_table, existing_table
 
-# --- READ CSV ---
-project_root = os.path.dirname(os.path.abspath(__file__)) 
-out_file_path = os.path.join(project_root, 'data', 'data_step2.csv')
-df = pd.read_csv(out_file_path)   #add location CSV file 
+project_root = os.path.dirname(os.path.abspath(__file__))
 
-def calculate_additional_params(df: pd.DataFrame):
+# Set EXTRA_FEATURES_DEBUG=1 to print the parameter report of every star
+DEBUG = os.environ.get("EXTRA_FEATURES_DEBUG", "") == "1"
 
-    # --- CONSTANTS ---
-    G = 6.67430e-11                   # Gravitational constant (m^3 kg^-1 s^-2)
-    R_sun = df['radius'][0]
-    M_sun = df['mass'][0]
-    R_earth = 6.371e6                 # Earth radius (m)
-    seconds_per_day = 24 * 3600       # Conversion from days to seconds
+# --- CONSTANTS ---
+G = 6.67430e-11                   # Gravitational constant (m^3 kg^-1 s^-2)
+R_sun = 6.957e8                   # Solar radius (m)
+M_sun = 1.98847e30                # Solar mass (kg)
+R_earth = 6.371e6                 # Earth radius (m)
+seconds_per_day = 24 * 3600       # Conversion from days to seconds
 
+PARAM_COLUMNS = [
+    "stellar_radius", "stellar_mass", "transit_depth", "orbital_period",
+    "transit_epoch", "transit_duration", "transit_snr",
+    "planetary_radius", "planetary_radius_earth", "semimajor_axis",
+    "orbital_velocity", "impact_parameter", "inclination", "ingr_egr_duration",
+]
+
+def _column(df: pd.DataFrame, col: str):
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return df[col].to_numpy(dtype=np.float64)
+
+def planet_parameters(df: pd.DataFrame):
+    """
+    Derived planetary parameters of every row of a feature table, in one NumPy pass.
+    - Period, duration and depth come from the BLS search (period_search.py);
+      rows without a BLS period fall back to the dip-based features.
+    - Returns a DataFrame with the PARAM_COLUMNS (SI units, except days for
+      period/duration, km/s for velocity, degrees and hours), same index as df.
+    """
     # --- EXTRACT NEEDED PARAMETERS ---
-    R_star = df['radius'][0] * R_sun          # stellar radius in meters
-    M_star = df['mass'][0] * M_sun            # stellar mass in kg
-    depth = df['depth_over_duration'][0]                    # fractional transit depth
-    P_days = df['duration_mean'][0]                # assuming duration is orbital period in days (adjust if needed)
+    R_star = _column(df, 'radius') * R_sun          # stellar radius in meters
+    M_star = _column(df, 'mass') * M_sun            # stellar mass in kg
+
+    bls = np.isfinite(_column(df, 'bls_period'))
+    depth = np.where(bls, _column(df, 'bls_depth'), _column(df, 'depth_over_duration'))   # fractional transit depth
+    P_days = np.where(bls, _column(df, 'bls_period'), _column(df, 'duration_mean'))       # orbital period in days
+    T_days = np.where(bls, _column(df, 'bls_duration'), _column(df, 'duration_mean'))     # transit duration in days
+    epoch = np.where(bls, _column(df, 'bls_epoch'), np.nan)                               # mid-transit time of the first transit
+    snr = np.where(bls, _column(df, 'bls_snr'), np.nan)
     P_sec = P_days * seconds_per_day                # convert to seconds
 
-    # --- PLANETARY RADIUS ---
-    R_p = R_star * np.sqrt(depth)                   # in meters
-    R_p_Re = R_p / R_earth                          # in Earth radii
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # --- PLANETARY RADIUS ---
+        R_p = R_star * np.sqrt(depth)                   # in meters
+        R_p_Re = R_p / R_earth                          # in Earth radii
 
-    # --- SEMI-MAJOR AXIS ---
-    a = ((G * M_star * P_sec**2) / (4 * np.pi**2))**(1/3)
+        # --- SEMI-MAJOR AXIS ---
+        a = ((G * M_star * P_sec**2) / (4 * np.pi**2))**(1/3)
 
-    # --- ORBITAL VELOCITY ---
-    v_orb = (2 * np.pi * a) / P_sec                 # m/s
-    v_orb_km = v_orb / 1000                         # km/s
+        # --- ORBITAL VELOCITY ---
+        v_orb = (2 * np.pi * a) / P_sec                 # m/s
+        v_orb_km = v_orb / 1000                         # km/s
 
-    # --- IMPACT PARAMETER ---
-    k = R_p / R_star
-    T = df['duration_mean'][0] * seconds_per_day    # total transit duration in seconds
-    b = np.sqrt(max(0, (1 + k)**2 - (a / R_star * np.sin(np.pi * T / P_sec))**2))
+        # --- IMPACT PARAMETER ---
+        k = R_p / R_star
+        T = T_days * seconds_per_day                    # total transit duration in seconds
+        b = np.sqrt(np.maximum(0, (1 + k)**2 - (a / R_star * np.sin(np.pi * T / P_sec))**2))
 
-    # --- INCLINATION ---
-    i = np.degrees(np.arccos(np.clip(b * R_star / a, -1, 1)))
+        # --- INCLINATION ---
+        i = np.degrees(np.arccos(np.clip(b * R_star / a, -1, 1)))
 
-    # --- INGRESS / EGRESS DURATION ---
-    tau = (R_p * P_sec) / (np.pi * a)               # seconds
-    tau_hr = tau / 3600                             # hours
+        # --- INGRESS / EGRESS DURATION ---
+        tau = (R_p * P_sec) / (np.pi * a)               # seconds
+        tau_hr = tau / 3600                             # hours
 
+    return pd.DataFrame({
+        "stellar_radius": R_star,
+        "stellar_mass": M_star,
+        "transit_depth": depth,
+        "orbital_period": P_days,
+        "transit_epoch": epoch,
+        "transit_duration": T_days,
+        "transit_snr": snr,
+        "planetary_radius": R_p,
+        "planetary_radius_earth": R_p_Re,
+        "semimajor_axis": a,
+        "orbital_velocity": v_orb_km,
+        "impact_parameter": b,
+        "inclination": i,
+        "ingr_egr_duration": tau_hr,
+    }, index=df.index)
+
+def print_report(row):
     # --- PRINT RESULTS ---
     print("\n🪐 Exoplanetary Parameter Estimation\n" + "-"*45)
-    print(f"Stellar Radius (R★): {R_star:.3e} m")
-    print(f"Stellar Mass   (M★): {M_star:.3e} kg")
-    print(f"Transit Depth (δ): {depth:.3e}")
-    print(f"Orbital Period (P): {P_days:.3f} days")
-
-    print(f"\n→ Planetary Radius (Rp): {R_p:.3e} m ({R_p_Re:.3f} R⊕)")
-    print(f"→ Semi-Major Axis (a): {a:.3e} m")
-    print(f"→ Orbital Velocity (v): {v_orb_km:.3f} km/s")
-    print(f"→ Impact Parameter (b): {b:.3f}")
-    print(f"→ Inclination (i): {i:.2f}°")
-    print(f"→ Ingress/Egress Duration (τ): {tau_hr:.3f} hours")
+    print(f"Stellar Radius (R★): {row['stellar_radius']:.3e} m")
+    print(f"Stellar Mass   (M★): {row['stellar_mass']:.3e} kg")
+    print(f"Transit Depth (δ): {row['transit_depth']:.3e}")
+    print(f"Orbital Period (P): {row['orbital_period']:.3f} days")
+    print(f"Transit Epoch (T0): {row['transit_epoch']:.4f}")
+    print(f"Transit SNR: {row['transit_snr']:.1f}")
+
+    print(f"\n→ Planetary Radius (Rp): {row['planetary_radius']:.3e} m ({row['planetary_radius_earth']:.3f} R⊕)")
+    print(f"→ Semi-Major Axis (a): {row['semimajor_axis']:.3e} m")
+    print(f"→ Orbital Velocity (v): {row['orbital_velocity']:.3f} km/s")
+    print(f"→ Impact Parameter (b): {row['impact_parameter']:.3f}")
+    print(f"→ Inclination (i): {row['inclination']:.2f}°")
+    print(f"→ Ingress/Egress Duration (τ): {row['ingr_egr_duration']:.3f} hours")
     print("-"*45)
 
-    additionalParams = {
-        'stellar_radius': R_star,
-        'stellar_mass': M_star,
-        'transit_depth': depth,
-        'orbital_period': P_days,
-        'planetary_radius': [R_p, R_p_Re],
-        'semimajor_axis': a,
-        'orbital_velocity': v_orb_km,
-        'impact_parameter': b,
-        'inclination': i,
-        'ingr_egr_duration': tau_hr
-    }
-
-    return additionalParams
\ No newline at end of file
+def additional_params_records(df: pd.DataFrame, debug=None):
+    """
+    The `additionalParams` dict of every row of a feature table, in the
+    format /predict returns, computed with one planet_parameters() call.
+    """
+    params = planet_parameters(df)
+    records = []
+    for row in params.to_dict("records"):
+        if DEBUG if debug is None else debug:
+            print_report(row)
+        records.append({
+            'stellar_radius': row['stellar_radius'],
+            'stellar_mass': row['stellar_mass'],
+            'transit_depth': row['transit_depth'],
+            'orbital_period': row['orbital_period'],
+            'transit_epoch': row['transit_epoch'],
+            'transit_duration': row['transit_duration'],
+            'transit_snr': row['transit_snr'],
+            'planetary_radius': [row['planetary_radius'], row['planetary_radius_earth']],
+            'semimajor_axis': row['semimajor_axis'],
+            'orbital_velocity': row['orbital_velocity'],
+            'impact_parameter': row['impact_parameter'],
+            'inclination': row['inclination'],
+            'ingr_egr_duration': row['ingr_egr_duration'],
+        })
+    return records
+
+def calculate_additional_params(df: pd.DataFrame, debug=None):
+    # Parameters of the first star of the table
+    return additional_params_records(df.iloc[:1], debug)[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Derived planetary parameters of every star of a feature table.")
+    parser.add_argument("--input", default=existing_table(os.path.join(project_root, 'data', 'features')))
+    parser.add_argument("--output", help="bundle directory or .csv path for the per-star parameters")
+    parser.add_argument("--debug", action="store_true", help="print the report of every star")
+    args = parser.parse_args()
+
+    # --- READ TABLE ---
+    df = read_table(args.input)
+    params = planet_parameters(df)
+    params.insert(0, "star_id", df["star_id"].to_numpy())
+
+    if args.debug:
+        for row in params.to_dict("records"):
+            print_report(row)
+
+    if args.output:
+        write_table(params, args.output)
+        print(f"Saved {len(params)} stars to {args.output}")
+    else:
+        print(params.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
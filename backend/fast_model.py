@@ -0,0 +1,147 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODEL_PATH = os.path.join(project_root, 'model', 'model.pkl')
+DEFAULT_EXPORT_PATH = os.path.join(project_root, 'model', 'model_fast.npz')
+
+def compile_artifact(artifact: dict):
+    """
+    Flatten the model.pkl artifact written by ml-model.py (a binary
+    CalibratedClassifierCV over StandardScaler + LogisticRegression pipelines)
+    into plain arrays, one row per calibrated fold:
+    - mean/scale: scaler parameters, coef/intercept: logistic regression,
+    - a/b: sigmoid calibrators, or x_thresholds/y_thresholds (+ offsets) for
+      isotonic ones.
+    Raises ValueError for any other model structure.
+    """
+    model = artifact["model"]
+    folds = getattr(model, "calibrated_classifiers_", None)
+    if folds is None or len(model.classes_) != 2:
+        raise ValueError("Expected a fitted binary CalibratedClassifierCV")
+
+    arrays = {
+        "feature_order": np.asarray(artifact["feature_order"]),
+        "classes": np.asarray(model.classes_),
+        "method": np.asarray(model.method),
+        "mean": [], "scale": [], "coef": [], "intercept": [],
+        "a": [], "b": [], "x_thresholds": [], "y_thresholds": [], "offsets": [0],
+    }
+
+    for fold in folds:
+        pipe = getattr(fold, "estimator", None) or fold.base_estimator
+        steps = dict(pipe.named_steps) if hasattr(pipe, "named_steps") else {}
+        scaler, lr = steps.get("scaler"), steps.get("lr")
+        if scaler is None or lr is None or len(fold.calibrators) != 1:
+            raise ValueError("Expected StandardScaler + LogisticRegression pipelines with one calibrator each")
+
+        n_features = len(arrays["feature_order"])
+        arrays["mean"].append(scaler.mean_ if scaler.with_mean else np.zeros(n_features))
+        arrays["scale"].append(scaler.scale_ if scaler.with_std else np.ones(n_features))
+        arrays["coef"].append(lr.coef_[0])
+        arrays["intercept"].append(lr.intercept_[0])
+
+        calibrator = fold.calibrators[0]
+        if model.method == "sigmoid":
+            arrays["a"].append(calibrator.a_)
+            arrays["b"].append(calibrator.b_)
+        else:
+            arrays["x_thresholds"].append(calibrator.X_thresholds_)
+            arrays["y_thresholds"].append(calibrator.y_thresholds_)
+            arrays["offsets"].append(arrays["offsets"][-1] + len(calibrator.X_thresholds_))
+
+    for key in ["mean", "scale", "coef", "intercept", "a", "b"]:
+        arrays[key] = np.asarray(arrays[key], dtype=np.float64)
+    for key in ["x_thresholds", "y_thresholds"]:
+        arrays[key] = np.concatenate(arrays[key]) if arrays[key] else np.zeros(0)
+    arrays["offsets"] = np.asarray(arrays["offsets"], dtype=np.int64)
+    return arrays
+
+class FastModel:
+    """
+    NumPy-only scorer equivalent to the artifact's predict_proba:
+    per fold, (x - mean) / scale -> logistic decision -> calibrator, then the
+    class-1 probabilities are averaged over folds (ensemble=True semantics).
+    """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+        self.feature_order = [str(f) for f in arrays["feature_order"]]
+        self.classes_ = arrays["classes"]
+        self.method = str(arrays["method"])
+        self.mean = arrays["mean"][:, None, :]
+        self.scale = arrays["scale"][:, None, :]
+        self.coef = arrays["coef"][:, :, None]
+        self.intercept = arrays["intercept"][:, None]
+
+    @classmethod
+    def from_artifact(cls, artifact: dict):
+        return cls(compile_artifact(artifact))
+
+    @classmethod
+    def load(cls, path=DEFAULT_EXPORT_PATH):
+        with np.load(path, allow_pickle=False) as f:
+            return cls({key: f[key] for key in f.files})
+
+    def save(self, path=DEFAULT_EXPORT_PATH):
+        np.savez(path, **self.arrays)
+
+    def to_matrix(self, X):
+        # DataFrames are reordered to feature_order; arrays must already follow it
+        if isinstance(X, pd.DataFrame):
+            missing = [f for f in self.feature_order if f not in X.columns]
+            if missing:
+                raise ValueError(f"Missing features: {missing}")
+            X = X[self.feature_order]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != len(self.feature_order):
+            raise ValueError(f"Expected {len(self.feature_order)} features in order {self.feature_order}, got {X.shape[1]}")
+        # Refuse missing/infinite values as sklearn's check_array does, rather than score them as NaN
+        if np.isnan(X).any():
+            raise ValueError("Input X contains NaN.")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float64').")
+        return X
+
+    def fold_probabilities(self, X):
+        """Class-1 probability of every calibrated fold, shape (n_folds, n_samples)."""
+        X = self.to_matrix(X)
+        Z = (X[None, :, :] - self.mean) / self.scale
+        decision = np.matmul(Z, self.coef)[:, :, 0] + self.intercept
+
+        if self.method == "sigmoid":
+            a = self.arrays["a"][:, None]
+            b = self.arrays["b"][:, None]
+            p = 1.0 / (1.0 + np.exp(a * decision + b))
+        else:
+            offsets = self.arrays["offsets"]
+            p = np.stack([
+                np.interp(d, self.arrays["x_thresholds"][lo:hi], self.arrays["y_thresholds"][lo:hi])
+                for d, lo, hi in zip(decision, offsets[:-1], offsets[1:])
+            ])
+
+        # Same clean-up as sklearn's _CalibratedClassifier for values just above 1
+        p[(1.0 < p) & (p <= 1.0 + 1e-5)] = 1.0
+        return p
+
+    def predict_proba(self, X):
+        p = self.fold_probabilities(X).mean(axis=0)
+        return np.column_stack([1.0 - p, p])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile model.pkl into NumPy arrays for FastModel.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--output", default=DEFAULT_EXPORT_PATH)
+    args = parser.parse_args()
+
+    import joblib
+    FastModel.from_artifact(joblib.load(args.model)).save(args.output)
+    print(f"Saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
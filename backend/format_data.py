@@ -1,8 +1,12 @@
 import pandas as pd
-from lightkurve import search_lightcurve
-from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
 import numpy as np
 import os
+import argparse
+from transit_features import add_transit_features
+from archive_cache import get_archive_cache
+from stellar_catalog import get_stellar_catalog, koi_labels, KOI_TABLE
+from columnar import read_table, write_table
+from metrics import timed, LOOKUPS
 
 def uniform_first_col_value(df: pd.DataFrame):
     """
@@ -28,7 +32,10 @@ def uniform_first_col_value(df: pd.DataFrame):
 
     return first_val
 
-def fetch_by_kic(kic_id: int):
+def query_archive_by_kic(kic_id: int):
+    # Imported here: astroquery is slow to import and only needed on a cache miss
+    from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
+
     # Kepler DR25 stellar parameters (units: teff[K], logg[cgs], feh[dex], mass[Rsun? Msun?], radius[Rsun])
     star_tbl = NasaExoplanetArchive.query_criteria(
         table="q1_q17_dr25_stellar",
@@ -46,14 +53,13 @@ def fetch_by_kic(kic_id: int):
     mass = float(row['mass'].value)
     rad = float(row['radius'].value)
 
-    # KOI dispositions for exoplanet flag
+    # KOI dispositions for exoplanet flag (1 = CONFIRMED/CANDIDATE KOI)
     koi_tbl = NasaExoplanetArchive.query_criteria(
-        table="q1_q17_dr25_koi",
+        table=KOI_TABLE,
         select="kepid, koi_disposition",
         where=f"kepid={int(kic_id)}"
-    )
-    n_conf = int(sum(koi_tbl["koi_disposition"] == "CONFIRMED")) if len(koi_tbl) else 0
-    n_cand = int(sum(koi_tbl["koi_disposition"] == "CANDIDATE")) if len(koi_tbl) else 0
+    ).to_pandas()
+    label = int(koi_labels(koi_tbl).get(int(kic_id), 0))
 
     return {
         "star_id": int(kic_id),
@@ -62,12 +68,22 @@ def fetch_by_kic(kic_id: int):
         "mass": mass,
         "logg": logg,
         "feh": feh,
-        "label": n_conf + n_cand,
+        "label": label,
     }
 
+def fetch_by_kic(kic_id: int):
+    # The offline DR25 snapshot answers everything when it is installed
+    catalog = get_stellar_catalog()
+    if catalog is not None:
+        LOOKUPS.inc(source="catalog")
+        return catalog.lookup(kic_id)
+
+    LOOKUPS.inc(source="cache")
+
+    # Otherwise served from the local cache; the archive is only queried on a miss
+    return get_archive_cache().get_or_fetch(int(kic_id), query_archive_by_kic)
+
 def add_features(df: pd.DataFrame):
-    star_id = uniform_first_col_value(df)
-    data = fetch_by_kic(star_id)
     stellarParamsAvailable = False
 
     if ('teff' in df.columns) \
@@ -78,77 +94,43 @@ def add_features(df: pd.DataFrame):
 
         stellarParamsAvailable = True
 
+    # Archive lookups only happen when the client did not send stellar parameters
     if not stellarParamsAvailable:
-        if data is not None:
-            df['label'] = data['label']
-            df['teff'] = data['teff']
-            df['radius'] = data['radius']
-            df['mass'] = data['mass']
-            df['logg'] = data['logg']
-            df['feh'] = data['feh']
-        
-        else:
-            raise ValueError("Star not available in the database, please manually enter the star's: teff, radius, mass, logg, feh.")
-
-    # Add empty columns for new features
-    df["depth"] = np.nan
-    df["duration"] = np.nan
-    df["ingress"] = np.nan
-    df["egress"] = np.nan
-    df["symmetry"] = np.nan
-
-    # Process star by star
-    for star_id, group in df.groupby("star_id"):
-        flux = group["flux"].values
-        time = group["time"].values
-        flux_err = group["flux_err"].values
-
-        # Robust baseline = median flux
-        baseline = np.median(flux)
-
-        # Threshold just below baseline
-        threshold = baseline - 2 * np.median(flux_err)
-
-        # Find dip points
-        dip_mask = flux < threshold
-
-        if np.any(dip_mask):
-            # Depth = (baseline - min_flux) / baseline
-            min_flux = np.min(flux[dip_mask])
-            depth = (baseline - min_flux) / baseline
-
-            # Duration = time difference between first and last dip points
-            dip_times = time[dip_mask]
-            duration = dip_times[-1] - dip_times[0]
-
-            # Ingress = start to min flux
-            t_start = dip_times[0]
-            t_min = time[np.argmin(flux)]
-            ingress = t_min - t_start if t_min > t_start else np.nan
-
-            # Egress = min flux to end
-            t_end = dip_times[-1]
-            egress = t_end - t_min if t_end > t_min else np.nan
-
-            # Symmetry ratio
-            symmetry = ingress / egress if (ingress and egress and egress > 0) else np.nan
-        else:
-            depth = duration = ingress = egress = symmetry = np.nan
-
-        # Assign results back to all rows of this star
-        df.loc[df["star_id"] == star_id, "depth"] = depth
-        df.loc[df["star_id"] == star_id, "duration"] = duration
-        df.loc[df["star_id"] == star_id, "ingress"] = ingress
-        df.loc[df["star_id"] == star_id, "egress"] = egress
-        df.loc[df["star_id"] == star_id, "symmetry"] = symmetry
+        # One (cached) archive lookup per distinct star, then broadcast onto its rows
+        stellar = {}
+        with timed("archive_lookup"):
+            for star_id in df["star_id"].unique():
+                data = fetch_by_kic(star_id)
+                if data is None:
+                    raise ValueError(f"Star {star_id} not available in the database, please manually enter the star's: teff, radius, mass, logg, feh.")
+                stellar[star_id] = data
+
+        for col in ["label", "teff", "radius", "mass", "logg", "feh"]:
+            df[col] = df["star_id"].map({k: v[col] for k, v in stellar.items()})
+
+    elif 'label' not in df.columns:
+        # Unknown disposition; extract_features still expects the column
+        df['label'] = np.nan
+
+    # Transit features for every star in one grouped pass
+    df = add_transit_features(df)
 
     return df
 
 project_root = os.path.dirname(os.path.abspath(__file__))
-data_path = os.path.join(project_root, 'data', 'input-test.csv')
-df = pd.read_csv(data_path)
 
-df = add_features(df)
+def main():
+    parser = argparse.ArgumentParser(description="Attach stellar parameters and transit features to a light curve CSV.")
+    parser.add_argument("--input", default=os.path.join(project_root, 'data', 'input-test.csv'))
+    parser.add_argument("--output", default=os.path.join(project_root, 'data', 'detailed_data'),
+                        help="bundle directory, or a .csv path")
+    args = parser.parse_args()
+
+    df = read_table(args.input)
+
+    df = add_features(df)
+
+    write_table(df, args.output)
 
-out_data_path = os.path.join(project_root, 'data', 'detailed_data.csv')
-df.to_csv(out_data_path, index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,582 @@
+import io
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from detrend import running_median, _window, GAP_DAYS, ENABLED as DETREND_ENABLED
+from period_search import bls, PERIOD_COLUMNS
+from star_aggregator import FEATURE_COLUMNS, STELLAR_COLUMNS, _pairwise_sum_of_constant
+from format_data import fetch_by_kic
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+# Feature state of every monitored star, shared by the workers; empty string keeps it in memory only
+DEFAULT_STATE_PATH = os.environ.get("FEATURE_STATE_PATH", os.path.join(project_root, 'data', 'feature_state.sqlite')) or None
+DEFAULT_MAXSIZE = int(os.environ.get("FEATURE_STATE_SIZE", 256))     # states kept in memory
+# INCREMENTAL_FEATURES=1 makes /predict use the stored state unless ?incremental=0
+DEFAULT_INCREMENTAL = os.environ.get("INCREMENTAL_FEATURES", "0") == "1"
+
+STATE_VERSION = 2
+EXACT_BAND = 0.05       # robust sigmas around the first median whose values each median sketch keeps exactly
+SKETCH_RANGE = 50.0     # robust sigmas around the first median covered by each sketch's histogram
+SKETCH_BINS = 20000     # histogram bins, for a median that left the exact band
+DIP_MARGIN = 0.5        # x flux_err median: band around the dip threshold kept as candidates
+MAX_CANDIDATES = 20000  # candidate cadences kept at each end of the history
+REBUILD_GROWTH = 0.25   # rebuild the state (and rerun the period search) once the history grew by this fraction
+
+class NeedsRebuild(Exception):
+    """The incremental state can no longer stay within tolerance; recompute from the full history."""
+
+# --- Mergeable moments (count, mean, M2, M3, M4), Pebay's pairwise update ---
+
+def _batch_moments(x):
+    n = len(x)
+    if n == 0:
+        return np.zeros(5)
+    mean = x.mean()
+    d = x - mean
+    d2 = d * d
+    return np.array([n, mean, d2.sum(), (d2 * d).sum(), (d2 * d2).sum()])
+
+def _merge_moments(a, b):
+    na, nb = a[0], b[0]
+    if na == 0:
+        return b.copy()
+    if nb == 0:
+        return a.copy()
+    n = na + nb
+    delta = b[1] - a[1]
+    mean = a[1] + delta * nb / n
+    M2 = a[2] + b[2] + delta**2 * na * nb / n
+    M3 = (a[3] + b[3] + delta**3 * na * nb * (na - nb) / n**2
+          + 3 * delta * (na * b[2] - nb * a[2]) / n)
+    M4 = (a[4] + b[4] + delta**4 * na * nb * (na * na - na * nb + nb * nb) / n**3
+          + 6 * delta**2 * (na * na * b[2] + nb * nb * a[2]) / n**2
+          + 4 * delta * (na * b[3] - nb * a[3]) / n)
+    return np.array([n, mean, M2, M3, M4])
+
+def _describe(m):
+    # mean, population std, skew, excess kurtosis (NaN skew/kurtosis for constant data, as scipy)
+    n, mean, M2, M3, M4 = m
+    with np.errstate(all="ignore"):
+        m2, m3, m4 = M2 / n, M3 / n, M4 / n
+        zero = m2 <= (np.finfo(np.float64).resolution * mean) ** 2
+        skewness = np.nan if zero else m3 / m2 ** 1.5
+        kurt = np.nan if zero else m4 / m2 ** 2 - 3.0
+        return mean, np.sqrt(m2), skewness, kurt
+
+# --- Median sketch: exact values in a narrow band around the median, a histogram for the rest ---
+
+def _sketch_new(values, sigma):
+    center = float(np.median(values))
+    band, half_range = EXACT_BAND * sigma, SKETCH_RANGE * sigma
+    return {
+        "lo": center - band, "hi": center + band, "below": 0, "above": 0, "values": np.zeros(0),
+        "start": center - half_range, "width": 2 * half_range / SKETCH_BINS,
+        "counts": np.zeros(SKETCH_BINS + 2, dtype=np.int64),
+    }
+
+def _sketch_split(sketch, values):
+    # (count below, count above, values inside) of the exact band, and the histogram counts
+    inside = (values >= sketch["lo"]) & (values < sketch["hi"])
+    # Bin 0 / the last bin are the under- and overflow
+    idx = np.floor((values - sketch["start"]) / sketch["width"])
+    idx = np.clip(np.nan_to_num(idx, nan=0.0), -1, SKETCH_BINS).astype(np.int64) + 1
+    counts = np.bincount(idx, minlength=SKETCH_BINS + 2)
+    return int((values < sketch["lo"]).sum()), int((values >= sketch["hi"]).sum()), values[inside], counts
+
+def _sketch_add(sketch, values):
+    below, above, inside, counts = _sketch_split(sketch, values)
+    sketch["below"] += below
+    sketch["above"] += above
+    sketch["values"] = np.concatenate([sketch["values"], inside])
+    sketch["counts"] += counts
+
+def _sketch_median(sketch, extra):
+    """
+    Median of the sketched values plus `extra`: np.median's exact value
+    while the middle order statistics fall inside the exact band, else
+    interpolated in the histogram (within one bin).
+    """
+    below, above, inside, counts = _sketch_split(sketch, extra)
+    below += sketch["below"]
+    values = np.concatenate([sketch["values"], inside])
+    total = below + sketch["above"] + above + len(values)
+    if total == 0:
+        return np.nan
+    k = [(total - 1) // 2 - below, total // 2 - below]
+    if k[0] >= 0 and k[1] < len(values):
+        part = np.partition(values, sorted(set(k)))
+        return (part[k[0]] + part[k[1]]) / 2 if k[0] != k[1] else part[k[0]]
+
+    cum = np.cumsum(sketch["counts"] + counts)
+    b = int(np.searchsorted(cum, total / 2))
+    if b == 0 or b == SKETCH_BINS + 1:
+        raise NeedsRebuild("median moved outside the sketch range")
+    return sketch["start"] + (b - 1 + (total / 2 - cum[b - 1]) / (cum[b] - cum[b - 1])) * sketch["width"]
+
+def _robust_sigma(values):
+    # MAD sigma, with fallbacks for constant values
+    median = np.median(values)
+    return 1.4826 * np.median(np.abs(values - median)) or abs(median) * 1e-3 or 1e-6
+
+def _sum_of_constant(value, n, memo):
+    # Scalar _pairwise_sum_of_constant; both halves of a split differ by at most 8, so memoizing on n keeps it O(log n)
+    if n <= 128:
+        return float(_pairwise_sum_of_constant([value], [n])[0])
+    if n not in memo:
+        half = n // 2
+        half -= half % 8
+        memo[n] = _sum_of_constant(value, half, memo) + _sum_of_constant(value, n - half, memo)
+    return memo[n]
+
+def _history_digests(time, flux, flux_err, n):
+    """
+    Digests of the first n cadences and of the whole history, in one pass.
+    Cadences are hashed as interleaved (time, flux, flux_err) rows, so a
+    history's prefix hashes like the shorter history it extends.
+    """
+    rows = np.column_stack([time, flux, flux_err])
+    h = hashlib.blake2b(digest_size=16)
+    h.update(rows[:n])
+    prefix = h.hexdigest()
+    h.update(rows[n:])
+    return prefix, h.hexdigest()
+
+def time_ordered(df: pd.DataFrame):
+    # Incremental features need strictly increasing times (add_features keeps the row order as given)
+    return bool(np.all(np.diff(df["time"].to_numpy(dtype=np.float64)) > 0))
+
+def _broadcast_moments(value, n):
+    # Mean and std of one per-star value repeated on its n rows, rounded like the aggregate step
+    mean = _sum_of_constant(float(value), n, {}) / n
+    dev = float(value) - mean
+    return mean, float(np.sqrt(_sum_of_constant(dev * dev, n, {}) / n))
+
+class StarFeatureState:
+    """
+    Everything needed to extend one star's features with new cadences
+    without touching its earlier ones.
+    - Flux and flux_err moments merge exactly (up to rounding).
+    - The detrended flux needs each cadence's centered running-median window,
+      so the last 2 * (window // 2) cadences are kept as a tail; the last
+      window // 2 of them are pending (their window is not complete yet) and
+      are evaluated provisionally, exactly like a full recompute does at the
+      end of the curve.
+    - The median baseline and flux_err median come from median sketches of
+      the finalized detrended cadences (+ the pending ones at read time):
+      counts below and above a band of EXACT_BAND robust sigmas around the
+      first median and the exact values inside it (a few % of the cadences),
+      so the median is exact while it stays in the band; outside it the
+      sketch's histogram gives it within one bin.
+    - Only new cadences are scanned for dips. Cadences within DIP_MARGIN of
+      the threshold are kept before the first and after the last clear dip,
+      so the first/last dip times follow small threshold moves; a larger
+      move raises NeedsRebuild.
+    """
+
+    def __init__(self, star_id: int, window: int):
+        self.star_id = int(star_id)
+        self.window = int(window)
+        self.n = 0
+        self.tail = np.zeros((3, 0))          # time, flux, flux_err
+        self.pending = 0
+        self.flux_moments = np.zeros(5)
+        self.err_moments = np.zeros(5)
+        self.flux_sketch = None
+        self.err_sketch = None
+        self.nan_flux = False
+        self.nan_err = False
+        self.min_flux = np.inf
+        self.t_min = np.nan
+        self.first_solid = np.nan
+        self.last_solid = np.nan
+        self.prefix = np.zeros((2, 0))        # time, detrended flux
+        self.suffix = np.zeros((2, 0))
+        self.thr_lo = np.inf
+        self.thr_hi = -np.inf
+        self.bls = dict.fromkeys(PERIOD_COLUMNS, np.nan)
+        self.built_n = 0
+        self.history = None                   # digest of the n cadences the state covers
+
+    @classmethod
+    def build(cls, star_id: int, time, flux, flux_err):
+        # State of a whole history (the window comes from its median cadence spacing)
+        dt = np.diff(time)
+        state = cls(star_id, _window(np.median(dt) if len(dt) else np.nan) if DETREND_ENABLED else 1)
+        state.append(time, flux, flux_err)
+        state.built_n = state.n
+        return state
+
+    def copy(self):
+        other = StarFeatureState(self.star_id, self.window)
+        for key, value in self.__dict__.items():
+            if isinstance(value, np.ndarray):
+                value = value.copy()
+            elif isinstance(value, dict):
+                value = {k: (v.copy() if isinstance(v, np.ndarray) else v) for k, v in value.items()}
+            setattr(other, key, value)
+        return other
+
+    # --- Updates ---
+
+    def _detrend(self, time, flux, flux_err):
+        # Detrended flux / flux_err of a tail-started chunk, segmented at gaps like detrend.trend
+        if not DETREND_ENABLED:
+            return flux, flux_err
+        segment = np.concatenate([[0], np.cumsum(~(np.diff(time) <= GAP_DAYS))])
+        baseline = running_median(flux, segment, self.window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return flux / baseline, flux_err / baseline
+
+    def matches(self, time, flux, flux_err):
+        # The submitted history extends this state: its last tail cadences are the stored tail
+        k = self.tail.shape[1]
+        if len(time) < self.n or self.n == 0:
+            return False
+        stored = self.tail
+        start = self.n - k
+        return (np.array_equal(time[start:self.n], stored[0], equal_nan=True)
+                and np.array_equal(flux[start:self.n], stored[1], equal_nan=True)
+                and np.array_equal(flux_err[start:self.n], stored[2], equal_nan=True))
+
+    def append(self, time, flux, flux_err):
+        """
+        Add cadences that come after the current history, in O(len(new) + window).
+        Raises NeedsRebuild (leaving the state unusable) when the result would
+        leave the documented tolerance; callers work on a copy().
+        """
+        time = np.asarray(time, dtype=np.float64)
+        flux = np.asarray(flux, dtype=np.float64)
+        flux_err = np.asarray(flux_err, dtype=np.float64)
+        if len(time) == 0:
+            return self
+        if self.n and not time[0] > self.tail[0, -1]:
+            raise NeedsRebuild("new cadences do not come after the stored history")
+        if np.any(np.diff(time) <= 0):
+            raise NeedsRebuild("new cadences are not in time order")
+
+        self.flux_moments = _merge_moments(self.flux_moments, _batch_moments(flux))
+        self.err_moments = _merge_moments(self.err_moments, _batch_moments(flux_err))
+
+        # Detrend tail + new; cadences with a complete window (or a closed segment) are final
+        t = np.concatenate([self.tail[0], time])
+        f = np.concatenate([self.tail[1], flux])
+        e = np.concatenate([self.tail[2], flux_err])
+        rel, rel_err = self._detrend(t, f, e)
+
+        half = self.window // 2
+        segment = np.concatenate([[0], np.cumsum(~(np.diff(t) <= GAP_DAYS))])
+        last_start = int(np.searchsorted(segment, segment[-1]))
+        first_pending = max(last_start, len(t) - half)
+        start = self.tail.shape[1] - self.pending
+        if first_pending > start:
+            self._finalize(t[start:first_pending], rel[start:first_pending], rel_err[start:first_pending],
+                           rel[first_pending:], rel_err[first_pending:], rel, rel_err)
+
+        keep = min(len(t) - 1, max(last_start, len(t) - 2 * half))   # at least the last cadence
+        self.tail = np.vstack([t[keep:], f[keep:], e[keep:]])
+        self.pending = len(t) - max(first_pending, start)
+        self.n += len(time)
+        return self
+
+    def _finalize(self, t, rel, rel_err, pending_rel, pending_err, chunk_rel, chunk_err):
+        self.nan_flux |= bool(np.isnan(rel).any())
+        self.nan_err |= bool(np.isnan(rel_err).any())
+        # Sketches are centered on the first chunk (pending cadences included, so a full build is always in range)
+        ok = np.isfinite(chunk_rel) & np.isfinite(chunk_err)
+        if self.flux_sketch is None and ok.any():
+            r, e = chunk_rel[ok], chunk_err[ok]
+            self.flux_sketch = _sketch_new(r, _robust_sigma(r))
+            self.err_sketch = _sketch_new(e, _robust_sigma(e))
+        if self.flux_sketch is not None:
+            _sketch_add(self.flux_sketch, rel[~np.isnan(rel)])
+            _sketch_add(self.err_sketch, rel_err[~np.isnan(rel_err)])
+
+        # Earliest minimum of the whole curve (NaN never wins, as in transit_features)
+        values = np.where(np.isnan(rel), np.inf, rel)
+        i = int(np.argmin(values)) if len(values) else 0
+        if len(values) and values[i] < self.min_flux:
+            self.min_flux, self.t_min = float(values[i]), float(t[i])
+        elif np.isnan(self.t_min) and len(t):
+            self.t_min = float(t[i])
+
+        # Dip scan of the new window only, against the threshold of the whole curve so far
+        baseline, err_median = self._levels(pending_rel, pending_err)
+        threshold, margin = baseline - 2 * err_median, DIP_MARGIN * err_median
+        if not np.isfinite(threshold):
+            return
+        self._check_threshold(threshold, margin)
+        self.thr_lo, self.thr_hi = min(self.thr_lo, threshold), max(self.thr_hi, threshold)
+
+        candidate = rel < threshold + margin
+        solid = np.flatnonzero(rel < threshold - margin)
+        rows = np.vstack([t, rel])
+        if np.isnan(self.first_solid):
+            stop = solid[0] if len(solid) else len(t)
+            self.prefix = np.hstack([self.prefix, rows[:, :stop][:, candidate[:stop]]])[:, :MAX_CANDIDATES]
+            if len(solid):
+                self.first_solid = float(t[solid[0]])
+        if len(solid):
+            self.last_solid = float(t[solid[-1]])
+            after = np.arange(len(t)) > solid[-1]
+            self.suffix = rows[:, candidate & after]
+        else:
+            self.suffix = np.hstack([self.suffix, rows[:, candidate]])
+        self.suffix = self.suffix[:, -MAX_CANDIDATES:]
+
+    def _levels(self, pending_rel, pending_err):
+        # (baseline, flux_err median) of the finalized + pending cadences; NaN once any value is NaN
+        baseline = np.nan if self.nan_flux or np.isnan(pending_rel).any() else None
+        err_median = np.nan if self.nan_err or np.isnan(pending_err).any() else None
+        if self.flux_sketch is None:
+            # Short history: nothing final yet, the pending cadences are all there is
+            baseline = np.median(pending_rel) if baseline is None and len(pending_rel) else np.nan
+            err_median = np.median(pending_err) if err_median is None and len(pending_err) else np.nan
+            return baseline, err_median
+        if baseline is None:
+            baseline = _sketch_median(self.flux_sketch, pending_rel)
+        if err_median is None:
+            err_median = _sketch_median(self.err_sketch, pending_err)
+        return baseline, err_median
+
+    def _check_threshold(self, threshold, margin):
+        # Dips classified so far stay valid while every threshold used lies within one margin
+        if max(self.thr_hi, threshold) - min(self.thr_lo, threshold) > margin:
+            raise NeedsRebuild("dip threshold moved by more than the candidate margin")
+
+    # --- Reading ---
+
+    def transit_features(self):
+        """
+        baseline, threshold, depth, duration, ingress, egress, symmetry as
+        transit_features.star_transit_features would give for the full
+        history (tolerance in the README, "Incremental features").
+        """
+        t, f, e = self.tail
+        rel, rel_err = self._detrend(t, f, e)
+        p = slice(len(t) - self.pending, len(t))
+        t_p, rel_p, err_p = t[p], rel[p], rel_err[p]
+
+        baseline, err_median = self._levels(rel_p, err_p)
+        threshold = baseline - 2 * err_median
+
+        values = np.where(np.isnan(rel_p), np.inf, rel_p)
+        min_flux, t_min = self.min_flux, self.t_min
+        if len(values):
+            i = int(np.argmin(values))
+            if values[i] < min_flux or np.isnan(t_min):
+                min_flux, t_min = float(values[i]), float(t_p[i])
+
+        dips_p = t_p[rel_p < threshold]
+        t_start = t_end = np.nan
+        if np.isfinite(threshold):
+            self._check_threshold(threshold, DIP_MARGIN * err_median)
+            early = self.prefix[0][self.prefix[1] < threshold]
+            late = self.suffix[0][self.suffix[1] < threshold]
+            starts = [early[0]] if len(early) else [self.first_solid]
+            t_start = next((v for v in starts + list(dips_p[:1]) if np.isfinite(v)), np.nan)
+            t_end = next((v for v in list(dips_p[-1:]) + list(late[-1:]) + [self.last_solid] if np.isfinite(v)), np.nan)
+
+        depth = (baseline - min_flux) / baseline if np.isfinite(t_start) else np.nan
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ingress = t_min - t_start if t_min > t_start else np.nan
+            egress = t_end - t_min if t_end > t_min else np.nan
+            symmetry = ingress / egress
+        return {
+            "baseline": baseline, "threshold": threshold, "depth": depth, "duration": t_end - t_start,
+            "ingress": ingress, "egress": egress, "symmetry": symmetry,
+        }
+
+    def features(self, stellar: dict):
+        """One feature row (star_id + FEATURE_COLUMNS + PERIOD_COLUMNS) as a dict."""
+        flux_mean, flux_std, flux_skew, flux_kurt = _describe(self.flux_moments)
+        err_mean, err_std, _, _ = _describe(self.err_moments)
+        transit = self.transit_features()
+        depth_mean, depth_std = _broadcast_moments(transit["depth"], self.n)
+        duration_mean, duration_std = _broadcast_moments(transit["duration"], self.n)
+        ingress_mean = _broadcast_moments(transit["ingress"], self.n)[0]
+        egress_mean = _broadcast_moments(transit["egress"], self.n)[0]
+        row = {
+            "star_id": self.star_id,
+            "flux_mean": flux_mean, "flux_std": flux_std, "flux_skew": flux_skew, "flux_kurt": flux_kurt,
+            "err_mean": err_mean, "err_std": err_std,
+            "depth_mean": depth_mean, "depth_std": depth_std,
+            "duration_mean": duration_mean, "duration_std": duration_std,
+            "ingress_mean": ingress_mean, "egress_mean": egress_mean,
+            "ratio_ingress_egress": ingress_mean / (egress_mean + 1e-6),
+            "depth_over_duration": depth_mean / (duration_mean + 1e-6),
+        }
+        row.update({col: stellar.get(col, np.nan) for col in STELLAR_COLUMNS})
+        row.update(self.bls)
+        return row
+
+    def search_period(self, time, flux, flux_err):
+        # BLS over the full history; kept until the next rebuild
+        r = bls(time, flux, flux_err)
+        self.bls = dict(zip(PERIOD_COLUMNS, [r["period"], r["epoch"], r["duration"], r["depth"], r["snr"]]))
+
+    # --- Persistence (no pickle: arrays + JSON scalars in an .npz) ---
+
+    def to_bytes(self):
+        arrays = {"tail": self.tail, "prefix": self.prefix, "suffix": self.suffix,
+                  "flux_moments": self.flux_moments, "err_moments": self.err_moments}
+        meta = {k: v for k, v in self.__dict__.items() if k not in arrays and k not in ("flux_sketch", "err_sketch")}
+        for name in ("flux_sketch", "err_sketch"):
+            sketch = getattr(self, name)
+            if sketch is not None:
+                arrays[f"{name}_values"] = sketch["values"]
+                arrays[f"{name}_counts"] = sketch["counts"]
+                meta[name] = {k: v for k, v in sketch.items() if k not in ("values", "counts")}
+        meta["version"] = STATE_VERSION
+        out = io.BytesIO()
+        np.savez_compressed(out, meta=np.array(json.dumps(meta, default=float)), **arrays)
+        return out.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes):
+        with np.load(io.BytesIO(blob), allow_pickle=False) as f:
+            meta = json.loads(str(f["meta"]))
+            if meta.pop("version", None) != STATE_VERSION:
+                return None
+            state = cls(meta["star_id"], meta["window"])
+            for name in ("flux_sketch", "err_sketch"):
+                sketch = meta.pop(name, None)
+                if sketch is not None:
+                    sketch["values"] = f[f"{name}_values"]
+                    sketch["counts"] = f[f"{name}_counts"]
+                setattr(state, name, sketch)
+            for key, value in meta.items():
+                setattr(state, key, value)
+            for key in ("tail", "prefix", "suffix", "flux_moments", "err_moments"):
+                setattr(state, key, f[key])
+        return state
+
+class FeatureStateStore:
+    """
+    StarFeatureState of every monitored star: an in-memory LRU in front of
+    an SQLite file shared by the workers (same layout as PredictionCache).
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH, maxsize=DEFAULT_MAXSIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self.incremental = 0
+        self.rebuilds = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            try:
+                with self._connect() as conn:
+                    conn.execute("CREATE TABLE IF NOT EXISTS states (star_id INTEGER PRIMARY KEY, state BLOB, updated_at REAL)")
+            except (sqlite3.Error, OSError) as e:
+                print(f"Feature state store disabled on disk ({self.path}): {e}")
+                self.path = None
+
+    @contextmanager
+    def _connect(self):
+        # One transaction (committed, or rolled back on error) on a connection that is always closed
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+            yield conn
+
+    def get(self, star_id: int):
+        with self._lock:
+            state = self._memory.get(star_id)
+            if state is not None:
+                self._memory.move_to_end(star_id)
+                return state
+        if self.path is not None:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT state FROM states WHERE star_id = ?", (star_id,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"Feature state read failed: {e}")
+                row = None
+            if row is not None:
+                return StarFeatureState.from_bytes(row[0])
+        return None
+
+    def put(self, state: StarFeatureState):
+        with self._lock:
+            self._memory[state.star_id] = state
+            self._memory.move_to_end(state.star_id)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+        if self.path is not None:
+            try:
+                with self._connect() as conn:
+                    conn.execute("INSERT OR REPLACE INTO states VALUES (?, ?, ?)",
+                                 (state.star_id, state.to_bytes(), time.time()))
+            except sqlite3.Error as e:
+                print(f"Feature state write failed: {e}")
+
+    def update(self, star_id: int, time_, flux, flux_err):
+        """
+        State of a star after its resubmitted history (time-ordered arrays).
+        When the history extends the stored state only the new cadences are
+        processed; otherwise (new star, edited history, tolerance exceeded,
+        or REBUILD_GROWTH more cadences than at the last build) the state is
+        rebuilt from the full history. The stored cadences are compared by
+        a digest of the whole prefix, so an edit anywhere forces a rebuild.
+        Returns (state, mode) with mode "incremental" or "full".
+        """
+        state = self.get(star_id)
+        prefix, history = _history_digests(time_, flux, flux_err, min(state.n, len(time_)) if state is not None else 0)
+        mode = "full"
+        if (state is not None and len(time_) < (1 + REBUILD_GROWTH) * state.built_n
+                and state.history == prefix and state.matches(time_, flux, flux_err)):
+            try:
+                updated = state.copy().append(time_[state.n:], flux[state.n:], flux_err[state.n:])
+                updated.transit_features()
+                state, mode = updated, "incremental"
+            except NeedsRebuild:
+                state = None
+        else:
+            state = None
+
+        if state is None:
+            state = StarFeatureState.build(star_id, time_, flux, flux_err)
+            state.search_period(time_, flux, flux_err)
+            self.rebuilds += 1
+        else:
+            self.incremental += 1
+        state.history = history
+        self.put(state)
+        return state, mode
+
+def stellar_params(df: pd.DataFrame, star_id: int):
+    # Stellar parameters (and label) as add_features attaches them: from the rows, else the archive
+    if all(col in df.columns for col in ["teff", "radius", "mass", "logg", "feh"]):
+        first = df.iloc[0]
+        return {col: float(first[col]) if col in df.columns else np.nan for col in STELLAR_COLUMNS}
+
+    data = fetch_by_kic(star_id)
+    if data is None:
+        raise ValueError(f"Star {star_id} not available in the database, please manually enter the star's: teff, radius, mass, logg, feh.")
+    return {col: data.get(col, np.nan) for col in STELLAR_COLUMNS}
+
+def incremental_features(store: FeatureStateStore, df: pd.DataFrame):
+    """
+    One-star feature table (same columns as build_feature_table's
+    aggregate + period features) from the star's stored state. Rows must be
+    in increasing time order (see time_ordered); callers send other tables
+    through the full pipeline, which keeps their row order.
+    Returns (features DataFrame, mode).
+    """
+    if not time_ordered(df):
+        raise ValueError("Incremental features need rows in increasing time order")
+    star_id = int(df["star_id"].iloc[0])
+    time_ = df["time"].to_numpy(dtype=np.float64)
+    flux = df["flux"].to_numpy(dtype=np.float64)
+    flux_err = df["flux_err"].to_numpy(dtype=np.float64)
+
+    state, mode = store.update(star_id, time_, flux, flux_err)
+    row = state.features(stellar_params(df, star_id))
+    return pd.DataFrame([row], columns=["star_id"] + FEATURE_COLUMNS + PERIOD_COLUMNS), mode
@@ -2,7 +2,7 @@ import joblib
 import pandas as pd
 import os
 from format_data import add_features
-from star_aggregator import extract_features
+from star_aggregator import aggregate_features
 
 project_root = os.path.dirname(os.path.abspath(__file__)) 
 model_path = os.path.join(project_root, 'model', 'model.pkl')
@@ -16,7 +16,7 @@ file_path = os.path.join(project_root, 'data', 'input-test.csv')
 test = pd.read_csv(file_path)
 test = add_features(test)
 
-test = test.groupby("star_id").apply(extract_features).reset_index()
+test = aggregate_features(test)
 
 test = test.drop(columns="star_id")
 test = test.drop(columns="label")
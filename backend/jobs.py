@@ -0,0 +1,377 @@
+import os
+import sys
+import json
+import uuid
+import shutil
+import signal
+import sqlite3
+import subprocess
+import threading
+import time
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from columnar import write_columns, read_columns
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+# Job states are shared with the other gunicorn workers through this file,
+# so a job can be polled from any worker; empty string keeps them in memory only
+DEFAULT_STORE_PATH = os.environ.get("JOB_STORE_PATH", os.path.join(project_root, 'data', 'jobs.sqlite')) or None
+DEFAULT_WORKERS = int(os.environ.get("JOB_WORKERS", 1))          # jobs running at once per process
+DEFAULT_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 8))    # queued + running jobs (all workers with the process runner)
+DEFAULT_TTL = float(os.environ.get("JOB_TTL", 3600))             # seconds a finished job is kept
+# "process": jobs run in `python jobs.py work`, outside the web workers (needs the SQLite store);
+# "thread": on a pool inside each web worker
+DEFAULT_RUNNER = os.environ.get("JOB_RUNNER", "process")
+DEFAULT_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", 1))   # runner's wait between empty polls
+DEFAULT_INPUT_DIR = os.environ.get("JOB_INPUT_DIR", os.path.join(project_root, 'data', 'jobs'))   # uploaded tables waiting for the runner
+DEFAULT_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", 10))  # running jobs touch their row this often
+DEFAULT_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", 60))          # no heartbeat for this long: runner is gone
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 2))               # runs of a job before it is failed
+
+JOB_FIELDS = ["id", "status", "progress", "stage", "result", "error", "created_at", "updated_at"]
+
+class QueueFull(Exception):
+    pass
+
+class JobStore:
+    """
+    Status, progress and result of every job.
+    - Stored in SQLite so every worker (and the job runner) sees the same state.
+    - With `memory` (default: the "thread" runner, where jobs run in the worker
+      that accepted them) a copy is kept in memory for that worker. With the
+      "process" runner another process updates the jobs, so reads always go
+      to SQLite.
+    - Running jobs send a heartbeat every `heartbeat` seconds. A job without
+      one for `stale` seconds (its runner died) is queued again, or failed
+      after `max_attempts` runs, so it does not count against the queue limit
+      forever.
+    - If the SQLite file cannot be opened jobs are only visible to their own worker.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, ttl=DEFAULT_TTL, input_dir=DEFAULT_INPUT_DIR, memory=None,
+                 heartbeat=DEFAULT_HEARTBEAT_SECONDS, stale=DEFAULT_STALE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.ttl = ttl
+        self.input_dir = input_dir
+        self.heartbeat = heartbeat
+        self.stale = stale
+        self.max_attempts = max_attempts
+        self.memory = DEFAULT_RUNNER != "process" if memory is None else memory
+        self._memory = {}
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS jobs ("
+                        "id TEXT PRIMARY KEY, status TEXT, progress REAL, stage TEXT, "
+                        "result TEXT, error TEXT, created_at REAL, updated_at REAL, "
+                        "heartbeat_at REAL, attempts INTEGER DEFAULT 0)"
+                    )
+                    # Stores created before heartbeats
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+                    for column, kind in [("heartbeat_at", "REAL"), ("attempts", "INTEGER DEFAULT 0")]:
+                        if column not in columns:
+                            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            except (sqlite3.Error, OSError) as e:
+                print(f"Job store disabled on disk ({self.path}): {e}")
+                self.path = None
+        if self.path is None:
+            self.memory = True
+
+    @contextmanager
+    def _connect(self):
+        # One transaction (committed, or rolled back on error) on a connection that is always closed
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+            yield conn
+
+    def save(self, job: dict):
+        job["updated_at"] = time.time()
+        stored = False
+        if self.path is not None:
+            row = [job[f] for f in JOB_FIELDS]
+            row[4] = json.dumps(job["result"]) if job["result"] is not None else None
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{f} = excluded.{f}' for f in JOB_FIELDS[1:])}, "
+                        "heartbeat_at = excluded.heartbeat_at",
+                        row + [job["updated_at"]]
+                    )
+                stored = True
+            except sqlite3.Error as e:
+                print(f"Job store write failed: {e}")
+
+        # (a job whose write failed is at least visible to this worker)
+        if self.memory or not stored:
+            with self._lock:
+                self._memory[job["id"]] = dict(job)
+
+    def get(self, job_id: str):
+        if self.memory:
+            with self._lock:
+                job = self._memory.get(job_id)
+            if job is not None:
+                return dict(job)
+
+        if self.path is not None:
+            with self._connect() as conn:
+                row = conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                job = dict(zip(JOB_FIELDS, row))
+                job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+                return job
+
+        with self._lock:
+            job = self._memory.get(job_id)
+        return dict(job) if job is not None else None
+
+    def active(self):
+        # Jobs queued or running, in every process sharing the store
+        if self.path is None:
+            with self._lock:
+                return sum(job["status"] in ("queued", "running") for job in self._memory.values())
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def claim(self):
+        # Oldest queued job, marked running in the same transaction so only one runner gets it
+        self.recover()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE status = 'queued' "
+                               "ORDER BY created_at LIMIT 1").fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute("UPDATE jobs SET status = 'running', updated_at = ?, heartbeat_at = ?, "
+                             "attempts = COALESCE(attempts, 0) + 1 WHERE id = ?", (now, now, row[0]))
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        job["status"] = "running"
+        return job
+
+    def touch(self, job_id: str):
+        # Heartbeat of a running job
+        if self.path is not None:
+            with self._connect() as conn:
+                conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                             (time.time(), job_id))
+
+    def recover(self):
+        """
+        Requeue (while attempts and the input remain) or fail the running jobs
+        whose runner stopped sending heartbeats. Returns how many were found.
+        """
+        if self.path is None:
+            return 0
+        now = time.time()
+        failed = []
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT id, attempts FROM jobs WHERE status = 'running' "
+                                "AND COALESCE(heartbeat_at, updated_at) < ?", (now - self.stale,)).fetchall()
+            for job_id, attempts in rows:
+                if (attempts or 0) < self.max_attempts and os.path.exists(os.path.join(self._input_path(job_id), "params.json")):
+                    conn.execute("UPDATE jobs SET status = 'queued', stage = 'queued', progress = 0, "
+                                 "updated_at = ?, heartbeat_at = ? WHERE id = ?", (now, now, job_id))
+                else:
+                    conn.execute("UPDATE jobs SET status = 'failed', stage = 'failed', updated_at = ?, "
+                                 "error = 'Job runner stopped while running this job' WHERE id = ?", (now, job_id))
+                    failed.append(job_id)
+        for job_id in failed:
+            self.drop_input(job_id)
+        return len(rows)
+
+    # --- Inputs of jobs run by another process ---
+
+    def _input_path(self, job_id: str):
+        return os.path.join(self.input_dir, job_id)
+
+    def save_input(self, job_id: str, data: pd.DataFrame, params: dict):
+        path = self._input_path(job_id)
+        write_columns(data, path)
+        with open(os.path.join(path, "params.json"), "w") as f:
+            json.dump({"columns": list(data.columns), "params": params}, f)
+
+    def load_input(self, job_id: str):
+        path = self._input_path(job_id)
+        with open(os.path.join(path, "params.json")) as f:
+            meta = json.load(f)
+        return pd.DataFrame(read_columns(path, meta["columns"])), meta["params"]
+
+    def drop_input(self, job_id: str):
+        shutil.rmtree(self._input_path(job_id), ignore_errors=True)
+
+    def prune(self):
+        # Forget finished jobs older than ttl, and release the jobs of dead runners
+        self.recover()
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [k for k, job in self._memory.items()
+                           if job["status"] in ("done", "failed") and job["updated_at"] < cutoff]:
+                del self._memory[job_id]
+
+        if self.path is not None:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,))
+
+def _heartbeat(store: JobStore, job_id: str, stop: threading.Event):
+    while not stop.wait(store.heartbeat):
+        try:
+            store.touch(job_id)
+        except sqlite3.Error as e:
+            print(f"Job heartbeat failed: {e}")
+
+def execute(store: JobStore, job: dict, handler, data: pd.DataFrame, params: dict):
+    # Run one job, recording its progress, result or error in the store
+    def progress(fraction: float, stage: str):
+        job.update(progress=round(float(fraction), 4), stage=stage)
+        store.save(job)
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(store, job["id"], stop), daemon=True).start()
+    try:
+        job["status"] = "running"
+        progress(0.0, "started")
+        result = handler(data, params, progress)
+        job.update(status="done", progress=1.0, stage="done", result=result)
+    except Exception as e:
+        job.update(status="failed", stage="failed", error=str(e))
+    finally:
+        stop.set()
+        store.save(job)
+
+class JobQueue:
+    """
+    Bounded queue of long predictions, run by handler(data, params, progress);
+    the handler calls progress(fraction, stage) as it goes and returns a
+    JSON-able result.
+    - With the "process" runner, submit stores the table and `python jobs.py
+      work` runs it in its own process, so jobs never compete with request
+      threads; at most `queue_size` jobs may be queued or running in total.
+    - With the "thread" runner (or no store file) jobs run on a pool of
+      `workers` threads in this process, at most `queue_size` per process.
+    submit raises QueueFull beyond the limit so the endpoint can answer 429.
+    """
+
+    def __init__(self, store: JobStore, handler, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 runner=DEFAULT_RUNNER):
+        self.store = store
+        self.handler = handler
+        self.queue_size = queue_size
+        self.external = runner == "process" and store.path is not None
+        self._pool = None if self.external else ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, data: pd.DataFrame, params: dict):
+        job = {f: None for f in JOB_FIELDS}
+        job.update(id=uuid.uuid4().hex, status="queued", progress=0.0, stage="queued", created_at=time.time())
+        self.store.prune()
+
+        if self.external:
+            if self.store.active() >= self.queue_size:
+                raise QueueFull(f"{self.queue_size} jobs already queued, retry later")
+            # Input first: the runner may claim the job as soon as its row exists
+            self.store.save_input(job["id"], data, params)
+            try:
+                self.store.save(job)
+            except Exception:
+                self.store.drop_input(job["id"])
+                raise
+            return job["id"]
+
+        with self._lock:
+            if self._running >= self.queue_size:
+                raise QueueFull(f"{self.queue_size} jobs already queued, retry later")
+            self._running += 1
+        try:
+            self.store.save(job)
+            self._pool.submit(self._run, job, data, params)
+        except Exception:
+            self._release()
+            raise
+        return job["id"]
+
+    def _run(self, job: dict, data: pd.DataFrame, params: dict):
+        try:
+            execute(self.store, job, self.handler, data, params)
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            self._running -= 1
+
+    def depth(self):
+        # Jobs queued or running (in every process with the "process" runner, else in this one)
+        if self.external:
+            return self.store.active()
+        with self._lock:
+            return self._running
+
+def work(store: JobStore, handler, poll=DEFAULT_POLL_SECONDS, once=False):
+    """
+    Job runner loop: claim the oldest queued job, run it, repeat. Several
+    runners may share one store; each job is claimed by exactly one.
+    """
+    while True:
+        job = store.claim()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll)
+            continue
+        try:
+            data, params = store.load_input(job["id"])
+        except (OSError, ValueError) as e:
+            job.update(status="failed", stage="failed", error=f"Job input unavailable: {e}")
+            store.save(job)
+            continue
+        try:
+            execute(store, job, handler, data, params)
+        finally:
+            store.drop_input(job["id"])
+
+def supervise(command, restart_delay=1.0):
+    """
+    Run the web server `command` with a job runner next to it, restarting the
+    runner whenever it exits. SIGTERM/SIGINT are passed to the server, and
+    the runner is stopped once the server exits. Returns the server's exit code.
+    """
+    server = subprocess.Popen(command)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: server.send_signal(signum))
+
+    runner = None
+    try:
+        while server.poll() is None:
+            if runner is None or runner.poll() is not None:
+                if runner is not None:
+                    print(f"Job runner exited with code {runner.returncode}, restarting")
+                runner = subprocess.Popen([sys.executable, os.path.abspath(__file__), "work"])
+            time.sleep(restart_delay)
+    finally:
+        if runner is not None and runner.poll() is None:
+            runner.terminate()
+            try:
+                runner.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                runner.kill()
+    return server.wait()
+
+if __name__ == "__main__":
+    # python jobs.py work: run /predict/jobs outside the web workers
+    # python jobs.py supervise <server command...>: the server plus a runner that is restarted when it dies
+    if sys.argv[1:2] == ["supervise"] and len(sys.argv) > 2:
+        sys.exit(supervise(sys.argv[2:]))
+    if sys.argv[1:] != ["work"]:
+        sys.exit("usage: python jobs.py work | python jobs.py supervise <server command...>")
+    from app import job_store, run_prediction_job
+    print(f"Job runner polling {job_store.path}")
+    work(job_store, run_prediction_job)
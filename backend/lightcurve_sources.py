@@ -0,0 +1,137 @@
+import os
+import glob
+import time
+import random
+import threading
+from abc import ABC, abstractmethod
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_FITS_CACHE = os.environ.get("FITS_CACHE_DIR", os.path.join(project_root, 'data', 'fits_cache'))
+
+def lightcurve_arrays(lc):
+    # PDCSAP flux without NaNs as plain (time, flux, flux_err) arrays
+    lc = lc.PDCSAP_FLUX.remove_nans()
+    return lc.time.value, lc.flux.value, lc.flux_err.value
+
+class LightCurveSource(ABC):
+    """
+    Where light curves come from. fetch() returns (time, flux, flux_err)
+    arrays or None when the star has no light curve; it may raise on
+    transient errors, which the fetcher retries.
+    """
+
+    # Requests to the same host share a concurrency limit (None = unlimited)
+    host = None
+
+    @abstractmethod
+    def fetch(self, kepid: int):
+        ...
+
+class MastSource(LightCurveSource):
+    """
+    Kepler light curves from MAST through lightkurve. Downloaded FITS files
+    are kept in `cache_dir`, shared by every worker and every run, and a star
+    already in the cache is read from disk without searching MAST again.
+    """
+
+    host = "mast.stsci.edu"
+
+    def __init__(self, cache_dir=DEFAULT_FITS_CACHE):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cached_file(self, kepid: int):
+        files = sorted(glob.glob(os.path.join(self.cache_dir, "**", f"kplr{int(kepid):09d}-*_llc.fits"), recursive=True))
+        return files[0] if files else None
+
+    def fetch(self, kepid: int):
+        import lightkurve
+
+        path = self.cached_file(kepid)
+        if path is not None:
+            return lightcurve_arrays(lightkurve.read(path))
+
+        # Add KIC prefix for Kepler IDs (required)
+        lc_search = lightkurve.search_lightcurve(f"KIC{kepid}", mission="Kepler")
+        lc_file = lc_search.download(download_dir=self.cache_dir)
+        if lc_file is None:
+            return None
+        return lightcurve_arrays(lc_file)
+
+class LocalSource(LightCurveSource):
+    """
+    Light curves from a local directory, e.g. test fixtures:
+    - Kepler FITS files named kplr<9-digit kepid>-*.fits, or
+    - CSV files named <kepid>.csv with time, flux, flux_err columns.
+    A star with no file has no light curve.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, kepid: int):
+        csv_path = os.path.join(self.directory, f"{int(kepid)}.csv")
+        if os.path.exists(csv_path):
+            df = pd.read_csv(csv_path).dropna(subset=["flux"])
+            return df["time"].to_numpy(), df["flux"].to_numpy(), df["flux_err"].to_numpy()
+
+        files = sorted(glob.glob(os.path.join(self.directory, f"kplr{int(kepid):09d}-*.fits")))
+        if not files:
+            return None
+
+        import lightkurve
+        return lightcurve_arrays(lightkurve.read(files[0]))
+
+class ConcurrentFetcher:
+    """
+    Runs source.fetch() for many stars on a bounded thread pool.
+    - At most `max_workers` fetches run at once, and at most `per_host` of
+      them against the same host.
+    - Failed fetches are retried `retries` times with exponential backoff
+      (plus jitter); the last exception is returned, not raised.
+    - Results are yielded as they complete; no more than `max_workers` are
+      in flight, so memory stays bounded even for long star lists.
+    """
+
+    def __init__(self, source: LightCurveSource, max_workers=8, per_host=4, retries=3, backoff=1.0):
+        self.source = source
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+
+        self.host_limit = None
+        if source.host is not None:
+            self.host_limit = threading.BoundedSemaphore(per_host)
+
+    def fetch_one(self, kepid: int):
+        for attempt in range(self.retries + 1):
+            try:
+                if self.host_limit is None:
+                    return self.source.fetch(kepid)
+                with self.host_limit:
+                    return self.source.fetch(kepid)
+            except Exception as e:
+                if attempt == self.retries:
+                    return e
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    def fetch_all(self, kepids):
+        """Yield (kepid, result) as fetches finish; result is arrays, None or an exception."""
+        kepids = iter(kepids)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {}
+            for kepid in kepids:
+                pending[pool.submit(self.fetch_one, kepid)] = kepid
+                if len(pending) >= self.max_workers:
+                    break
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+                    next_kepid = next(kepids, None)
+                    if next_kepid is not None:
+                        pending[pool.submit(self.fetch_one, next_kepid)] = next_kepid
@@ -0,0 +1,204 @@
+import os
+import json
+import glob
+import time
+import shutil
+import random
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from columnar import read_table, existing_table
+from downsample import downsample
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_TABLE_BASE = os.path.join(project_root, 'data', 'game_data')
+DEFAULT_STORE_PATH = os.path.join(project_root, 'data', 'game_store')
+
+STORE_ARRAYS = ["star_id", "label", "offsets", "time", "flux"]
+
+# Downsampled payloads kept per (star, points, method)
+DOWNSAMPLE_CACHE_SIZE = int(os.environ.get("LIGHTCURVE_CACHE_SIZE", 2048))
+
+class LightCurveStore:
+    """
+    Per-star index over a light curve table.
+    - time/flux are contiguous arrays grouped by star (original row order kept
+      inside each star); star i owns rows offsets[i]:offsets[i + 1].
+    - star(i) returns zero-copy slices, random_index() is a uniform pick over
+      stars (not weighted by cadence count).
+    - With precompute_json=True the /lightcurve/random payload of every star is
+      serialized once up front.
+    - Downsampled payloads are cached per star, point count and method.
+    """
+
+    def __init__(self, star_id, label, offsets, time, flux, precompute_json=False):
+        self.star_id = star_id
+        self.label = label
+        self.offsets = offsets
+        self.time = time
+        self.flux = flux
+        self.payloads = None
+        self._index = None
+        self._downsampled = OrderedDict()
+        self._lock = threading.Lock()
+        if precompute_json:
+            self.payloads = [self.payload(i) for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.star_id)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, **kwargs):
+        codes, star_ids = pd.factorize(df["star_id"])
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(star_ids))
+
+        offsets = np.zeros(len(star_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        return cls(
+            star_id=np.asarray(star_ids, dtype=np.int64),
+            label=df["label"].to_numpy(dtype=np.int64)[order][offsets[:-1]],
+            offsets=offsets,
+            time=df["time"].to_numpy(dtype=np.float64)[order],
+            flux=df["flux"].to_numpy(dtype=np.float64)[order],
+            **kwargs
+        )
+
+    @classmethod
+    def from_table(cls, path=None, **kwargs):
+        # game_data bundle or CSV
+        path = path or existing_table(DEFAULT_TABLE_BASE)
+        return cls.from_frame(read_table(path, ["star_id", "time", "flux", "label"]), **kwargs)
+
+    @classmethod
+    def load(cls, path=DEFAULT_STORE_PATH, **kwargs):
+        # Memory-mapped: workers share the pages, nothing is parsed. The link
+        # is resolved once so every array comes from the same version.
+        path = os.path.realpath(path)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in STORE_ARRAYS}
+        return cls(**arrays, **kwargs)
+
+    def save(self, path=DEFAULT_STORE_PATH):
+        """
+        Write the arrays into a new version directory next to `path`
+        (`<path>.v<ns>-<pid>`) and atomically point the `path` symlink at it.
+        - Readers never see a half-written or missing store; pages they
+          already memory-mapped stay valid after a swap.
+        - The previous version is kept for readers resolving the link during
+          the swap; older ones are removed.
+        """
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in STORE_ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(getattr(self, name)))
+        version = f"{path}.v{time.time_ns():020d}-{os.getpid()}"
+        os.replace(tmp_path, version)
+
+        previous = os.path.realpath(path) if os.path.islink(path) else None
+        if os.path.isdir(path) and not os.path.islink(path):
+            # Store written by an older version as a plain directory
+            os.replace(path, f"{path}.v{0:020d}-{os.getpid()}")
+        link = f"{path}.link{os.getpid()}"
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.basename(version), link)
+        os.replace(link, path)
+
+        if previous is not None:
+            for old in glob.glob(f"{glob.escape(path)}.v*"):
+                if os.path.basename(old) < os.path.basename(previous):
+                    shutil.rmtree(old, ignore_errors=True)
+
+    def star(self, i: int):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.time[start:end], self.flux[start:end]
+
+    def random_index(self):
+        return random.randrange(len(self))
+
+    def index_of(self, star_id: int):
+        # Position of a star, or None
+        if self._index is None:
+            self._index = {int(s): i for i, s in enumerate(self.star_id)}
+        return self._index.get(int(star_id))
+
+    def payload(self, i: int, points=None, method="minmax"):
+        """
+        JSON for star i: {'label', 'data': flux}. With `points`, flux is
+        downsampled to about that many samples and their times are added as
+        'time' (plus the full cadence count as 'n_points').
+        """
+        if points is None:
+            if self.payloads is not None:
+                return self.payloads[i]
+            _, flux = self.star(i)
+            return json.dumps({
+                'label': int(self.label[i]),
+                'data': flux.tolist()
+            })
+
+        key = (i, int(points), method)
+        with self._lock:
+            cached = self._downsampled.get(key)
+            if cached is not None:
+                self._downsampled.move_to_end(key)
+                return cached
+
+        time, flux = self.star(i)
+        time, reduced = downsample(time, flux, int(points), method)
+        payload = json.dumps({
+            'label': int(self.label[i]),
+            'data': reduced.tolist(),
+            'time': time.tolist(),
+            'n_points': len(flux),
+        })
+
+        with self._lock:
+            self._downsampled[key] = payload
+            while len(self._downsampled) > DOWNSAMPLE_CACHE_SIZE:
+                self._downsampled.popitem(last=False)
+        return payload
+
+    def random_payload(self, points=None, method="minmax"):
+        return self.payload(self.random_index(), points, method)
+
+def open_store(table_path=None, store_path=DEFAULT_STORE_PATH, precompute_json=False):
+    """
+    Memory-map the binary store, (re)building it from game_data (bundle or
+    CSV) when it is missing or older than that table. Falls back to an in-memory index if the
+    store cannot be written or read.
+    """
+    table_path = table_path or existing_table(DEFAULT_TABLE_BASE)
+    marker = os.path.join(store_path, "flux.npy")
+    stale = not os.path.exists(marker) or (
+        os.path.exists(table_path) and os.path.getmtime(table_path) > os.path.getmtime(marker)
+    )
+
+    if stale:
+        store = LightCurveStore.from_table(table_path)
+        try:
+            store.save(store_path)
+        except OSError as e:
+            print(f"Light curve store kept in memory ({store_path}): {e}")
+            return in_memory(store, precompute_json)
+
+    try:
+        return LightCurveStore.load(store_path, precompute_json=precompute_json)
+    except (OSError, ValueError) as e:
+        # Missing or truncated version (e.g. removed by a concurrent rebuild)
+        print(f"Light curve store unreadable, rebuilt in memory ({store_path}): {e}")
+        return in_memory(LightCurveStore.from_table(table_path), precompute_json)
+
+def in_memory(store, precompute_json=False):
+    if precompute_json:
+        store.payloads = [store.payload(i) for i in range(len(store))]
+    return store
+
+if __name__ == "__main__":
+    store = LightCurveStore.from_table()
+    store.save()
+    print(f"Indexed {len(store)} stars / {len(store.flux)} cadences into {DEFAULT_STORE_PATH}")
@@ -4,77 +4,249 @@ from sklearn.discriminant_analysis import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
 from sklearn.calibration import CalibratedClassifierCV
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.metrics import balanced_accuracy_score, f1_score, log_loss, precision_score, recall_score, roc_auc_score, brier_score_loss, average_precision_score
 import pandas as pd
+import numpy as np
 import os
 import json
+import time
+import random
+import inspect
+import argparse
+import itertools
+from columnar import read_table, existing_table
 
-project_root = os.path.dirname(os.path.abspath(__file__)) 
-file_path = os.path.join(project_root, 'data', 'features.csv')
-
-features = pd.read_csv(file_path)
-
-X = features.drop(columns=["star_id","label"])
-y = features["label"].astype(int)
-
-X_tr, X_te, y_tr, y_te = train_test_split(
-    X, y, test_size=0.2, stratify=y, random_state=42
-)
-
-base_lr = LogisticRegression(
-    solver="lbfgs",
-    penalty="l2",
-    C=0.018,
-    max_iter=100,
-    class_weight="balanced",
-    random_state=42
-)
-
-pipe = Pipeline([
-    ("scaler", StandardScaler(with_mean=True, with_std=True)),
-    ("lr", base_lr),
-])
-
-cal = CalibratedClassifierCV(
-    estimator=pipe,
-    method="sigmoid",  # 'sigmoid' is robust on small data; 'isotonic' needs more samples
-    cv=5
-)
-cal.fit(X_tr, y_tr)
-
-proba = cal.predict_proba(X_te)[:, 1]
-pred  = (proba >= 0.5).astype(int)  # adjust threshold if needed
-
-metrics = {
-    "Accuracy": accuracy_score(y_te, pred),
-    "Balanced Accuracy": balanced_accuracy_score(y_te, pred),
-    "Precision": precision_score(y_te, pred, zero_division=0),
-    "Recall": recall_score(y_te, pred, zero_division=0),
-    "F1": f1_score(y_te, pred, zero_division=0),
-    "ROC AUC": roc_auc_score(y_te, proba),
-    "PR AUC (Average Precision)": average_precision_score(y_te, proba),
-    "Log Loss": log_loss(y_te, proba, labels=[0,1]),
-    "Brier Score": brier_score_loss(y_te, proba),
-}
-
-print("\n=== Test Metrics ===")
-for k, v in metrics.items():
-    print(f"{k:>28}: {v:.4f}")
-
-# saving metrics in separate file
-metrics_path = os.path.join(project_root, 'model', 'metrics.json')
-with open(metrics_path, 'w') as f:
-    json.dump(metrics, f, indent=4)
-print('Metrics saved in /model/metrics.json')
-
-# saving model in separate file
-artifact = {
-    "model": cal,
-    "feature_order": X.columns.tolist(),  # to enforce same order on load
-    "classes_": cal.classes_.tolist()
-}
-
-out_file_path = os.path.join(project_root, 'model', 'model.pkl')
-joblib.dump(artifact, out_file_path)
-print("Saved to model.pkl")
\ No newline at end of file
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+# Feature matrix of the last training run, reused while the feature table is unchanged
+MATRIX_CACHE = os.path.join(project_root, 'data', 'train_matrix')
+
+# Search space; C=0.018 / l2 / sigmoid is the configuration tuned by hand before
+C_GRID = (0.001, 0.003, 0.01, 0.018, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0)
+PENALTIES = ("l2", "l1")
+METHODS = ("sigmoid", "isotonic")   # 'sigmoid' is robust on small data; 'isotonic' needs more samples
+DEFAULT_PARAMS = {"C": 0.018, "penalty": "l2", "method": "sigmoid"}
+
+# scikit-learn >= 1.8 selects the penalty through l1_ratio
+_L1_RATIO_API = inspect.signature(LogisticRegression).parameters["penalty"].default == "deprecated"
+
+def make_model(C: float, penalty: str, method: str):
+    # StandardScaler + LogisticRegression calibrated over 5 folds (the structure FastModel compiles)
+    lr_params = dict(C=C, max_iter=100, class_weight="balanced", random_state=42,
+                     solver="liblinear" if penalty == "l1" else "lbfgs")
+    if _L1_RATIO_API:
+        lr_params["l1_ratio"] = 1.0 if penalty == "l1" else 0.0
+    else:
+        lr_params["penalty"] = penalty
+
+    pipe = Pipeline([
+        ("scaler", StandardScaler(with_mean=True, with_std=True)),
+        ("lr", LogisticRegression(**lr_params)),
+    ])
+    return CalibratedClassifierCV(estimator=pipe, method=method, cv=5)
+
+def _source_stamp(path: str):
+    # (file, size, mtime) of a CSV or of every file of a columnar bundle
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    return [[os.path.relpath(f, path) if f != path else os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns] for f in files]
+
+def load_matrix(path: str, cache_dir=MATRIX_CACHE):
+    """
+    Feature matrix X (float64), labels y and feature names of a feature table.
+    - The first run writes X.npy / y.npy to cache_dir; later runs memory-map
+      them while the table's files are unchanged, skipping the CSV/bundle parse.
+    Returns (X, y, feature_order, cache_dir or None).
+    """
+    stamp = _source_stamp(path)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["source"] == os.path.abspath(path) and meta["stamp"] == stamp:
+            X = np.load(os.path.join(cache_dir, "X.npy"), mmap_mode="r")
+            y = np.load(os.path.join(cache_dir, "y.npy"), mmap_mode="r")
+            return X, y, meta["feature_order"], cache_dir
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    features = read_table(path)
+    X = features.drop(columns=["star_id", "label"])
+    feature_order = X.columns.tolist()
+    X = np.ascontiguousarray(X.to_numpy(dtype=np.float64))
+    y = features["label"].to_numpy().astype(np.int64)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(os.path.join(cache_dir, "X.npy"), X)
+        np.save(os.path.join(cache_dir, "y.npy"), y)
+        with open(meta_path, "w") as f:
+            json.dump({"source": os.path.abspath(path), "stamp": stamp, "feature_order": feature_order}, f)
+    except OSError as e:
+        print(f"Feature matrix not cached ({cache_dir}): {e}")
+        return X, y, feature_order, None
+    return X, y, feature_order, cache_dir
+
+def candidates(n_iter=None, seed=42, C_grid=C_GRID, penalties=PENALTIES, methods=METHODS):
+    # Full grid, or n_iter random draws (C log-uniform over the grid's range)
+    if not n_iter:
+        return [{"C": C, "penalty": p, "method": m} for C, p, m in itertools.product(C_grid, penalties, methods)]
+    rng = random.Random(seed)
+    lo, hi = np.log10(min(C_grid)), np.log10(max(C_grid))
+    return [{"C": float(10 ** rng.uniform(lo, hi)), "penalty": rng.choice(penalties), "method": rng.choice(methods)}
+            for _ in range(n_iter)]
+
+# Read-only training data of a search worker: set once per process, not pickled per task
+_shared = None
+
+def _init_worker(X, y, cache_dir, train_idx, folds, limit_threads):
+    global _shared
+    if limit_threads:
+        # One BLAS thread per process so the pool does not oversubscribe the cores
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    if cache_dir is not None:
+        X = np.load(os.path.join(cache_dir, "X.npy"), mmap_mode="r")
+        y = np.load(os.path.join(cache_dir, "y.npy"), mmap_mode="r")
+    _shared = (X, y, train_idx, folds)
+
+def _evaluate(task):
+    # Log loss and ROC AUC of one candidate on one search fold
+    i, params, fold = task
+    X, y, train_idx, folds = _shared
+    fit_idx, val_idx = folds[fold]
+    t0 = time.perf_counter()
+    model = make_model(**params)
+    model.fit(X[train_idx[fit_idx]], y[train_idx[fit_idx]])
+    proba = model.predict_proba(X[train_idx[val_idx]])[:, 1]
+    y_val = y[train_idx[val_idx]]
+    return i, log_loss(y_val, proba, labels=[0, 1]), roc_auc_score(y_val, proba), time.perf_counter() - t0
+
+def search(X, y, cache_dir, train_idx, grid, cv=3, workers=1):
+    """
+    Cross-validated log loss of every candidate on the training split.
+    - Each (candidate, fold) is one task; workers > 1 runs them on a process
+      pool whose workers memory-map the cached matrix (or receive it once at
+      start-up when it could not be cached).
+    Returns a DataFrame of candidates sorted by mean log loss, and the summed
+    fit time.
+    """
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(train_idx, y[train_idx]))
+    tasks = [(i, params, fold) for i, params in enumerate(grid) for fold in range(cv)]
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        shared = (None, None) if cache_dir is not None else (X, y)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(*shared, cache_dir, train_idx, folds, True)) as pool:
+            scores = list(pool.map(_evaluate, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        _init_worker(X, y, None, train_idx, folds, False)
+        scores = [_evaluate(task) for task in tasks]
+
+    scores = pd.DataFrame(scores, columns=["candidate", "log_loss", "roc_auc", "seconds"])
+    table = scores.groupby("candidate").agg(log_loss=("log_loss", "mean"), log_loss_std=("log_loss", "std"),
+                                            roc_auc=("roc_auc", "mean"), seconds=("seconds", "sum"))
+    table = pd.concat([pd.DataFrame(grid), table], axis=1).sort_values(["log_loss", "C"]).reset_index(drop=True)
+    return table, float(scores["seconds"].sum())
+
+def test_metrics(y_te, proba):
+    pred = (proba >= 0.5).astype(int)  # adjust threshold if needed
+    return {
+        "Accuracy": accuracy_score(y_te, pred),
+        "Balanced Accuracy": balanced_accuracy_score(y_te, pred),
+        "Precision": precision_score(y_te, pred, zero_division=0),
+        "Recall": recall_score(y_te, pred, zero_division=0),
+        "F1": f1_score(y_te, pred, zero_division=0),
+        "ROC AUC": roc_auc_score(y_te, proba),
+        "PR AUC (Average Precision)": average_precision_score(y_te, proba),
+        "Log Loss": log_loss(y_te, proba, labels=[0,1]),
+        "Brier Score": brier_score_loss(y_te, proba),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune, train and save the calibrated logistic regression model.")
+    parser.add_argument("--input", default=existing_table(os.path.join(project_root, 'data', 'features')))
+    parser.add_argument("--output", default=os.path.join(project_root, 'model', 'model.pkl'))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for the search")
+    parser.add_argument("--cv", type=int, default=3, help="folds of the training split per candidate")
+    parser.add_argument("--n-iter", type=int, help="random search with this many candidates instead of the full grid")
+    parser.add_argument("--C", type=float, nargs="+", default=C_GRID)
+    parser.add_argument("--penalty", nargs="+", default=PENALTIES, choices=PENALTIES)
+    parser.add_argument("--method", nargs="+", default=METHODS, choices=METHODS)
+    parser.add_argument("--no-search", action="store_true", help="train C=0.018 / l2 / sigmoid without tuning")
+    parser.add_argument("--no-publish", action="store_true", help="do not add the model to model/registry")
+    args = parser.parse_args()
+
+    timing = {}
+    t0 = time.perf_counter()
+    X, y, feature_order, cache_dir = load_matrix(args.input)
+    timing["load_seconds"] = time.perf_counter() - t0
+    print(f"{X.shape[0]} stars x {X.shape[1]} features ({'cached matrix' if cache_dir else 'not cached'}), "
+          f"loaded in {timing['load_seconds']:.2f}s")
+
+    idx_tr, idx_te = train_test_split(
+        np.arange(len(y)), test_size=0.2, stratify=y, random_state=42
+    )
+
+    if args.no_search:
+        best = dict(DEFAULT_PARAMS)
+        table = None
+    else:
+        grid = candidates(args.n_iter, C_grid=args.C, penalties=args.penalty, methods=args.method)
+        t0 = time.perf_counter()
+        table, fit_seconds = search(X, y, cache_dir, idx_tr, grid, cv=args.cv, workers=args.workers)
+        timing["search_seconds"] = time.perf_counter() - t0
+        timing["search_fit_seconds"] = fit_seconds
+        timing["candidates"] = len(grid)
+        timing["workers"] = args.workers
+        best = {k: table.loc[0, k] for k in ["C", "penalty", "method"]}
+        best["C"] = float(best["C"])
+
+        print(f"\n=== Search ({len(grid)} candidates x {args.cv} folds, {args.workers} workers) ===")
+        print(table.head(10).to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+
+    # Best candidate refit on the whole training split, scored on the held-out test split
+    t0 = time.perf_counter()
+    cal = make_model(**best)
+    cal.fit(pd.DataFrame(X[idx_tr], columns=feature_order), y[idx_tr])
+    timing["fit_seconds"] = time.perf_counter() - t0
+
+    proba = cal.predict_proba(pd.DataFrame(X[idx_te], columns=feature_order))[:, 1]
+    metrics = test_metrics(y[idx_te], proba)
+
+    print(f"\n=== Test Metrics ({best['penalty']}, C={best['C']:.4g}, {best['method']}) ===")
+    for k, v in metrics.items():
+        print(f"{k:>28}: {v:.4f}")
+
+    print("\n=== Timing ===")
+    for k, v in timing.items():
+        print(f"{k:>28}: {v:.2f}" if isinstance(v, float) else f"{k:>28}: {v}")
+
+    # saving metrics in separate file
+    metrics_path = os.path.join(os.path.dirname(args.output), 'metrics.json')
+    with open(metrics_path, 'w') as f:
+        json.dump({**metrics, "params": best, "timing": timing}, f, indent=4)
+    print('Metrics saved in', metrics_path)
+    if table is not None:
+        table.to_csv(os.path.join(os.path.dirname(args.output), 'search_results.csv'), index=False)
+
+    # saving model in separate file
+    artifact = {
+        "model": cal,
+        "feature_order": feature_order,  # to enforce same order on load
+        "classes_": cal.classes_.tolist()
+    }
+
+    joblib.dump(artifact, args.output)
+    print("Saved to", args.output)
+
+    # versioned copy in model/registry; running servers switch to it once activated
+    if not args.no_publish:
+        from model_registry import ModelRegistry
+        version = ModelRegistry().publish(args.output, metrics_path)
+        print(f"Published model version {version}; serve it with: python model_registry.py activate {version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import os
+import json
+import shutil
+import signal
+import hashlib
+import threading
+import time
+import argparse
+import numpy as np
+from fast_model import FastModel, compile_artifact
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+LEGACY_MODEL_PATH = os.path.join(project_root, 'model', 'model.pkl')
+LEGACY_METRICS_PATH = os.path.join(project_root, 'model', 'metrics.json')
+
+# model/registry/<version>/{model.pkl, metrics.json, fast/*.npy} plus an ACTIVE file naming the served version
+DEFAULT_REGISTRY = os.environ.get("MODEL_REGISTRY", os.path.join(project_root, 'model', 'registry'))
+POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", 5))    # how often a worker checks ACTIVE
+RELOAD_SIGNAL = os.environ.get("MODEL_RELOAD_SIGNAL", "SIGUSR2")
+
+def _content_hash(path: str):
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_atomic(path: str, text: str):
+    # Readers see the old or the new file, never a partial one
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+class LoadedModel:
+    """
+    One model version, ready to score.
+    - scorer: FastModel over memory-mapped arrays when the artifact compiles
+      (pages are shared by every worker through the OS page cache), else the
+      sklearn model.
+    - source: the registry version it was loaded from, None for the legacy model.pkl.
+    """
+
+    def __init__(self, version: str, artifact: dict, scorer, metrics=None, source=None):
+        self.version = version
+        self.source = source
+        self.artifact = artifact
+        self.model = artifact["model"]
+        self.feature_order = artifact["feature_order"]
+        self.scorer = scorer
+        self.metrics = metrics or {}
+        self.loaded_at = time.time()
+
+    def predict_proba(self, features):
+        return self.scorer.predict_proba(features[self.feature_order])
+
+class ModelRegistry:
+    """
+    Versioned model artifacts and the one currently served.
+    - publish() copies a trained model.pkl (+ metrics.json) into its own
+      version directory with the FastModel arrays as .npy files;
+      activate() points ACTIVE at a version.
+    - current() returns the served LoadedModel. reload() loads the version
+      named by ACTIVE next to the old one and swaps the reference, so
+      requests holding the old model finish with it.
+    - Without a registry the legacy model/model.pkl is served, versioned by
+      its content hash.
+    """
+
+    def __init__(self, root=DEFAULT_REGISTRY, poll_seconds=POLL_SECONDS):
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self.reloads = 0
+        self._active = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # --- Registry on disk ---
+
+    def _active_path(self):
+        return os.path.join(self.root, "ACTIVE")
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(v for v in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, v, "model.pkl")))
+
+    def active_version(self):
+        # Version named by ACTIVE, or None when serving the legacy model.pkl
+        try:
+            with open(self._active_path()) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def metrics(self, version: str):
+        try:
+            with open(os.path.join(self.root, version, "metrics.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def publish(self, model_path=LEGACY_MODEL_PATH, metrics_path=LEGACY_METRICS_PATH, activate=False):
+        """
+        Copy a trained artifact into the registry and return its version
+        (<UTC timestamp>-<content hash>). Publishing the same file twice
+        returns the existing version.
+        """
+        import joblib
+
+        digest = _content_hash(model_path)
+        existing = [v for v in self.versions() if v.endswith(f"-{digest}")]
+        version = existing[0] if existing else f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{digest}"
+
+        if not existing:
+            target = os.path.join(self.root, version)
+            staging = f"{target}.{os.getpid()}.tmp"
+            os.makedirs(staging)
+            shutil.copy2(model_path, os.path.join(staging, "model.pkl"))
+            if metrics_path and os.path.exists(metrics_path):
+                shutil.copy2(metrics_path, os.path.join(staging, "metrics.json"))
+            try:
+                arrays = compile_artifact(joblib.load(model_path))
+            except ValueError as e:
+                print(f"Fast inference arrays not exported for {version}: {e}")
+            else:
+                os.makedirs(os.path.join(staging, "fast"))
+                for key, value in arrays.items():
+                    np.save(os.path.join(staging, "fast", f"{key}.npy"), np.asarray(value), allow_pickle=False)
+            # The version directory appears complete or not at all
+            os.replace(staging, target)
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str):
+        # Every worker picks the change up on its next poll (or signal)
+        if version not in self.versions():
+            raise KeyError(f"Unknown model version {version}")
+        _write_atomic(self._active_path(), version + "\n")
+
+    # --- Loading ---
+
+    def load(self, version=None):
+        """LoadedModel of a registry version, or of the legacy model.pkl when version is None."""
+        import joblib
+
+        if version is None:
+            artifact = joblib.load(LEGACY_MODEL_PATH)
+            try:
+                scorer = FastModel.from_artifact(artifact)
+            except ValueError as e:
+                print(f"Fast inference unavailable, using sklearn: {e}")
+                scorer = artifact["model"]
+            try:
+                with open(LEGACY_METRICS_PATH) as f:
+                    metrics = json.load(f)
+            except (FileNotFoundError, ValueError):
+                metrics = {}
+            return LoadedModel(_content_hash(LEGACY_MODEL_PATH), artifact, scorer, metrics)
+
+        directory = os.path.join(self.root, version)
+        # NumPy arrays inside the pickle are memory-mapped rather than copied
+        artifact = joblib.load(os.path.join(directory, "model.pkl"), mmap_mode="r")
+        fast_dir = os.path.join(directory, "fast")
+        if os.path.isdir(fast_dir):
+            scorer = FastModel({name[:-4]: np.load(os.path.join(fast_dir, name), mmap_mode="r")
+                                for name in os.listdir(fast_dir) if name.endswith(".npy")})
+        else:
+            scorer = artifact["model"]
+        return LoadedModel(version, artifact, scorer, self.metrics(version), source=version)
+
+    def _stamp_now(self):
+        try:
+            st = os.stat(self._active_path())
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def reload(self, force=False):
+        """
+        Serve the version named by ACTIVE. The new model is loaded before the
+        swap; on failure the current one stays. Returns the served version.
+        """
+        with self._lock:
+            stamp = self._stamp_now()
+            current = self._active
+            if current is not None and stamp == self._stamp and not force:
+                return current.version
+
+            version = self.active_version()
+            if current is not None and version == current.source and not force:
+                self._stamp = stamp
+                return current.version
+
+            try:
+                loaded = self.load(version)
+            except Exception as e:
+                if current is None:
+                    raise
+                print(f"Model {version} failed to load, keeping {current.version}: {e}")
+                self._stamp = stamp
+                return current.version
+
+            self._active, self._stamp = loaded, stamp
+            if current is not None:
+                self.reloads += 1
+                print(f"Model reloaded: {current.version} -> {loaded.version}")
+            return loaded.version
+
+    def current(self):
+        """
+        The served LoadedModel; checks ACTIVE at most every poll_seconds.
+        Callers keep the returned object for the whole request.
+        """
+        now = time.monotonic()
+        if self._active is None or (self.poll_seconds >= 0 and now - self._checked_at >= self.poll_seconds):
+            self._checked_at = now
+            if self._active is None or self._stamp_now() != self._stamp:
+                self.reload()
+        return self._active
+
+    def install_signal_handler(self, signame=RELOAD_SIGNAL):
+        # kill -USR2 <worker pid> reloads that worker; the load runs off the signal handler
+        sig = getattr(signal, signame, None)
+        if sig is None or threading.current_thread() is not threading.main_thread():
+            return False
+
+        def handler(signum, frame):
+            threading.Thread(target=self.reload, kwargs={"force": True}, daemon=True).start()
+
+        signal.signal(sig, handler)
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish, list and activate model versions.")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY)
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="copy a trained model.pkl into the registry")
+    pub.add_argument("--model", default=LEGACY_MODEL_PATH)
+    pub.add_argument("--metrics", default=LEGACY_METRICS_PATH)
+    pub.add_argument("--activate", action="store_true")
+    act = sub.add_parser("activate", help="serve a published version")
+    act.add_argument("version")
+    sub.add_parser("list", help="published versions and their metrics")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == "publish":
+        version = registry.publish(args.model, args.metrics, activate=args.activate)
+        print(f"Published {version}" + (" (active)" if args.activate else ""))
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Activated {args.version}")
+    else:
+        active = registry.active_version()
+        for version in registry.versions():
+            auc = registry.metrics(version).get("ROC AUC")
+            print(f"{'*' if version == active else ' '} {version}  ROC AUC {auc if auc is not None else '-'}")
+
+if __name__ == "__main__":
+    main()
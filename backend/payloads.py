@@ -0,0 +1,211 @@
+import io
+import os
+import json
+import zlib
+import zipfile
+import numpy as np
+import pandas as pd
+
+# Largest request body accepted after decompression
+MAX_PAYLOAD_BYTES = int(os.environ.get("MAX_PAYLOAD_BYTES", 512 * 1024 * 1024))
+
+# Columns every light curve payload must carry
+REQUIRED_COLUMNS = ["star_id", "time", "flux", "flux_err"]
+
+# lightkurve's "default" Kepler quality bitmask (cadences with severe issues)
+KEPLER_DEFAULT_BITMASK = 1130799
+
+JSON_TYPES = {"application/json"}
+NPZ_TYPES = {"application/x-npz", "application/npz"}
+ARROW_TYPES = {"application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file", "application/x-arrow"}
+FITS_TYPES = {"application/fits", "application/x-fits", "image/fits"}
+
+class PayloadError(Exception):
+    """A request body that cannot be decoded; `status` is the HTTP code to answer with."""
+
+    def __init__(self, message: str, status=400):
+        super().__init__(message)
+        self.status = status
+
+def decompress(body: bytes, encoding: str):
+    # Content-Encoding gzip/deflate/zstd, stopping at MAX_PAYLOAD_BYTES of output
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("", "identity"):
+        return body
+
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        decoder = zlib.decompressobj(wbits=47 if encoding != "deflate" else 15)
+        try:
+            out = decoder.decompress(body, MAX_PAYLOAD_BYTES + 1)
+        except zlib.error as e:
+            raise PayloadError(f"Invalid {encoding} body: {e}")
+    elif encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise PayloadError("zstd bodies need the zstandard package on the server", status=415)
+        try:
+            reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+            out = reader.read(MAX_PAYLOAD_BYTES + 1)
+        except zstandard.ZstdError as e:
+            raise PayloadError(f"Invalid zstd body: {e}")
+    else:
+        raise PayloadError(f"Unsupported Content-Encoding: {encoding}", status=415)
+
+    if len(out) > MAX_PAYLOAD_BYTES:
+        raise PayloadError(f"Decompressed body exceeds {MAX_PAYLOAD_BYTES} bytes", status=413)
+    return out
+
+def _columns_frame(columns: dict):
+    # Columns -> DataFrame; scalars (e.g. one star_id for the whole curve) are broadcast
+    arrays = {name: np.asarray(values) for name, values in columns.items()}
+    lengths = {len(a) for a in arrays.values() if a.ndim > 0}
+    if len(lengths) > 1:
+        raise PayloadError(f"Columns have different lengths: {sorted(lengths)}")
+    n = lengths.pop() if lengths else 1
+    return pd.DataFrame({name: np.broadcast_to(a, n) if a.ndim == 0 else a for name, a in arrays.items()})
+
+def _json_column(values):
+    # Integer lists stay int64 (star ids), nulls in float lists become NaN
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(np.float64)
+    return values
+
+def decode_json(body: bytes):
+    """
+    {"data": [{"star_id": ..., "time": ..., ...}, ...]} (one object per row), or
+    {"data": {"star_id": ..., "time": [...], "flux": [...], ...}} (one array per column).
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise PayloadError(f"Invalid JSON: {e}")
+
+    data = payload.get("data", []) if isinstance(payload, dict) else None
+    if isinstance(data, dict):
+        try:
+            return _columns_frame({name: _json_column(values) for name, values in data.items()})
+        except (TypeError, ValueError) as e:
+            raise PayloadError(f"Invalid column data: {e}")
+    if isinstance(data, list):
+        return pd.DataFrame(data)
+    raise PayloadError("Expected a 'data' list of rows or object of columns")
+
+def _check_npz_size(body: bytes):
+    """
+    Apply MAX_PAYLOAD_BYTES to the decompressed members of an .npz (np.savez_compressed).
+    zipfile never yields more than a member's declared size, and each array
+    header must fit in that size, so nothing larger is ever allocated.
+    """
+    total = 0
+    with zipfile.ZipFile(io.BytesIO(body)) as z:
+        for info in z.infolist():
+            total += info.file_size
+            if total > MAX_PAYLOAD_BYTES:
+                raise PayloadError(f"Decompressed .npz members exceed {MAX_PAYLOAD_BYTES} bytes", status=413)
+            with z.open(info) as f:
+                version = np.lib.format.read_magic(f)
+                read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+                shape, _, dtype = read_header(f)
+                if int(np.prod(shape, dtype=np.int64)) * dtype.itemsize > info.file_size:
+                    raise PayloadError(f"Invalid .npz body: {info.filename} is shorter than its array header says")
+
+def decode_npz(body: bytes):
+    # One array per column, as written by np.savez(f, star_id=..., time=..., ...)
+    try:
+        _check_npz_size(body)
+        with np.load(io.BytesIO(body), allow_pickle=False) as f:
+            return _columns_frame({name: f[name] for name in f.files})
+    except (ValueError, OSError, zipfile.BadZipFile) as e:
+        raise PayloadError(f"Invalid .npz body: {e}")
+
+def decode_arrow(body: bytes):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise PayloadError("Arrow bodies need the pyarrow package on the server", status=415)
+
+    try:
+        if body[:6] == b"ARROW1":
+            table = pa.ipc.open_file(pa.BufferReader(body)).read_all()
+        else:
+            table = pa.ipc.open_stream(pa.BufferReader(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise PayloadError(f"Invalid Arrow body: {e}")
+    return table.to_pandas()
+
+def decode_fits(body: bytes):
+    """
+    Kepler light curve file (kplr*_llc.fits): PDCSAP flux with lightkurve's
+    default quality mask and NaN fluxes removed; star_id from KEPLERID.
+    """
+    from astropy.io import fits
+
+    try:
+        with fits.open(io.BytesIO(body), memmap=False) as hdul:
+            star_id = hdul[0].header.get("KEPLERID")
+            lc = hdul["LIGHTCURVE"].data
+            time = np.asarray(lc["TIME"], dtype=np.float64)
+            flux = np.asarray(lc["PDCSAP_FLUX"], dtype=np.float64)
+            flux_err = np.asarray(lc["PDCSAP_FLUX_ERR"], dtype=np.float64)
+            quality = np.asarray(lc["SAP_QUALITY"]) if "SAP_QUALITY" in lc.columns.names else np.zeros(len(time), int)
+    except (OSError, KeyError, ValueError) as e:
+        raise PayloadError(f"Invalid Kepler FITS body: {e}")
+
+    if star_id is None:
+        raise PayloadError("FITS header has no KEPLERID")
+
+    keep = ((quality & KEPLER_DEFAULT_BITMASK) == 0) & np.isfinite(time) & np.isfinite(flux)
+    return pd.DataFrame({
+        "star_id": np.full(keep.sum(), int(star_id)),
+        "time": time[keep],
+        "flux": flux[keep],
+        "flux_err": flux_err[keep],
+    })
+
+def sniff(body: bytes):
+    # Format of an application/octet-stream body from its magic bytes
+    if body[:2] == b"PK":
+        return "npz"
+    if body[:6] == b"ARROW1" or body[:4] == b"\xff\xff\xff\xff":
+        return "arrow"
+    if body[:9] == b"SIMPLE  =":
+        return "fits"
+    return "json"
+
+def decode_payload(body: bytes, content_type: str = None, content_encoding: str = None):
+    """
+    Request body -> per-cadence DataFrame (star_id, time, flux, flux_err, ...).
+    - Content-Encoding: identity, gzip, deflate or zstd.
+    - Content-Type: JSON rows or columns, .npz, Arrow IPC, or a Kepler FITS
+      light curve; application/octet-stream is recognized by its magic bytes.
+    Binary formats and columnar JSON go straight into NumPy arrays.
+    Raises PayloadError for bodies that cannot be decoded, or rows missing
+    one of REQUIRED_COLUMNS.
+    """
+    body = decompress(body, content_encoding)
+    mimetype = (content_type or "application/json").split(";")[0].strip().lower()
+
+    if mimetype == "application/octet-stream":
+        kind = sniff(body)
+    elif mimetype in JSON_TYPES or mimetype.endswith("+json"):
+        kind = "json"
+    elif mimetype in NPZ_TYPES:
+        kind = "npz"
+    elif mimetype in ARROW_TYPES:
+        kind = "arrow"
+    elif mimetype in FITS_TYPES:
+        kind = "fits"
+    else:
+        raise PayloadError(f"Unsupported Content-Type: {mimetype}", status=415)
+
+    data = {"json": decode_json, "npz": decode_npz, "arrow": decode_arrow, "fits": decode_fits}[kind](body)
+    missing = [col for col in REQUIRED_COLUMNS if col not in data.columns]
+    if len(data) and missing:
+        raise PayloadError(f"Missing required columns: {', '.join(missing)}")
+    return data
+
+def read_request(request):
+    # Flask request -> DataFrame, see decode_payload
+    return decode_payload(request.get_data(cache=False), request.content_type, request.headers.get("Content-Encoding"))
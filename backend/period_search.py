@@ -0,0 +1,251 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from columnar import read_table, write_table, existing_table
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+PERIOD_COLUMNS = ["bls_period", "bls_epoch", "bls_duration", "bls_depth", "bls_snr"]
+
+# Trial transit durations in days (1 h to 12 h)
+DURATIONS = (0.04, 0.08, 0.125, 0.2, 0.3, 0.5)
+MIN_PERIOD = 0.5        # days
+MAX_PERIOD = 100.0      # days; also capped at half the baseline (two transits)
+OVERSAMPLE = 2          # grid points per duration of phase drift over the baseline
+MAX_PERIODS = 2000      # coarse grid size for long baselines, refined around its peaks
+REFINE_PEAKS = 5        # coarse peaks searched again at full resolution
+HARMONICS = (1, 2, 1 / 2, 3, 1 / 3)     # ... each with these multiples of its period
+CHUNK = 64              # trial periods folded at once
+
+def period_grid(baseline: float, min_period=MIN_PERIOD, max_period=MAX_PERIOD,
+                min_duration=min(DURATIONS), oversample=OVERSAMPLE):
+    """
+    Trial periods, log-uniform in frequency.
+    - A frequency error df moves the last transit by df * baseline * P days,
+      and keeping that below min_duration / oversample gives a constant
+      ratio between neighbouring frequencies.
+    - Empty when the baseline cannot hold two transits of min_period.
+    """
+    max_period = min(max_period, baseline / 2)
+    if max_period <= min_period:
+        return np.zeros(0)
+
+    ratio = 1 + min_duration / (oversample * baseline)
+    n = int(np.ceil(np.log(max_period / min_period) / np.log(ratio))) + 1
+    return np.exp(np.linspace(np.log(min_period), np.log(max_period), n))
+
+def _bin_in_time(t, y, w, width: float):
+    # Inverse-variance weighted averages in bins of `width` days (for short-cadence input)
+    idx = np.floor((t - t[0]) / width).astype(np.int64)
+    _, idx = np.unique(idx, return_inverse=True)
+    sw = np.bincount(idx, weights=w)
+    return np.bincount(idx, weights=w * t) / sw, np.bincount(idx, weights=w * y) / sw, sw
+
+def _fold_search(t, wn, wy, periods, durations, bin_time: float):
+    """
+    Best box of every trial period.
+    - CHUNK periods are folded with one integer bin computation and one
+      np.bincount per sum (bin index offset by the period's row).
+    - Every box width and start is scored from cumulative sums over the
+      bins, wrapping around phase 0.
+    Returns (power per period, (period, n_bins, start bin, width, Sw, Sy) of
+    the best box).
+    """
+    power = np.zeros(len(periods))
+    best, best_power = None, 0.0
+    n = len(t)
+    w_tiled = np.tile(wn, CHUNK)
+    wy_tiled = np.tile(wy, CHUNK)
+
+    for start in range(0, len(periods), CHUNK):
+        p = periods[start:start + CHUNK]
+        c = len(p)
+        nb = int(np.ceil(p[-1] / bin_time))
+
+        idx = np.multiply.outer(nb / p, t).astype(np.int32)
+        np.remainder(idx, nb, out=idx)
+        idx += (np.arange(c, dtype=np.int32) * nb)[:, None]
+        flat = idx.ravel()
+        sw = np.bincount(flat, weights=w_tiled[:c * n], minlength=c * nb).reshape(c, nb)
+        swy = np.bincount(flat, weights=wy_tiled[:c * n], minlength=c * nb).reshape(c, nb)
+
+        # Box widths in bins; only boxes shorter than a fifth of the period
+        widths = np.unique(np.maximum(1, np.round(durations / (p.mean() / nb)).astype(int)))
+        widths = widths[widths <= max(1, nb // 5)]
+        kmax = widths[-1]
+
+        zero = np.zeros((c, 1))
+        cw = np.concatenate([zero, np.cumsum(np.concatenate([sw, sw[:, :kmax]], axis=1), axis=1)], axis=1)
+        cy = np.concatenate([zero, np.cumsum(np.concatenate([swy, swy[:, :kmax]], axis=1), axis=1)], axis=1)
+
+        rows = np.arange(c)
+        for k in widths:
+            Sw = cw[:, k:k + nb] - cw[:, :nb]
+            Sy = np.minimum(cy[:, k:k + nb] - cy[:, :nb], 0.0)
+            # Dips only: boxes brighter than the mean score 0 (tiny keeps empty boxes finite)
+            sr = Sy * Sy
+            sr /= Sw * (1 - Sw) + 1e-300
+            pos = sr.argmax(axis=1)
+            peak = sr[rows, pos]
+            np.maximum(power[start:start + c], peak, out=power[start:start + c])
+
+            i = peak.argmax()
+            if peak[i] > best_power:
+                best_power = peak[i]
+                best = (p[i], nb, pos[i], k, Sw[i, pos[i]], Sy[i, pos[i]])
+
+    return power, best
+
+def bls(time, flux, flux_err, durations=DURATIONS, max_periods=MAX_PERIODS, refine=REFINE_PEAKS, **grid):
+    """
+    Box Least Squares search of one light curve on a binned phase grid.
+    - Flux is normalized by its median and weighted by 1 / flux_err^2; the
+      curve is folded into bins of half the shortest duration.
+    - Signal residue SR = Sy^2 / (Sw (1 - Sw)) for dips only (Sy < 0), with
+      Sw/Sy the in-box sums of normalized weights and weighted residuals.
+    - When the full grid is longer than max_periods (multi-quarter curves),
+      a max_periods grid is searched first; the full-resolution grid is then
+      searched around its `refine` strongest peaks and their HARMONICS (the
+      coarse grid often ranks an alias of the true period above it), and
+      the best full-resolution box wins.
+    Returns a dict with period, epoch (mid-transit time of the first transit,
+    same units as `time`), duration, depth (fractional) and snr
+    (depth / its uncertainty); all NaN when no search is possible.
+    """
+    result = dict.fromkeys(["period", "epoch", "duration", "depth", "snr"], np.nan)
+
+    time = np.asarray(time, dtype=np.float64)
+    flux = np.asarray(flux, dtype=np.float64)
+    flux_err = np.asarray(flux_err, dtype=np.float64)
+    ok = np.isfinite(time) & np.isfinite(flux) & np.isfinite(flux_err) & (flux_err > 0)
+    if ok.sum() < 10:
+        return result
+
+    order = np.argsort(time[ok], kind="stable")
+    t, flux, flux_err = time[ok][order], flux[ok][order], flux_err[ok][order]
+    baseline = np.median(flux)
+    if not baseline > 0:
+        return result
+
+    y = flux / baseline - 1
+    w = (baseline / flux_err) ** 2
+
+    durations = np.asarray(durations, dtype=np.float64)
+    bin_time = durations.min() / 2
+    if np.median(np.diff(t)) < bin_time / 4:
+        t, y, w = _bin_in_time(t, y, w, bin_time / 4)
+
+    t0 = t[0]
+    t = t - t0
+    periods = period_grid(t[-1], min_duration=durations.min(), **grid)
+    if len(periods) == 0:
+        return result
+
+    w_total = w.sum()
+    wn = w / w_total
+    y = y - np.dot(wn, y)
+    wy = wn * y
+
+    if len(periods) <= max_periods:
+        _, best = _fold_search(t, wn, wy, periods, durations, bin_time)
+    else:
+        coarse = np.exp(np.linspace(np.log(periods[0]), np.log(periods[-1]), max_periods))
+        power, best = _fold_search(t, wn, wy, coarse, durations, bin_time)
+
+        # Strongest local maxima of the coarse spectrum and their harmonics, searched again at full resolution
+        peaks = np.flatnonzero((power[1:-1] >= power[:-2]) & (power[1:-1] >= power[2:])) + 1
+        keep = np.zeros(len(periods), dtype=bool)
+        for i in peaks[np.argsort(power[peaks])[::-1][:refine]]:
+            for m in HARMONICS:
+                keep |= (periods >= coarse[i - 1] * m) & (periods <= coarse[i + 1] * m)
+
+        # One search per contiguous run of the fine grid (a fold chunk must span similar periods)
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.astype(np.int8), [0]])))
+        best = None
+        for lo, hi in zip(edges[::2], edges[1::2]):
+            _, candidate = _fold_search(t, wn, wy, periods[lo:hi], durations, bin_time)
+            if candidate is not None and (best is None or _sr(candidate) > _sr(best)):
+                best = candidate
+
+    if best is None:
+        return result
+
+    period, nb, pos, k, Sw, Sy = best
+    depth = -Sy / (Sw * (1 - Sw))
+    sigma = np.sqrt(1 / (Sw * w_total) + 1 / ((1 - Sw) * w_total))
+    result.update(
+        period=period,
+        epoch=t0 + ((pos + k / 2) % nb) / nb * period,
+        duration=k * period / nb,
+        depth=depth,
+        snr=depth / sigma,
+    )
+    return result
+
+def _sr(box):
+    _, _, _, _, Sw, Sy = box
+    return Sy * Sy / (Sw * (1 - Sw))
+
+def star_period_features(df: pd.DataFrame, workers: int = 1):
+    """
+    BLS period, epoch, duration, depth and SNR of every star, as a DataFrame
+    indexed by star_id (sorted) with the PERIOD_COLUMNS.
+    - workers > 1 shards the stars across a forked process pool.
+    """
+    groups = df.groupby("star_id", sort=True).indices
+    star_ids = list(groups)
+
+    if workers > 1 and len(star_ids) >= 2 * workers:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Forked workers inherit the table, so only shard numbers and results are pickled
+        global _shard_source
+        _shard_source = (df, groups, star_ids)
+        try:
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                parts = list(pool.map(_search_shard, range(workers), [workers] * workers))
+        finally:
+            _shard_source = None
+        rows = {star_id: row for part in parts for star_id, row in part}
+        rows = [rows[star_id] for star_id in star_ids]
+    else:
+        rows = [_search_star(df, idx) for idx in groups.values()]
+
+    out = pd.DataFrame(rows, columns=["period", "epoch", "duration", "depth", "snr"], index=pd.Index(star_ids, name="star_id"))
+    out.columns = PERIOD_COLUMNS
+    return out
+
+def _search_star(df: pd.DataFrame, idx):
+    r = bls(df["time"].to_numpy()[idx], df["flux"].to_numpy()[idx], df["flux_err"].to_numpy()[idx])
+    return [r["period"], r["epoch"], r["duration"], r["depth"], r["snr"]]
+
+_shard_source = None
+
+def _search_shard(shard: int, n_shards: int):
+    df, groups, star_ids = _shard_source
+    return [(star_id, _search_star(df, groups[star_id])) for star_id in star_ids[shard::n_shards]]
+
+def add_period_features(features: pd.DataFrame, df: pd.DataFrame, workers: int = 1):
+    # Per-star BLS results joined onto the per-star feature table
+    per_star = star_period_features(df, workers)
+    features = features.drop(columns=[c for c in PERIOD_COLUMNS if c in features.columns])
+    return features.join(per_star, on="star_id")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a BLS period search on every star of a light curve table.")
+    parser.add_argument("--input", default=existing_table(os.path.join(project_root, 'data', 'detailed_data')))
+    parser.add_argument("--output", default=os.path.join(project_root, 'data', 'periods.csv'),
+                        help="bundle directory, or a .csv path")
+    parser.add_argument("--workers", type=int, default=1, help="processes to shard stars across")
+    args = parser.parse_args()
+
+    df = read_table(args.input, columns=["star_id", "time", "flux", "flux_err"])
+    periods = star_period_features(df, workers=args.workers).reset_index()
+    write_table(periods, args.output)
+    print(periods.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from downsample import downsample
+from transit_features import star_transit_features
+from period_search import bls
+from detrend import trend, ENABLED as DETREND_ENABLED
+
+# Rendered images kept per (star, format, size, downsample level)
+PLOT_CACHE_SIZE = int(os.environ.get("PLOT_CACHE_SIZE", 256))
+MARKER_CACHE_SIZE = 1024
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+MIN_SIZE, MAX_SIZE = 100, 4000        # pixels per side
+DPI = 100
+MIN_TRANSIT_SNR = 7.1                 # BLS signals weaker than this are not marked
+
+def _noise(flux):
+    # Point-to-point scatter (robust sigma of first differences / sqrt 2), for curves without flux_err
+    d = np.diff(flux[np.isfinite(flux)])
+    if len(d) == 0:
+        return np.nan
+    return 1.4826 * np.median(np.abs(d - np.median(d))) / np.sqrt(2)
+
+def transit_markers(time, flux, flux_err=None):
+    """
+    What the pipeline detects on one light curve, for plotting.
+    - baseline, threshold and the dip window / minimum from
+      transit_features (the per-star step of add_features), on the
+      detrended curve with DETREND=1; baseline and threshold are per
+      cadence, in flux units. Without flux_err the point-to-point scatter
+      stands in for it.
+    - dips: boolean mask of the cadences below threshold.
+    - transits: mid-transit times of the BLS signal when its SNR is at least
+      MIN_TRANSIT_SNR, else empty.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    flux = np.asarray(flux, dtype=np.float64)
+    if flux_err is None:
+        flux_err = np.full(len(flux), _noise(flux))
+    flux_err = np.asarray(flux_err, dtype=np.float64)
+
+    df = pd.DataFrame({"star_id": 0, "time": time, "flux": flux, "flux_err": flux_err})
+    baseline = trend(df) if DETREND_ENABLED else np.ones(len(flux))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        star = star_transit_features(df.assign(flux=flux / baseline, flux_err=flux_err / baseline)).iloc[0]
+    threshold = star["threshold"] * baseline
+    baseline = star["baseline"] * baseline
+    dips = flux < threshold
+
+    t_start = time[dips].min() if dips.any() else np.nan
+    t_end = time[dips].max() if dips.any() else np.nan
+    t_min = time[np.nanargmin(flux)] if np.isfinite(flux).any() else np.nan
+
+    transits = np.zeros(0)
+    signal = bls(time, flux, flux_err)
+    if signal["snr"] >= MIN_TRANSIT_SNR:
+        k = np.arange(np.ceil((time.min() - signal["epoch"]) / signal["period"]),
+                      np.floor((time.max() - signal["epoch"]) / signal["period"]) + 1)
+        transits = signal["epoch"] + k * signal["period"]
+
+    return {
+        "baseline": baseline,
+        "threshold": threshold,
+        "dips": dips,
+        "dip_window": (t_start, t_end),
+        "t_min": t_min,
+        "transits": transits,
+        "period": signal["period"],
+    }
+
+class PlotRenderer:
+    """
+    Light curve images with the pipeline's dip and transit markers.
+    - Figures are drawn with matplotlib's object API on the Agg canvas (no
+      pyplot state, no GUI); drawing is serialized by a lock because
+      matplotlib's text and font caches are shared between threads.
+    - Images are kept in an LRU keyed by the caller's key, with an ETag
+      (content hash) each; markers are cached per star so other sizes and
+      formats of the same star skip the detection.
+    """
+
+    def __init__(self, maxsize=PLOT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._markers = OrderedDict()
+        self._lock = threading.Lock()
+        self._draw_lock = threading.Lock()
+
+    def _lookup(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _store(self, cache, key, value, maxsize):
+        with self._lock:
+            cache[key] = value
+            while len(cache) > maxsize:
+                cache.popitem(last=False)
+
+    def cached(self, key):
+        # (image bytes, etag) or None
+        return self._lookup(self._images, key)
+
+    def markers(self, star_key, time, flux, flux_err=None):
+        markers = self._lookup(self._markers, star_key)
+        if markers is None:
+            markers = transit_markers(time, flux, flux_err)
+            self._store(self._markers, star_key, markers, MARKER_CACHE_SIZE)
+        return markers
+
+    def render(self, key, star_key, time, flux, flux_err=None, fmt="png", width=900, height=300,
+               points=2000, method="minmax"):
+        """
+        (image bytes, etag) of one light curve, from the cache when possible.
+        The line is downsampled to `points` (None for every cadence); markers
+        always come from the full-resolution curve.
+        """
+        hit = self.cached(key)
+        if hit is not None:
+            self.hits += 1
+            return hit
+        self.misses += 1
+
+        markers = self.markers(star_key, time, flux, flux_err)
+        image = self._draw(time, flux, markers, fmt, width, height, points, method)
+        result = (image, hashlib.blake2b(image, digest_size=16).hexdigest())
+        self._store(self._images, key, result, self.maxsize)
+        return result
+
+    def _draw(self, time, flux, markers, fmt, width, height, points, method):
+        import matplotlib
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        time = np.asarray(time, dtype=np.float64)
+        flux = np.asarray(flux, dtype=np.float64)
+        t_line, f_line = downsample(time, flux, points, method) if points else (time, flux)
+
+        # Fixed SVG ids and no timestamps: the same curve always gives the same bytes (and ETag)
+        with self._draw_lock, matplotlib.rc_context({"svg.hashsalt": "lightcurve", "font.size": 8}):
+            fig = Figure(figsize=(width / DPI, height / DPI), dpi=DPI)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+
+            ax.plot(t_line, f_line, lw=0.6, color="#1f77b4", zorder=2)
+
+            t_start, t_end = markers["dip_window"]
+            if np.isfinite(t_start) and t_end > t_start:
+                ax.axvspan(t_start, t_end, color="#d62728", alpha=0.08, lw=0, zorder=0)
+            # Smooth curves: every stride-th cadence is enough
+            stride = max(1, len(time) // (points or len(time)))
+            if np.isfinite(markers["baseline"]).any():
+                ax.plot(time[::stride], markers["baseline"][::stride], color="0.5", lw=0.6, ls="--", label="baseline", zorder=1)
+            if np.isfinite(markers["threshold"]).any():
+                ax.plot(time[::stride], markers["threshold"][::stride], color="#ff7f0e", lw=0.6, ls=":", label="dip threshold", zorder=1)
+
+            dips = markers["dips"]
+            if dips.any():
+                t_dip, f_dip = time[dips], flux[dips]
+                if len(t_dip) > (points or len(t_dip)):
+                    t_dip, f_dip = downsample(t_dip, f_dip, points, "minmax")
+                ax.scatter(t_dip, f_dip, s=3, color="#d62728", lw=0, label="dip cadences", zorder=3)
+
+            transits = markers["transits"]
+            for i, t in enumerate(transits):
+                ax.axvline(t, color="#2ca02c", lw=0.8, alpha=0.6, zorder=1,
+                           label=f"BLS transit (P = {markers['period']:.3f} d)" if i == 0 else None)
+
+            ax.set_xlabel("Time [days]")
+            ax.set_ylabel("Flux")
+            ax.margins(x=0.01)
+            if ax.get_legend_handles_labels()[0]:
+                ax.legend(loc="lower left", fontsize=7, frameon=False, ncol=4)
+            fig.tight_layout()
+
+            out = io.BytesIO()
+            fig.savefig(out, format=fmt, metadata={"Date": None} if fmt == "svg" else None)
+        return out.getvalue()
@@ -0,0 +1,168 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import time
+import argparse
+from contextlib import closing, contextmanager
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+# Set PREDICTION_CACHE_PATH to an empty string to keep results in memory only
+DEFAULT_CACHE_PATH = os.environ.get("PREDICTION_CACHE_PATH", os.path.join(project_root, 'data', 'prediction_cache.sqlite')) or None
+DEFAULT_MAXSIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 1024))   # results kept in memory
+
+# Bump whenever the features or the result format change
+RESULT_VERSION = 5
+
+def cache_version(active, bootstrap=0, incremental=False):
+    # Results with a cadence bootstrap (or from incremental features) are cached apart from the others
+    version = f"{active.version}-{RESULT_VERSION}"
+    if bootstrap:
+        version = f"{version}-b{bootstrap}"
+    return f"{version}-inc" if incremental else version
+
+def input_key(df: pd.DataFrame, model_version: str):
+    """
+    Content hash of one prediction input.
+    - Columns are taken in sorted order and numbers normalized to int64/float64,
+      so key order in the JSON rows and 1 vs 1.0 do not change the key.
+    - Row order is kept: the transit features depend on it.
+    """
+    digest = hashlib.blake2b(model_version.encode(), digest_size=16)
+    for col in sorted(df.columns):
+        values = df[col].to_numpy()
+        if values.dtype.kind in "iub":
+            values = values.astype(np.int64)
+        elif values.dtype.kind == "f":
+            values = values.astype(np.float64)
+        else:
+            values = np.asarray([str(v) for v in values]).astype("U")
+        digest.update(str(col).encode())
+        digest.update(values.dtype.str.encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+class PredictionCache:
+    """
+    Finished /predict results keyed by input_key().
+    - In-memory LRU in front of an SQLite file that all gunicorn workers share.
+    - Keys include the model version (cache_version), so results of an older
+      model are never returned; purge() drops them from disk.
+    - If the SQLite file cannot be opened the cache keeps working in memory only.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, maxsize=DEFAULT_MAXSIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS results ("
+                        "key TEXT PRIMARY KEY, model_version TEXT, payload TEXT, stored_at REAL)"
+                    )
+            except (sqlite3.Error, OSError) as e:
+                print(f"Prediction cache disabled on disk ({self.path}): {e}")
+                self.path = None
+
+    @contextmanager
+    def _connect(self):
+        # One transaction (committed, or rolled back on error) on a connection that is always closed
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+            yield conn
+
+    def _remember(self, key: str, result: dict):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        # Returns the stored result, or None on a miss
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return result
+
+        if self.path is not None:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"Prediction cache read failed: {e}")
+                row = None
+            if row is not None:
+                result = json.loads(row[0])
+                self._remember(key, result)
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, model_version: str, result: dict):
+        self.put_many([(key, result)], model_version)
+
+    def put_many(self, items, model_version: str):
+        rows = []
+        now = time.time()
+        for key, result in items:
+            self._remember(key, result)
+            rows.append((key, model_version, json.dumps(result), now))
+
+        if self.path is not None and rows:
+            try:
+                with self._connect() as conn:
+                    conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+            except sqlite3.Error as e:
+                print(f"Prediction cache write failed: {e}")
+
+    def purge(self, active):
+        """
+        Drop results of any other model or RESULT_VERSION. Every variant of
+        the active model's version (bootstrap "-bN", incremental "-inc") is kept.
+        """
+        if self.path is None:
+            return 0
+        current = cache_version(active)
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM results WHERE model_version != ? AND substr(model_version, 1, ?) != ?",
+                (current, len(current) + 1, current + "-")
+            ).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.path is not None:
+            with self._connect() as conn:
+                return conn.execute("DELETE FROM results").rowcount
+        return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the /predict result cache.")
+    parser.add_argument("command", choices=["purge", "clear"])
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH)
+    args = parser.parse_args()
+
+    cache = PredictionCache(path=args.path)
+    if args.command == "purge":
+        # Same version the app serves: the registry's ACTIVE model, else model.pkl
+        from model_registry import ModelRegistry
+        active = ModelRegistry().current()
+        print(f"Removed {cache.purge(active)} results of models other than {active.version} from {args.path}")
+    else:
+        print(f"Removed {cache.clear()} results from {args.path}")
@@ -1,16 +1,12 @@
 import pandas as pd
 import numpy as np
 from scipy.stats import skew, kurtosis
-from scipy.signal import lombscargle
 import os
+import argparse
+from columnar import read_table, write_table, existing_table
+from period_search import add_period_features
 
 project_root = os.path.dirname(os.path.abspath(__file__)) 
-file_path = os.path.join(project_root, 'data', 'detailed_data.csv')
-
-# Load data
-df = pd.read_csv(file_path)
-
-df = df.dropna()
 
 # Feature extractor
 def extract_features(group: pd.DataFrame):
@@ -54,8 +50,182 @@ def extract_features(group: pd.DataFrame):
 
     return pd.Series(feats)
 
-# Aggregate
-features = df.groupby("star_id").apply(extract_features).reset_index()
+FEATURE_COLUMNS = [
+    "flux_mean", "flux_std", "flux_skew", "flux_kurt",
+    "err_mean", "err_std",
+    "depth_mean", "depth_std", "duration_mean", "duration_std",
+    "ingress_mean", "egress_mean", "ratio_ingress_egress", "depth_over_duration",
+    "teff", "radius", "mass", "logg", "feh",
+    "label",
+]
+
+STELLAR_COLUMNS = ["teff", "radius", "mass", "logg", "feh", "label"]
+
+def _pairwise_sum_of_constant(value, n):
+    """
+    Sum of n copies of `value` rounded exactly like numpy's pairwise summation
+    (8-way unrolled blocks of up to 128, recursive halving above), vectorized
+    over arrays of values and counts.
+    """
+    value = np.asarray(value, dtype=np.float64)
+    n = np.asarray(n, dtype=np.int64)
+    out = np.empty(value.shape)
+
+    small = n < 8
+    if small.any():
+        v, k = value[small], n[small]
+        res = np.zeros(v.shape)
+        for i in range(int(k.max())):
+            res = np.where(i < k, res + v, res)
+        out[small] = res
+
+    block = (n >= 8) & (n <= 128)
+    if block.any():
+        v, k = value[block], n[block]
+        r = v.copy()
+        for i in range(1, int((k // 8).max())):
+            r = np.where(i < k // 8, r + v, r)
+        res = ((r + r) + (r + r)) + ((r + r) + (r + r))
+        for i in range(int((k % 8).max())):
+            res = np.where(i < k % 8, res + v, res)
+        out[block] = res
+
+    large = n > 128
+    if large.any():
+        k = n[large]
+        half = k // 2
+        half -= half % 8
+        out[large] = _pairwise_sum_of_constant(value[large], half) + _pairwise_sum_of_constant(value[large], k - half)
+
+    return out
+
+def _grouped_moments(x, codes, counts, first):
+    """
+    Per-star mean, population std, skew and excess kurtosis (scipy defaults:
+    biased, NaN propagates, NaN skew/kurtosis for a constant star).
+    Stars whose values are all identical (the transit columns, broadcast per
+    star) reproduce np.mean/np.std bit for bit, including their rounding noise.
+    """
+    mean = np.bincount(codes, weights=x, minlength=len(counts)) / counts
+    d = x - mean[codes]
+    d2 = d * d
+    m2 = np.bincount(codes, weights=d2, minlength=len(counts)) / counts
+    m3 = np.bincount(codes, weights=d2 * d, minlength=len(counts)) / counts
+    m4 = np.bincount(codes, weights=d2 * d2, minlength=len(counts)) / counts
+
+    with np.errstate(all="ignore"):
+        std = np.sqrt(m2)
+        zero = m2 <= (np.finfo(np.float64).resolution * mean) ** 2
+        skewness = np.where(zero, np.nan, m3 / m2 ** 1.5)
+        kurt = np.where(zero, np.nan, m4 / m2 ** 2 - 3.0)
+
+        # Constant stars (NaN == NaN): exact numpy rounding
+        ref = x[first][codes]
+        same = (x == ref) | (np.isnan(x) & np.isnan(ref))
+        constant = np.bincount(codes, weights=~same, minlength=len(counts)) == 0
+        if constant.any():
+            value, n = x[first][constant], counts[constant]
+            const_mean = _pairwise_sum_of_constant(value, n) / n
+            dev = value - const_mean
+            mean[constant] = const_mean
+            std[constant] = np.sqrt(_pairwise_sum_of_constant(dev * dev, n) / n)
+
+    return mean, std, skewness, kurt
+
+def _aggregate(df: pd.DataFrame):
+    codes, star_ids = pd.factorize(df["star_id"], sort=True)
+    counts = np.bincount(codes, minlength=len(star_ids)).astype(np.float64)
+
+    # Row of each star's first cadence (stellar metadata is taken from it)
+    first = np.full(len(star_ids), len(codes))
+    np.minimum.at(first, codes, np.arange(len(codes)))
+
+    def moments(col):
+        return _grouped_moments(df[col].to_numpy(dtype=np.float64), codes, counts, first)
+
+    flux_mean, flux_std, flux_skew, flux_kurt = moments("flux")
+    err_mean, err_std, _, _ = moments("flux_err")
+    depth_mean, depth_std, _, _ = moments("depth")
+    duration_mean, duration_std, _, _ = moments("duration")
+    ingress_mean = moments("ingress")[0]
+    egress_mean = moments("egress")[0]
+
+    feats = {
+        "star_id": np.asarray(star_ids),
+        "flux_mean": flux_mean,
+        "flux_std": flux_std,
+        "flux_skew": flux_skew,
+        "flux_kurt": flux_kurt,
+        "err_mean": err_mean,
+        "err_std": err_std,
+        "depth_mean": depth_mean,
+        "depth_std": depth_std,
+        "duration_mean": duration_mean,
+        "duration_std": duration_std,
+        "ingress_mean": ingress_mean,
+        "egress_mean": egress_mean,
+        "ratio_ingress_egress": ingress_mean / (egress_mean + 1e-6),
+        "depth_over_duration": depth_mean / (duration_mean + 1e-6),
+    }
+    for col in STELLAR_COLUMNS:
+        feats[col] = df[col].to_numpy(dtype=np.float64)[first]
+
+    return pd.DataFrame(feats)
+
+def aggregate_features(df: pd.DataFrame, workers: int = 1):
+    """
+    One feature row per star, with the same columns (star_id + FEATURE_COLUMNS,
+    sorted by star_id) as df.groupby("star_id").apply(extract_features).
+    - All stars are reduced together with grouped NumPy reductions.
+    - Moments of varying columns (flux, flux_err) agree with the per-star
+      numpy/scipy calls to ~1e-12 relative; per-star constant columns
+      (depth, duration, ingress, egress) match exactly.
+    - workers > 1 shards the stars across a process pool.
+    """
+    if workers <= 1 or df["star_id"].nunique() < 2 * workers:
+        return _aggregate(df)
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Forked workers inherit the table, so only shard numbers and results are pickled
+    global _shard_source
+    _shard_source = df
+    try:
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            parts = list(pool.map(_aggregate_shard, range(workers), [workers] * workers))
+    finally:
+        _shard_source = None
+
+    return pd.concat(parts).sort_values("star_id").reset_index(drop=True)
+
+_shard_source = None
+
+def _aggregate_shard(shard: int, n_shards: int):
+    codes, _ = pd.factorize(_shard_source["star_id"])
+    return _aggregate(_shard_source[codes % n_shards == shard])
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate per-cadence rows into one feature row per star.")
+    parser.add_argument("--input", default=existing_table(os.path.join(project_root, 'data', 'detailed_data')))
+    parser.add_argument("--output", default=os.path.join(project_root, 'data', 'features'),
+                        help="bundle directory, or a .csv path")
+    parser.add_argument("--workers", type=int, default=1, help="processes to shard stars across")
+    args = parser.parse_args()
+
+    # Load data
+    df = read_table(args.input)
+
+    df = df.dropna()
+
+    # Aggregate
+    features = aggregate_features(df, workers=args.workers)
+
+    # BLS period, epoch, duration, depth and SNR per star
+    features = add_period_features(features, df, workers=args.workers)
+
+    write_table(features, args.output)
 
-out_file_path = os.path.join(project_root, 'data', 'features.csv')
-features.to_csv(out_file_path, index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
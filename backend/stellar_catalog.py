@@ -0,0 +1,139 @@
+import os
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_CATALOG_PATH = os.environ.get("STELLAR_CATALOG_PATH", os.path.join(project_root, 'data', 'catalog'))
+
+STELLAR_COLUMNS = ["teff", "radius", "mass", "logg", "feh"]
+KOI_COLUMNS = ["n_confirmed", "n_candidate", "n_false_positive"]
+CATALOG_COLUMNS = ["kepid"] + STELLAR_COLUMNS + KOI_COLUMNS + ["label"]
+
+# KOI dispositions come from the cumulative table, like the labels the model was trained on
+KOI_TABLE = "cumulative"
+DISPOSITION_LABELS = {"CONFIRMED": 1, "CANDIDATE": 1, "FALSE POSITIVE": 0}
+
+class StellarCatalog:
+    """
+    Offline snapshot of the DR25 stellar table plus KOI disposition counts
+    and the 0/1 exoplanet label of each star.
+    - Stored as one .npy file per column, all sorted by kepid, and opened
+      memory-mapped so loading costs nothing and pages are shared between
+      workers.
+    - lookup() is a binary search on the kepid column and returns the same
+      record as format_data.fetch_by_kic (None when the star is absent).
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in CATALOG_COLUMNS
+        }
+        self.kepid = self.columns["kepid"]
+
+    def __len__(self):
+        return len(self.kepid)
+
+    def index_of(self, kic_ids):
+        # Positions of the given KIC IDs, -1 where absent
+        kic_ids = np.asarray(kic_ids, dtype=np.int64)
+        if len(self.kepid) == 0:
+            return np.full(kic_ids.shape, -1)
+        pos = np.searchsorted(self.kepid, kic_ids)
+        pos = np.minimum(pos, len(self.kepid) - 1)
+        found = self.kepid[pos] == kic_ids
+        return np.where(found, pos, -1)
+
+    def lookup(self, kic_id: int):
+        i = int(self.index_of([int(kic_id)])[0])
+        if i < 0:
+            return None
+
+        record = {"star_id": int(kic_id)}
+        for col in STELLAR_COLUMNS:
+            record[col] = float(self.columns[col][i])
+        record["label"] = int(self.columns["label"][i])
+        return record
+
+    def to_pandas(self):
+        return pd.DataFrame({name: np.asarray(col) for name, col in self.columns.items()})
+
+def koi_labels(koi: pd.DataFrame):
+    """
+    0/1 label per kepid from a KOI table (kepid, koi_disposition): 1 when the
+    star has a CONFIRMED or CANDIDATE KOI, 0 when it only has FALSE POSITIVE
+    ones. Stars without a dispositioned KOI are left out.
+    """
+    labels = koi["koi_disposition"].map(DISPOSITION_LABELS).dropna()
+    return labels.groupby(koi.loc[labels.index, "kepid"]).max().astype(int)
+
+def write_catalog(stellar: pd.DataFrame, koi: pd.DataFrame, path=DEFAULT_CATALOG_PATH):
+    """
+    Write a snapshot from a stellar table (kepid + STELLAR_COLUMNS) and a KOI
+    table (kepid, koi_disposition). The directory is replaced atomically.
+    """
+    stellar = stellar.drop_duplicates("kepid").sort_values("kepid")
+
+    counts = pd.crosstab(koi["kepid"], koi["koi_disposition"])
+    for col, disposition in zip(KOI_COLUMNS, ["CONFIRMED", "CANDIDATE", "FALSE POSITIVE"]):
+        per_star = counts[disposition] if disposition in counts.columns else pd.Series(dtype=int)
+        stellar[col] = stellar["kepid"].map(per_star).fillna(0)
+    stellar["label"] = stellar["kepid"].map(koi_labels(koi)).fillna(0)
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, "kepid.npy"), stellar["kepid"].to_numpy(dtype=np.int64))
+    for col in STELLAR_COLUMNS:
+        np.save(os.path.join(tmp_path, f"{col}.npy"), stellar[col].to_numpy(dtype=np.float64))
+    for col in KOI_COLUMNS:
+        np.save(os.path.join(tmp_path, f"{col}.npy"), stellar[col].to_numpy(dtype=np.int32))
+    np.save(os.path.join(tmp_path, "label.npy"), stellar["label"].to_numpy(dtype=np.int8))
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return len(stellar)
+
+def build_from_archive(path=DEFAULT_CATALOG_PATH):
+    from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
+
+    stellar = NasaExoplanetArchive.query_criteria(
+        table="q1_q17_dr25_stellar",
+        select="kepid, teff, logg, feh, mass, radius"
+    ).to_pandas()
+
+    koi = NasaExoplanetArchive.query_criteria(
+        table=KOI_TABLE,
+        select="kepid, koi_disposition"
+    ).to_pandas()
+
+    return write_catalog(stellar, koi, path)
+
+_catalog = None
+
+def get_stellar_catalog():
+    # Loaded once per process; None when no snapshot has been built
+    global _catalog
+    # (snapshots written before the label column was added are ignored until rebuilt)
+    if _catalog is None and os.path.exists(os.path.join(DEFAULT_CATALOG_PATH, "label.npy")):
+        _catalog = StellarCatalog(DEFAULT_CATALOG_PATH)
+    return _catalog
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the offline DR25 stellar catalog snapshot.")
+    parser.add_argument("command", choices=["build", "lookup"])
+    parser.add_argument("kic_ids", nargs="*", type=int)
+    parser.add_argument("--path", default=DEFAULT_CATALOG_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Wrote {build_from_archive(args.path)} stars to {args.path}")
+    else:
+        catalog = StellarCatalog(args.path)
+        for kic_id in args.kic_ids:
+            print(catalog.lookup(kic_id))
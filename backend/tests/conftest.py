@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The backend modules are flat scripts imported by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests importing app keep its caches and job store in memory, not in data/
+for name in ["PREDICTION_CACHE_PATH", "JOB_STORE_PATH", "FEATURE_STATE_PATH"]:
+    os.environ.setdefault(name, "")
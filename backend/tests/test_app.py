@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+import app as backend
+
+def star_rows(star_id, transit=True, n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * 29.4 / 1440
+    flux = 1e4 * (1 + rng.normal(0, 2e-4, n))
+    if transit:
+        flux[(t - 1.1) % 6.3 < 0.2] *= 1 - 3e-3
+    return pd.DataFrame({"star_id": star_id, "time": t, "flux": flux, "flux_err": 2.0,
+                         "teff": 5700.0, "radius": 1.0, "mass": 1.0, "logg": 4.4, "feh": 0.0})
+
+@pytest.fixture
+def client():
+    return backend.app.test_client()
+
+def records(df):
+    return {"data": df.to_dict(orient="records")}
+
+def test_batch_scores_the_other_stars_when_one_has_nan_features(client):
+    # A star without any dip has no ingress/egress, so some of its features are NaN
+    flat = star_rows(3, transit=False)
+    flat["flux"] = 1e4
+    data = pd.concat([star_rows(1, seed=1), star_rows(2, seed=2), flat], ignore_index=True)
+
+    response = client.post("/predict/batch?bootstrap=4", json=records(data))
+    assert response.status_code == 200
+    by_star = {p["star_id"]: p for p in response.json["predictions"]}
+    assert response.json["count"] == 3
+
+    assert by_star[3]["probability"] is None
+    assert "ingress_mean" in by_star[3]["error"]
+    for star_id in (1, 2):
+        assert 0 <= by_star[star_id]["probability"] <= 1
+        assert "error" not in by_star[star_id]
+        assert by_star[star_id]["uncertainty"]["bootstrap"] == 4
+
+    # The same star alone is a client error, not a server error
+    response = client.post("/predict", json=records(flat))
+    assert response.status_code == 422
+    assert response.json["star_id"] == 3
+
+def test_incremental_predict_keeps_row_order_like_full(client):
+    # Out-of-order rows take the full pipeline, so both modes answer the same
+    data = star_rows(7, seed=7)
+    data = data.iloc[[1, 0] + list(range(2, len(data)))]
+    full = client.post("/predict", json=records(data))
+    incremental = client.post("/predict?incremental=1", json=records(data))
+    assert incremental.status_code == 200
+    assert incremental.headers["X-Feature-State"] == "full"
+    assert incremental.json["probability"] == full.json["probability"]
+
+def test_missing_required_column_is_a_bad_request(client):
+    data = star_rows(1).drop(columns=["star_id"])
+    for endpoint in ("/predict", "/predict/batch"):
+        response = client.post(endpoint, json=records(data))
+        assert response.status_code == 400
+        assert response.json["error"] == "Missing required columns: star_id"
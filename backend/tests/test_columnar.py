@@ -0,0 +1,22 @@
+import json
+import numpy as np
+import pandas as pd
+from columnar import ChunkedTableWriter, export_bundle, write_bundle, read_chunked_table, read_bundle
+
+def test_streamed_bundle_matches_in_memory_bundle(tmp_path):
+    writer = ChunkedTableWriter(str(tmp_path / "build"))
+    rng = np.random.default_rng(0)
+    for star_id in (11, 12, 13):
+        n = 500 + star_id
+        writer.append(star_id, pd.DataFrame({
+            "star_id": star_id, "time": np.arange(n) * 0.02, "flux": rng.random(n),
+            "label": star_id % 2, "teff": 5000.0 + star_id, "depth": np.nan,
+        }))
+    writer.mark_empty(14)
+
+    export_bundle(str(tmp_path / "build"), str(tmp_path / "streamed"))
+    write_bundle(read_chunked_table(str(tmp_path / "build")), str(tmp_path / "loaded"))
+    pd.testing.assert_frame_equal(read_bundle(str(tmp_path / "streamed")), read_bundle(str(tmp_path / "loaded")))
+    meta = [json.loads((tmp_path / name / "meta.json").read_text()) for name in ("streamed", "loaded")]
+    assert meta[0] == meta[1]
+    assert meta[0]["star_columns"] == ["label", "teff", "depth"]
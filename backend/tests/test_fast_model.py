@@ -0,0 +1,32 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from fast_model import FastModel, DEFAULT_MODEL_PATH
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="module")
+def artifact():
+    return joblib.load(DEFAULT_MODEL_PATH)
+
+@pytest.fixture(scope="module")
+def rows(artifact):
+    features = pd.read_csv(os.path.join(project_root, 'data', 'features.csv'), nrows=20)
+    return features[artifact["feature_order"]]
+
+def test_matches_calibrated_classifier(artifact, rows):
+    fast = FastModel.from_artifact(artifact)
+    np.testing.assert_allclose(fast.predict_proba(rows), artifact["model"].predict_proba(rows), rtol=0, atol=1e-12)
+
+@pytest.mark.parametrize("value", [np.nan, np.inf])
+def test_non_finite_row_raises_like_sklearn(artifact, rows, value):
+    # e.g. a star whose deepest point is its last dip has no egress
+    row = rows.iloc[:1].copy()
+    row["egress_mean"] = value
+    with pytest.raises(ValueError) as sklearn_error:
+        artifact["model"].predict_proba(row)
+    with pytest.raises(ValueError) as fast_error:
+        FastModel.from_artifact(artifact).predict_proba(row)
+    assert str(fast_error.value).splitlines()[0] in str(sklearn_error.value)
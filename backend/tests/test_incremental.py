@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+import incremental
+import transit_features
+from bench_detrend import synthetic_multiquarter, QUARTER_DAYS
+from format_data import add_features
+from star_aggregator import aggregate_features, FEATURE_COLUMNS, _pairwise_sum_of_constant
+from incremental import FeatureStateStore, incremental_features, time_ordered, _sum_of_constant, REBUILD_GROWTH
+
+# README "Incremental features": per-star constant columns are identical, moments agree to rounding
+EXACT = ["depth_mean", "depth_std", "duration_mean", "duration_std", "ingress_mean", "egress_mean",
+         "ratio_ingress_egress", "depth_over_duration"]
+MOMENTS = ["flux_mean", "flux_std", "flux_skew", "flux_kurt", "err_mean", "err_std"]
+
+def set_detrend(monkeypatch, enabled):
+    monkeypatch.setattr(incremental, "DETREND_ENABLED", enabled)
+    monkeypatch.setattr(transit_features, "DETREND_ENABLED", enabled)
+
+@pytest.fixture(params=[False, True], ids=["raw", "detrended"])
+def detrend(request, monkeypatch):
+    set_detrend(monkeypatch, request.param)
+    return request.param
+
+@pytest.fixture
+def raw(monkeypatch):
+    set_detrend(monkeypatch, False)
+
+def with_stellar_params(rows):
+    rows["star_id"] = 757450
+    for col in ["teff", "radius", "mass", "logg", "feh"]:
+        rows[col] = 1.0
+    rows["label"] = 1
+    return rows
+
+@pytest.fixture(scope="module")
+def multiquarter():
+    # Two quarters of long cadence: per-quarter offsets, a gap, variability and transits
+    rows, _ = synthetic_multiquarter(1, 8000, 29.4 / 1440, seed=3)
+    return with_stellar_params(rows)
+
+@pytest.fixture(scope="module")
+def flat():
+    # Same cadences without the systematics, which on raw flux move the dip threshold on every append
+    rng = np.random.default_rng(3)
+    t = np.arange(8000) * 29.4 / 1440
+    t += t // QUARTER_DAYS
+    flux = 1e4 * (1 + rng.normal(0, 3e-4, len(t)))
+    flux[(t - 1.3) % 7.7 < 0.2] *= 1 - 4e-3
+    return with_stellar_params(pd.DataFrame({"time": t, "flux": flux, "flux_err": 3.0}))
+
+@pytest.fixture
+def curve(request, detrend):
+    return request.getfixturevalue("multiquarter" if detrend else "flat")
+
+def full_features(df):
+    return aggregate_features(add_features(df.copy())).iloc[0]
+
+def assert_matches_full(features, df):
+    full = full_features(df)
+    row = features.iloc[0]
+    for col in EXACT:
+        assert row[col] == full[col] or (np.isnan(row[col]) and np.isnan(full[col])), col
+    for col in MOMENTS:
+        assert row[col] == pytest.approx(full[col], rel=1e-10), col
+    assert list(features.columns[1:len(FEATURE_COLUMNS) + 1]) == FEATURE_COLUMNS
+
+def test_appended_chunks_match_full_recompute(curve):
+    # The appends cross into the second quarter
+    n = 5000
+    chunks = [1, 7, 100, 600, 500]
+    store = FeatureStateStore(path=None)
+    _, mode = incremental_features(store, curve.iloc[:n])
+    assert mode == "full"
+    for chunk in chunks:
+        n += chunk
+        df = curve.iloc[:n]
+        features, mode = incremental_features(store, df)
+        assert mode == "incremental"
+        assert_matches_full(features, df)
+
+def test_state_survives_sqlite_round_trip(curve, tmp_path):
+    path = str(tmp_path / "states.sqlite")
+    incremental_features(FeatureStateStore(path=path), curve.iloc[:5000])
+    features, mode = incremental_features(FeatureStateStore(path=path), curve.iloc[:5500])
+    assert mode == "incremental"
+    assert_matches_full(features, curve.iloc[:5500])
+
+def test_edited_history_rebuilds(flat, raw):
+    store = FeatureStateStore(path=None)
+    incremental_features(store, flat.iloc[:5000])
+    df = flat.iloc[:5100].copy()
+    df.loc[4999, "flux"] *= 1.01
+    features, mode = incremental_features(store, df)
+    assert mode == "full"
+    assert_matches_full(features, df)
+
+def test_edited_early_cadence_rebuilds(flat, raw):
+    # Far outside the stored tail: only the prefix digest can notice it
+    store = FeatureStateStore(path=None)
+    incremental_features(store, flat.iloc[:5000])
+    df = flat.iloc[:5100].copy()
+    df.loc[10, "flux"] *= 0.99
+    features, mode = incremental_features(store, df)
+    assert mode == "full"
+    assert_matches_full(features, df)
+
+def test_unsorted_rows_are_rejected(flat, raw):
+    df = flat.iloc[:3000].iloc[::-1]
+    assert not time_ordered(df)
+    with pytest.raises(ValueError):
+        incremental_features(FeatureStateStore(path=None), df)
+
+def test_growth_rebuilds(flat, raw):
+    store = FeatureStateStore(path=None)
+    incremental_features(store, flat.iloc[:4000])
+    assert incremental_features(store, flat.iloc[:4999])[1] == "incremental"
+    df = flat.iloc[:int(4000 * (1 + REBUILD_GROWTH))]
+    features, mode = incremental_features(store, df)
+    assert mode == "full"
+    assert_matches_full(features, df)
+
+def test_threshold_drift_rebuilds(multiquarter, raw):
+    # On raw flux the next quarter's offset moves the baseline, and with it the dip threshold
+    store = FeatureStateStore(path=None)
+    incremental_features(store, multiquarter.iloc[:5000])
+    df = multiquarter.iloc[:6000]
+    features, mode = incremental_features(store, df)
+    assert mode == "full"
+    assert_matches_full(features, df)
+
+@pytest.mark.parametrize("value", [0.1, 1 / 3, np.pi * 1e-7, -2.5e3, 1e300 / 7, 5e-324])
+def test_pairwise_sum_matches_numpy(value):
+    # The broadcast columns are only bit-identical while this mirrors np.sum's rounding
+    rng = np.random.default_rng(0)
+    counts = np.concatenate([
+        np.arange(0, 600),
+        [2 ** k + d for k in range(8, 21) for d in (-9, -1, 0, 1, 7, 8)],
+        rng.integers(600, 2_000_000, 60),
+    ])
+    expected = np.array([np.sum(np.full(int(n), value)) for n in counts])
+    np.testing.assert_array_equal(_pairwise_sum_of_constant(np.full(len(counts), value), counts), expected)
+    assert [_sum_of_constant(value, int(n), {}) for n in counts if n > 0] == list(expected[counts > 0])
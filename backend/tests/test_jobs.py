@@ -0,0 +1,102 @@
+import os
+import time
+import pandas as pd
+import pytest
+import jobs
+from jobs import JobStore, JobQueue, QueueFull
+
+def count_stars(data, params, progress):
+    progress(0.5, "scoring")
+    return {"stars": int(data["star_id"].nunique()), "scale": params["scale"]}
+
+def open_store(tmp_path, **kwargs):
+    return JobStore(str(tmp_path / "jobs.sqlite"), input_dir=str(tmp_path / "jobs"), **kwargs)
+
+@pytest.fixture
+def store(tmp_path):
+    return open_store(tmp_path)
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({"star_id": [1, 1, 2], "time": [0.0, 0.1, 0.0], "flux": [1.0, 0.9, 1.0]})
+
+def test_process_runner_claims_and_runs_queued_job(tmp_path, data):
+    # The web worker and the runner are separate processes with their own store objects
+    web, runner = open_store(tmp_path), open_store(tmp_path)
+    queue = JobQueue(web, count_stars, queue_size=2, runner="process")
+    job_id = queue.submit(data, {"scale": 2})
+    assert web.get(job_id)["status"] == "queued"
+    assert queue.depth() == 1
+
+    jobs.work(runner, count_stars, once=True)
+    for store in (web, runner, open_store(tmp_path)):
+        job = store.get(job_id)
+        assert job["status"] == "done"
+        assert job["result"] == {"stars": 2, "scale": 2}
+    assert queue.depth() == 0
+    assert runner.claim() is None
+
+def test_memory_copy_only_for_thread_runner(tmp_path):
+    store = open_store(tmp_path, memory=False)
+    store.save({f: None for f in jobs.JOB_FIELDS} | {"id": "a", "status": "queued"})
+    assert not store._memory
+    assert open_store(tmp_path, memory=True).get("a")["status"] == "queued"
+    assert JobStore(None).memory
+
+def test_process_runner_queue_limit_is_shared(store, data):
+    JobQueue(store, count_stars, queue_size=1, runner="process").submit(data, {"scale": 1})
+    with pytest.raises(QueueFull):
+        JobQueue(store, count_stars, queue_size=1, runner="process").submit(data, {"scale": 1})
+
+def test_missing_input_fails_job(store, data):
+    job_id = JobQueue(store, count_stars, runner="process").submit(data, {"scale": 1})
+    store.drop_input(job_id)
+    jobs.work(store, count_stars, once=True)
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert "input unavailable" in job["error"]
+
+def test_thread_runner(store, data):
+    queue = JobQueue(store, count_stars, runner="thread")
+    job_id = queue.submit(data, {"scale": 3})
+    for _ in range(100):
+        if store.get(job_id)["status"] == "done":
+            break
+        time.sleep(0.05)
+    assert store.get(job_id)["result"] == {"stars": 2, "scale": 3}
+    assert queue.depth() == 0
+
+def test_jobs_of_a_dead_runner_are_requeued_then_failed(tmp_path, data):
+    web = open_store(tmp_path, stale=0, max_attempts=2)
+    runner = open_store(tmp_path, stale=0, max_attempts=2)
+    queue = JobQueue(web, count_stars, queue_size=1, runner="process")
+    job_id = queue.submit(data, {"scale": 1})
+
+    # Claimed by a runner that dies before finishing
+    assert runner.claim()["id"] == job_id
+    assert web.recover() == 1
+    assert web.get(job_id)["status"] == "queued"
+
+    assert runner.claim()["id"] == job_id
+    web.prune()
+    job = web.get(job_id)
+    assert job["status"] == "failed"
+    assert "runner stopped" in job["error"]
+    assert queue.depth() == 0
+    assert not os.path.exists(os.path.join(str(tmp_path / "jobs"), job_id))
+    queue.submit(data, {"scale": 1})
+
+def test_heartbeat_keeps_running_job_claimed(tmp_path, data):
+    web = open_store(tmp_path, stale=0.3)
+    runner = open_store(tmp_path, heartbeat=0.05)
+    job_id = JobQueue(web, count_stars, runner="process").submit(data, {"scale": 1})
+    recovered = []
+
+    def slow(data, params, progress):
+        time.sleep(0.6)
+        recovered.append(web.recover())
+        return {}
+
+    jobs.work(runner, slow, once=True)
+    assert recovered == [0]
+    assert web.get(job_id)["status"] == "done"
@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pandas as pd
+from lightcurve_store import LightCurveStore, open_store
+
+def frame(n_stars=3, n=50, offset=0.0):
+    rows = []
+    for s in range(n_stars):
+        for t in range(n):
+            rows.append({"star_id": 100 + s, "label": s % 2, "time": t * 0.02, "flux": 1.0 + offset + s})
+    return pd.DataFrame(rows)
+
+def test_save_swaps_versions_under_open_readers(tmp_path):
+    path = str(tmp_path / "game_store")
+    LightCurveStore.from_frame(frame()).save(path)
+    reader = LightCurveStore.load(path)
+
+    LightCurveStore.from_frame(frame(offset=1.0)).save(path)
+    LightCurveStore.from_frame(frame(offset=2.0)).save(path)
+
+    # The first reader's mapping is untouched, a new load sees the last version
+    assert reader.star(0)[1][0] == 1.0
+    assert LightCurveStore.load(path).star(0)[1][0] == 3.0
+    assert os.path.islink(path)
+    # Current and previous version kept, nothing half-written left behind
+    assert len([p for p in os.listdir(tmp_path) if ".v" in p]) == 2
+    assert not [p for p in os.listdir(tmp_path) if ".tmp" in p or ".link" in p]
+
+def test_save_replaces_plain_directory_store(tmp_path):
+    path = str(tmp_path / "game_store")
+    os.makedirs(path)
+    np.save(os.path.join(path, "flux.npy"), np.zeros(1))
+    LightCurveStore.from_frame(frame()).save(path)
+    assert os.path.islink(path)
+    assert len(LightCurveStore.load(path)) == 3
+
+def test_open_store_rebuilds_in_memory_when_load_fails(tmp_path):
+    table = str(tmp_path / "game_data.csv")
+    frame().to_csv(table, index=False)
+    path = str(tmp_path / "game_store")
+    assert len(open_store(table, path)) == 3
+
+    os.remove(os.path.join(os.path.realpath(path), "time.npy"))
+    store = open_store(table, path)
+    assert len(store) == 3
+    assert not isinstance(store.flux, np.memmap)
@@ -0,0 +1,35 @@
+import io
+import zipfile
+import numpy as np
+import pytest
+import payloads
+from payloads import decode_payload, PayloadError
+
+def npz_body(n=1000):
+    body = io.BytesIO()
+    np.savez_compressed(body, star_id=np.int64(7), time=np.arange(n) * 0.02, flux=np.ones(n), flux_err=np.full(n, 1e-3))
+    return body.getvalue()
+
+def test_npz_members_count_against_the_decompressed_limit(monkeypatch):
+    body = npz_body()
+    assert len(decode_payload(body, "application/x-npz")) == 1000
+    # Well under the limit compressed, well over it once inflated
+    monkeypatch.setattr(payloads, "MAX_PAYLOAD_BYTES", 4 * len(body))
+    assert len(body) < payloads.MAX_PAYLOAD_BYTES
+    with pytest.raises(PayloadError) as e:
+        decode_payload(body, "application/x-npz")
+    assert e.value.status == 413
+
+def test_npz_header_larger_than_its_member_is_rejected():
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {"descr": "<f8", "fortran_order": False, "shape": (10**12,)})
+    body = io.BytesIO()
+    with zipfile.ZipFile(body, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("flux.npy", header.getvalue() + b"\0" * 64)
+    with pytest.raises(PayloadError) as e:
+        decode_payload(body.getvalue(), "application/octet-stream")
+    assert e.value.status == 400
+
+def test_missing_columns_are_named():
+    with pytest.raises(PayloadError, match="Missing required columns: flux, flux_err"):
+        decode_payload(b'{"data": {"star_id": 7, "time": [0.0, 0.1]}}')
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from period_search import bls, period_grid, MAX_PERIODS
+
+LONG_CADENCE = 29.4 / 1440
+
+def injected(period, n=65000, depth=1e-3, duration=0.25, noise=5e-4, seed=0):
+    # ~4 years of long cadence with a box transit every `period` days
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * LONG_CADENCE
+    flux = 1 + rng.normal(0, noise, n)
+    flux[((t - 3.0) % period) < duration] -= depth
+    return t, flux, np.full(n, noise)
+
+@pytest.mark.parametrize("period", [12.3, 45.1])
+def test_long_curve_finds_injected_period_not_alias(period):
+    t, flux, flux_err = injected(period)
+    # Goes through the coarse grid + refinement path
+    assert len(period_grid(t[-1] - t[0])) > MAX_PERIODS
+
+    result = bls(t, flux, flux_err)
+    assert result["period"] == pytest.approx(period, rel=1e-3)
+    assert result["snr"] > 7.1
+
+def test_short_curve_full_grid():
+    t, flux, flux_err = injected(3.7, n=4000)
+    assert bls(t, flux, flux_err)["period"] == pytest.approx(3.7, rel=1e-3)
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+import prediction_cache
+from prediction_cache import PredictionCache, cache_version
+from model_registry import ModelRegistry
+
+def test_purge_keeps_every_variant_of_the_active_model(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    active, older = SimpleNamespace(version="v2"), SimpleNamespace(version="v1")
+    cache = PredictionCache(path=path)
+    kept = [cache_version(active), cache_version(active, 4), cache_version(active, 4, True), cache_version(active, 0, True)]
+    dropped = [
+        cache_version(older), cache_version(older, 4, True),
+        f"v2-{prediction_cache.RESULT_VERSION - 1}", f"v2-{prediction_cache.RESULT_VERSION - 1}-b4",
+    ]
+    for i, version in enumerate(kept + dropped):
+        cache.put(f"key{i}", version, {"version": version})
+
+    assert cache.purge(active) == len(dropped)
+    fresh = PredictionCache(path=path)
+    assert [fresh.get(f"key{i}") for i in range(len(kept))] == [{"version": v} for v in kept]
+    assert all(fresh.get(f"key{i}") is None for i in range(len(kept), len(kept) + len(dropped)))
+
+def test_cli_purge_uses_the_active_model_version(tmp_path):
+    active = ModelRegistry().current()
+    path = str(tmp_path / "cache.sqlite")
+    cache = PredictionCache(path=path)
+    cache.put("current", cache_version(active, 4), {"ok": True})
+    cache.put("stale", "old-1", {"ok": False})
+
+    backend = os.path.dirname(os.path.abspath(prediction_cache.__file__))
+    subprocess.run([sys.executable, "prediction_cache.py", "purge", "--path", path], cwd=backend, check=True)
+    fresh = PredictionCache(path=path)
+    assert fresh.get("current") == {"ok": True}
+    assert fresh.get("stale") is None
@@ -0,0 +1,23 @@
+import pandas as pd
+from stellar_catalog import StellarCatalog, write_catalog, koi_labels
+
+def test_label_is_zero_or_one_per_star(tmp_path):
+    stellar = pd.DataFrame({
+        "kepid": [3, 1, 2, 4],
+        "teff": [5000.0, 5800.0, 6100.0, 4500.0],
+        "radius": 1.0, "mass": 1.0, "logg": 4.4, "feh": 0.0,
+    })
+    koi = pd.DataFrame({
+        "kepid": [1, 1, 1, 2, 2, 3, 3],
+        "koi_disposition": ["CONFIRMED", "CONFIRMED", "CANDIDATE", "FALSE POSITIVE", "FALSE POSITIVE",
+                            "FALSE POSITIVE", "CANDIDATE"],
+    })
+    write_catalog(stellar, koi, str(tmp_path))
+    catalog = StellarCatalog(str(tmp_path))
+
+    assert [catalog.lookup(k)["label"] for k in [1, 2, 3, 4]] == [1, 0, 1, 0]
+    assert catalog.lookup(1)["teff"] == 5800.0
+    assert catalog.lookup(5) is None
+    # Same labels as building from the KOI table directly (stars without KOIs left out)
+    assert koi_labels(koi).to_dict() == {1: 1, 2: 0, 3: 1}
+    assert int(catalog.columns["n_confirmed"][0]) == 2
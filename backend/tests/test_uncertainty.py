@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from transit_features import star_transit_features
+from uncertainty import bootstrap_features
+
+def transit_star(star_id, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    time = np.arange(n) * 0.02
+    flux = 1.0 + rng.normal(0, 5e-4, n)
+    flux[(time % 3.0) < 0.1] -= 0.01
+    return pd.DataFrame({"star_id": star_id, "time": time, "flux": flux, "flux_err": np.full(n, 5e-4)})
+
+def test_resamples_recompute_moments_and_depth():
+    detailed = pd.concat([transit_star(7), transit_star(9, seed=1)], ignore_index=True)
+    per_star = star_transit_features(detailed)
+    features = pd.DataFrame({
+        "flux_mean": 0.0, "depth_mean": per_star["depth"].to_numpy(),
+        "duration_mean": per_star["duration"].to_numpy(), "depth_over_duration": 0.0, "teff": 5700.0,
+    })
+    replicas = bootstrap_features(features, [7, 9], detailed, 5, seed=3)
+    assert len(replicas) == 10
+
+    for i, star_id in enumerate([7, 9]):
+        star = detailed[detailed["star_id"] == star_id]
+        flux = star["flux"].to_numpy()
+        baseline, threshold = per_star.loc[star_id, ["baseline", "threshold"]]
+        W = np.random.default_rng([3, star_id]).poisson(1.0, size=(5, len(star)))
+        rows = replicas.iloc[i * 5:(i + 1) * 5]
+        for b in range(5):
+            drawn = W[b] > 0
+            assert np.isclose(rows["flux_mean"].iloc[b], np.average(flux, weights=W[b]))
+            expected = (baseline - flux[drawn & (flux < threshold)].min()) / baseline
+            assert np.isclose(rows["depth_mean"].iloc[b], expected)
+        assert np.allclose(rows["depth_over_duration"], rows["depth_mean"] / (rows["duration_mean"] + 1e-6))
+        assert (rows["teff"] == 5700.0).all()
+        assert (rows["duration_mean"] == per_star.loc[star_id, "duration"]).all()
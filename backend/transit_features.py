@@ -0,0 +1,81 @@
+import pandas as pd
+import numpy as np
+from detrend import detrended, ENABLED as DETREND_ENABLED
+
+TRANSIT_COLUMNS = ["depth", "duration", "ingress", "egress", "symmetry"]
+
+def star_transit_features(df: pd.DataFrame):
+    """
+    Compute the transit features of every star in one grouped pass.
+    - Returns a DataFrame indexed by star_id (in order of first appearance)
+      with baseline, threshold and the TRANSIT_COLUMNS.
+    - Matches the original per-star loop: rows are taken in their given
+      order, baseline is the median flux (NaN if any flux is NaN, like
+      np.median) and a star without dip points gets NaN everywhere.
+    """
+    codes, star_ids = pd.factorize(df["star_id"])
+    flux = df["flux"].to_numpy(dtype=float)
+    time = df["time"].to_numpy(dtype=float)
+    flux_err = df["flux_err"].to_numpy(dtype=float)
+
+    f = pd.Series(flux)
+    e = pd.Series(flux_err)
+
+    # Robust baseline = median flux; np.median propagates NaN, pandas skips it
+    baseline = f.groupby(codes).median().to_numpy()
+    baseline[f.isna().groupby(codes).any().to_numpy()] = np.nan
+    err_median = e.groupby(codes).median().to_numpy()
+    err_median[e.isna().groupby(codes).any().to_numpy()] = np.nan
+
+    # Threshold just below baseline
+    threshold = baseline - 2 * err_median
+
+    # Find dip points
+    dip_mask = flux < threshold[codes]
+
+    # Depth = (baseline - min_flux) / baseline
+    min_flux = f.where(dip_mask).groupby(codes).min().to_numpy()
+    depth = (baseline - min_flux) / baseline
+
+    # Duration = time difference between first and last dip points
+    dip_times = pd.Series(time).where(dip_mask).groupby(codes)
+    t_start = dip_times.first().to_numpy()
+    t_end = dip_times.last().to_numpy()
+    duration = t_end - t_start
+
+    # Time of the (first) minimum flux over the whole curve
+    argmin = pd.Series(np.where(np.isnan(flux), np.inf, flux)).groupby(codes).idxmin().to_numpy()
+    t_min = time[argmin]
+
+    with np.errstate(invalid="ignore"):
+        # Ingress = start to min flux, Egress = min flux to end
+        ingress = np.where(t_min > t_start, t_min - t_start, np.nan)
+        egress = np.where(t_end > t_min, t_end - t_min, np.nan)
+
+        # Symmetry ratio
+        symmetry = ingress / egress
+
+    return pd.DataFrame({
+        "baseline": baseline,
+        "threshold": threshold,
+        "depth": depth,
+        "duration": duration,
+        "ingress": ingress,
+        "egress": egress,
+        "symmetry": symmetry,
+    }, index=pd.Index(star_ids, name="star_id"))
+
+def add_transit_features(df: pd.DataFrame, detrend=None):
+    # Per-star results broadcast back onto every row, one column write each.
+    # Dips are found on the detrended flux (detrend.py) with DETREND=1;
+    # the flux column itself is left as it was.
+    if DETREND_ENABLED if detrend is None else detrend:
+        per_star = star_transit_features(detrended(df))
+    else:
+        per_star = star_transit_features(df)
+    codes, _ = pd.factorize(df["star_id"])
+
+    for col in TRANSIT_COLUMNS:
+        df[col] = per_star[col].to_numpy()[codes]
+
+    return df
@@ -0,0 +1,201 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from detrend import detrended, ENABLED as DETREND_ENABLED
+from transit_features import star_transit_features
+
+# Cadence bootstrap resamples per star when a request does not ask (0 = folds only)
+DEFAULT_BOOTSTRAP = int(os.environ.get("PREDICT_BOOTSTRAP", 0))
+MAX_BOOTSTRAP = int(os.environ.get("PREDICT_MAX_BOOTSTRAP", 1000))
+Z_95 = 1.96
+WEIGHT_BLOCK = 1 << 22      # resamples x cadences weights drawn at once
+
+# Features recomputed on every resample. Dip duration, ingress/egress, the
+# baseline and threshold, stellar parameters and the BLS results are kept fixed
+FLUX_MOMENTS = ["flux_mean", "flux_std", "flux_skew", "flux_kurt"]
+ERR_MOMENTS = ["err_mean", "err_std"]
+DEPTH_FEATURES = ["depth_mean", "depth_over_duration"]
+
+def fold_probabilities(scorer, X):
+    """Class-1 probability of every calibrated fold, shape (n_folds, n_rows)."""
+    if hasattr(scorer, "fold_probabilities"):
+        return scorer.fold_probabilities(X)
+    folds = getattr(scorer, "calibrated_classifiers_", None)
+    if folds is not None:
+        return np.stack([fold.predict_proba(X)[:, 1] for fold in folds])
+    return scorer.predict_proba(X)[:, 1][None, :]
+
+def _weighted_moments(W, flux, flux_err):
+    """
+    Flux mean/std/skew/kurtosis and flux_err mean/std of every resample at
+    once: W is (resamples, cadences) bootstrap weights, and every weighted
+    power sum comes out of one matrix product. Values are centered on the
+    full-curve mean first so the raw-to-central conversion keeps precision.
+    """
+    d = flux - flux.mean()
+    e = flux_err - flux_err.mean()
+    d2 = d * d
+    S = W @ np.column_stack([np.ones_like(d), d, d2, d2 * d, d2 * d2, e, e * e])
+    with np.errstate(all="ignore"):
+        r = S / S[:, :1]
+        mu = r[:, 1]
+        m2 = r[:, 2] - mu**2
+        m3 = r[:, 3] - 3 * mu * r[:, 2] + 2 * mu**3
+        m4 = r[:, 4] - 4 * mu * r[:, 3] + 6 * mu**2 * r[:, 2] - 3 * mu**4
+        m2 = np.maximum(m2, 0.0)
+        return {
+            "flux_mean": flux.mean() + mu,
+            "flux_std": np.sqrt(m2),
+            "flux_skew": m3 / m2**1.5,
+            "flux_kurt": m4 / m2**2 - 3.0,
+            "err_mean": flux_err.mean() + r[:, 5],
+            "err_std": np.sqrt(np.maximum(r[:, 6] - r[:, 5]**2, 0.0)),
+        }
+
+def _dip_levels(detailed: pd.DataFrame, detrend=None):
+    # Flux the dips are found on, with each row's star baseline and threshold (as add_transit_features)
+    frame = detrended(detailed) if (DETREND_ENABLED if detrend is None else detrend) else detailed
+    per_star = star_transit_features(frame)
+    codes, _ = pd.factorize(frame["star_id"])
+    return (frame["flux"].to_numpy(dtype=np.float64),
+            per_star["baseline"].to_numpy()[codes], per_star["threshold"].to_numpy()[codes])
+
+def _resampled_depth(W, dip_flux, baseline):
+    """
+    Transit depth of every resample: the lowest dip cadence drawn at least
+    once. dip_flux is sorted ascending, so that is the first drawn column.
+    """
+    drawn = W > 0
+    first = drawn.argmax(axis=1)
+    min_flux = np.where(drawn[np.arange(len(W)), first], dip_flux[first], np.nan)
+    return (baseline - min_flux) / baseline
+
+def bootstrap_features(features: pd.DataFrame, star_ids, detailed: pd.DataFrame, n_resamples: int, seed=0):
+    """
+    n_resamples copies of every star's feature row (star-major, same columns)
+    recomputed on a Poisson bootstrap of its cadences.
+    - Flux and flux_err moments come from one matrix product per block.
+    - depth_mean is the depth of the lowest dip cadence the resample draws,
+      against the full curve's baseline and threshold; depth_over_duration
+      follows it. A resample that draws no dip cadence gets NaN.
+    - Duration, ingress and egress, stellar parameters and BLS results stay
+      at the full-curve values, so bootstrap_std leaves out their spread.
+    - The weights of a star are seeded by its star_id, so repeated requests
+      give the same interval.
+    """
+    rows_by_star = detailed.groupby("star_id").indices
+    flux_all = detailed["flux"].to_numpy(dtype=np.float64)
+    err_all = detailed["flux_err"].to_numpy(dtype=np.float64)
+    dip_all, baseline_all, threshold_all = _dip_levels(detailed)
+
+    columns = {col: np.empty(len(star_ids) * n_resamples) for col in FLUX_MOMENTS + ERR_MOMENTS + ["depth_mean"]}
+    for i, star_id in enumerate(star_ids):
+        idx = rows_by_star[star_id]
+        flux, flux_err = flux_all[idx], err_all[idx]
+        dip = np.flatnonzero(dip_all[idx] < threshold_all[idx])
+        dip = dip[np.argsort(dip_all[idx][dip], kind="stable")]
+        rng = np.random.default_rng([seed, int(star_id)])
+        block = max(1, WEIGHT_BLOCK // len(idx))
+        for start in range(0, n_resamples, block):
+            stop = min(n_resamples, start + block)
+            W = rng.poisson(1.0, size=(stop - start, len(idx))).astype(np.float64)
+            out = slice(i * n_resamples + start, i * n_resamples + stop)
+            for col, values in _weighted_moments(W, flux, flux_err).items():
+                columns[col][out] = values
+            if len(dip):
+                columns["depth_mean"][out] = _resampled_depth(W[:, dip], dip_all[idx][dip], baseline_all[idx][0])
+            else:
+                columns["depth_mean"][out] = np.nan
+
+    replicas = features.iloc[np.repeat(np.arange(len(features)), n_resamples)].reset_index(drop=True)
+    for col, values in columns.items():
+        if col in replicas.columns:
+            replicas[col] = values
+    if {"depth_mean", "duration_mean", "depth_over_duration"} <= set(replicas.columns):
+        replicas["depth_over_duration"] = replicas["depth_mean"] / (replicas["duration_mean"] + 1e-6)
+    return replicas
+
+def unscorable_result(columns):
+    # Result of a star whose features cannot be scored (e.g. no dip, so no ingress/egress)
+    return {
+        "probability": None,
+        "probability_percentage": None,
+        "margin_of_error": None,
+        "confidence_interval": None,
+        "uncertainty": None,
+        "error": f"Features not finite: {', '.join(columns)}",
+    }
+
+def predict_with_uncertainty(active, star_ids, features: pd.DataFrame, detailed=None, n_resamples=0):
+    """
+    Probability and uncertainty of every star of a feature table, as
+    /predict result dicts in feature-table order.
+    - The ensemble probability is the mean of the calibrated folds, exactly
+      as predict_proba; their spread (fold_std) measures model uncertainty.
+    - With n_resamples > 0 the light curve's cadences are bootstrapped as
+      well (bootstrap_std, measurement noise). Original rows and all
+      resamples are scored in one fold_probabilities call.
+    - margin_of_error is 1.96 x the combined std; confidence_interval is the
+      probability +- that margin, clipped to [0, 100] percent.
+    - Stars with a NaN or infinite feature are not scored: their result has
+      a null probability and an `error` naming the features. Resamples with
+      non-finite features are left out of the bootstrap statistics.
+    """
+    X_all = features[active.feature_order]
+    finite = np.isfinite(X_all.to_numpy(dtype=np.float64)).all(axis=1)
+    scored_idx = np.flatnonzero(finite)
+    X = X_all.iloc[scored_idx]
+    n = len(X)
+    n_valid = np.zeros(n, dtype=int)
+    if n_resamples > 0 and n:
+        replicas = bootstrap_features(features.iloc[scored_idx], [star_ids[i] for i in scored_idx],
+                                      detailed, n_resamples)[active.feature_order]
+        valid = np.isfinite(replicas.to_numpy(dtype=np.float64)).all(axis=1)
+        X = pd.concat([X, replicas[valid]], ignore_index=True)
+
+    p = fold_probabilities(active.scorer, X) if n else np.zeros((1, 0))
+    base = p[:, :n]
+    probability = base.mean(axis=0)
+    n_folds = base.shape[0]
+    fold_std = base.std(axis=0, ddof=1) if n_folds > 1 else np.zeros(n)
+
+    boot_std = np.zeros(n)
+    if n_resamples > 0 and n:
+        resampled = np.full(n * n_resamples, np.nan)
+        resampled[valid] = p[:, n:].mean(axis=0)
+        resampled = resampled.reshape(n, n_resamples)
+        n_valid = valid.reshape(n, n_resamples).sum(axis=1)
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            boot_std = np.where(n_valid > 1, np.nanstd(resampled, axis=1, ddof=1), 0.0)
+            boot_lo, boot_hi = np.nanpercentile(resampled, [2.5, 97.5], axis=1)
+
+    std = np.sqrt(fold_std**2 + boot_std**2)
+    margin = Z_95 * std
+
+    results = [None] * len(X_all)
+    for i in np.flatnonzero(~finite):
+        results[i] = unscorable_result([c for c, ok in zip(X_all.columns, np.isfinite(X_all.iloc[i].to_numpy(dtype=np.float64))) if not ok])
+    for j, i in enumerate(scored_idx):
+        prob = float(probability[j])
+        bootstrapped = n_resamples > 0 and n_valid[j] > 0
+        results[i] = {
+            "probability": prob,
+            "probability_percentage": round(prob * 100, 2),
+            "margin_of_error": round(float(margin[j]) * 100, 2),
+            "confidence_interval": {
+                "lower_bound": round(max(0.0, prob - float(margin[j])) * 100, 2),
+                "upper_bound": round(min(1.0, prob + float(margin[j])) * 100, 2),
+            },
+            "uncertainty": {
+                "std": float(std[j]),
+                "folds": n_folds,
+                "fold_std": float(fold_std[j]),
+                "fold_probabilities": [float(v) for v in base[:, j]],
+                "bootstrap": int(n_valid[j]) if n_resamples > 0 else 0,
+                "bootstrap_std": float(boot_std[j]) if bootstrapped else None,
+                "bootstrap_interval": [float(boot_lo[j]), float(boot_hi[j])] if bootstrapped else None,
+            },
+        }
+    return results